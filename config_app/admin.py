@@ -1,9 +1,16 @@
 # type: ignore
 
 from django.contrib import admin
+from django.core.files.storage import default_storage
+from django.utils.text import normalize_newlines
+from constance import settings as constance_settings
+from constance.admin import Config, ConstanceAdmin
+from constance.forms import ConstanceForm
+from os.path import join
+from .changesets import apply_changeset
 from .models import ConfigChangeLog
 
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 from django.http import HttpRequest
 
 
@@ -23,3 +30,32 @@ class ConfigChangeLogAdmin(admin.ModelAdmin):
             self, request: HttpRequest, obj: Optional[ConfigChangeLog] = None
         ) -> bool:
         return False
+
+
+class ChangesetConstanceForm(ConstanceForm):
+    """
+    Saves all changed fields as one changeset (one Redis transaction and
+    one update message) instead of a Redis write and a message per field.
+    """
+
+    def save(self) -> None:
+        for file_field in self.files:
+            file = self.cleaned_data[file_field]
+            self.cleaned_data[file_field] = default_storage.save(
+                join(constance_settings.FILE_ROOT, file.name), file)
+
+        # Unchanged values are skipped by apply_changeset()
+        changes: Dict[str, Any] = {}
+        for name in constance_settings.CONFIG:
+            new: Any = self.cleaned_data[name]
+            changes[name] = normalize_newlines(new) if isinstance(new, str) else new
+
+        apply_changeset(changes)
+
+
+class ChangesetConstanceAdmin(ConstanceAdmin):
+    change_list_form = ChangesetConstanceForm
+
+
+admin.site.unregister([Config])
+admin.site.register([Config], ChangesetConstanceAdmin)
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.conf import settings
 import sys
 import logging
 import os
@@ -47,20 +48,38 @@ class ConfigAppConfig(AppConfig):
             return
 
         try:
+            from . import log_utils
+            from . import metrics
             from . import realtime_config
             from . import signals
             from constance.signals import config_updated
 
             realtime_config.load_defaults()
             logger.info(f"PID {pid}: Loaded constance config defaults")
+            realtime_config.start_snapshot_file()
+            metrics.start_metrics_writer()
+            log_utils.start_log_summary()
 
             config_updated.connect(signals.config_updated_handler,
                                    dispatch_uid=f"config_updated_handler_{pid}")
             logger.info(f"PID {pid}: Successfully connected "
                         "'config_updated' signal to 'config_updated_handler'")
 
-            logger.info(f"PID {pid}: Starting Redis Pub/Sub subscriber")
-            realtime_config.start_subscriber_thread()
+            if getattr(settings, 'REALTIME_CONFIG_SHARED_CACHE_PATH', None):
+                logger.info(f"PID {pid}: Starting shared config cache, "
+                            "one process per host subscribes to Redis Pub/Sub")
+                realtime_config.start_shared_cache()
+            elif getattr(settings, 'REALTIME_CONFIG_ASYNC_SUBSCRIBER', False):
+                logger.info(f"PID {pid}: Redis Pub/Sub subscriber will run "
+                            "as ASGI event loop task")
+            else:
+                logger.info(f"PID {pid}: Starting Redis Pub/Sub subscriber")
+                realtime_config.start_subscriber_thread()
+            realtime_config.start_refresher_thread()
+
+            if getattr(settings, 'REALTIME_CONFIG_WARMUP', False):
+                logger.info(f"PID {pid}: Warming up config cache")
+                realtime_config.warm_up_cache()
 
             self.__class__._initialized_pids[pid] = True
             logger.info(f"PID {pid}: Initialization COMPLETE")
@@ -0,0 +1,54 @@
+"""
+ASGI wrapper running realtime config subscriber as event loop task.
+"""
+
+import logging
+
+from typing import Any, Awaitable, Callable, Dict, Protocol
+
+from . import realtime_config, redis_client
+
+logger = logging.getLogger(__name__)
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class ASGIApp(Protocol):
+    """
+    Wrapped ASGI app, e.g. Django's ASGIHandler. Parameters are Any, as
+    ASGIHandler annotates them with asgiref's stricter callable types.
+    """
+    def __call__(self, scope: Any, receive: Any, send: Any) -> Awaitable[None]: ...
+
+
+class AsyncSubscriberASGIMiddleware:
+    """
+    Start async Pub/Sub subscriber on lifespan startup (or first request,
+    if server doesn't send lifespan events) and stop it on shutdown.
+    Lifespan scope isn't passed to Django, which only handles HTTP.
+    """
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # Server loop keeps its redis.asyncio pools
+        redis_client.register_server_loop()
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+
+        realtime_config.start_async_subscriber()
+        await self.app(scope, receive, send)
+
+    async def _lifespan(self, receive: Receive, send: Send) -> None:
+        while True:
+            message: Dict[str, Any] = await receive()
+            if message['type'] == 'lifespan.startup':
+                realtime_config.start_async_subscriber()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await realtime_config.stop_async_subscriber()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
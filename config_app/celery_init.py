@@ -4,7 +4,8 @@ Import this when using Celery, to Celery config file (celery.py).
 
 import os
 import logging
-from celery.signals import worker_process_init
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 _worker_initialized_pids = {}
@@ -19,9 +20,30 @@ def init_worker_process(sender=None, **kwargs):
         logger.info(f"CELERY_WORKER_INIT PID {pid}: Already initialized, skipping.")
         return
     
-    from . import realtime_config
+    from . import log_utils, metrics, realtime_config
     realtime_config.load_defaults()
-    realtime_config.start_subscriber_thread()
-    
+    realtime_config.start_snapshot_file()
+    metrics.start_metrics_writer()
+    log_utils.start_log_summary()
+    if getattr(settings, 'REALTIME_CONFIG_SHARED_CACHE_PATH', None):
+        realtime_config.start_shared_cache()
+    else:
+        realtime_config.start_subscriber_thread()
+    realtime_config.start_refresher_thread()
+
+    if getattr(settings, 'REALTIME_CONFIG_WARMUP', False):
+        realtime_config.warm_up_cache()
+
     _worker_initialized_pids[pid] = True
     logger.info(f"Celery worker {pid} initialized with realtime_config")
+
+
+@worker_process_shutdown.connect(weak=False)
+def shutdown_worker_process(sender=None, **kwargs):
+    """
+    Write buffered config change logs and queued log records,
+    child processes exit without atexit.
+    """
+    from . import change_log_writer, log_utils
+    change_log_writer.flush_on_exit()
+    log_utils.flush_handlers()
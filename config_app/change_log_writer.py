@@ -0,0 +1,342 @@
+"""
+Buffered ConfigChangeLog writer, off the config update signal path.
+
+enqueue() only appends to in-memory buffer. Background thread writes it
+with bulk_create when REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE rows are
+buffered, or REALTIME_CONFIG_CHANGE_LOG_FLUSH_INTERVAL seconds passed.
+Buffer is flushed on process exit.
+
+If the database is unavailable, rows are appended to a spill file in
+REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR (JSON lines, one file per process),
+and written to the database by the next successful flush of any process,
+one batch per transaction. After each batch the file is rewritten to the
+rows not written yet, so a failure midway doesn't replay written rows.
+Without spill directory, rows stay buffered (up to _MAX_BUFFERED_ROWS).
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ConfigChangeLog
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Oldest rows are dropped past this if database and spill dir are unavailable
+_MAX_BUFFERED_ROWS: int = 100000
+_SPILL_PREFIX: str = 'changelog_'
+_SPILL_SUFFIX: str = '.jsonl'
+# Min time between spilled rows replays after a failed one, s
+_REPLAY_RETRY_INTERVAL: float = 10.0
+
+_buffer: List[Dict[str, Any]] = []
+_buffer_lock: threading.Lock = threading.Lock()
+# Serializes flushes from writer thread, flush() callers and atexit
+_flush_lock: threading.Lock = threading.Lock()
+_flush_requested: threading.Event = threading.Event()
+_writer_thread: Optional[threading.Thread] = None
+# Monotonic time of next spilled rows replay, guarded by _flush_lock
+_next_replay_time: float = 0.0
+
+
+def _to_value(value: Any) -> Optional[str]:
+    return str(value) if value is not None else None
+
+
+def enqueue(key: str, old_value: Any, new_value: Any) -> None:
+    """
+    Buffer change log row. changed_at is the time of the change, not of the write.
+    """
+    enqueue_many([(key, old_value, new_value)])
+
+
+def enqueue_many(changes: Iterable[Tuple[str, Any, Any]]) -> None:
+    """
+    Buffer (key, old value, new value) rows of one change, e.g. a changeset,
+    with one changed_at. They are written together, by one bulk insert.
+    """
+    changed_at: datetime.datetime = timezone.now()
+    rows: List[Dict[str, Any]] = [{
+        'key': key,
+        'old_value': _to_value(old_value),
+        'new_value': _to_value(new_value) or "",
+        'changed_at': changed_at,
+    } for key, old_value, new_value in changes]
+    if not rows:
+        return
+
+    batch_size: int = getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE', 100)
+    with _buffer_lock:
+        _buffer.extend(rows)
+        if len(_buffer) > _MAX_BUFFERED_ROWS:
+            logger.error(f"Change log buffer is full, dropped "
+                         f"{len(_buffer) - _MAX_BUFFERED_ROWS} oldest rows")
+            del _buffer[:-_MAX_BUFFERED_ROWS]
+        buffered: int = len(_buffer)
+
+    if _writer_thread is None or not _writer_thread.is_alive():
+        start_writer()
+    if buffered >= batch_size:
+        _flush_requested.set()
+
+
+def _spill_dir() -> Optional[str]:
+    return getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR', None)
+
+
+def _spill(rows: List[Dict[str, Any]], spill_dir: str) -> None:
+    """
+    Append rows to this process's spill file.
+    """
+    os.makedirs(spill_dir, exist_ok=True)
+    path: str = os.path.join(spill_dir, f"{_SPILL_PREFIX}{os.getpid()}{_SPILL_SUFFIX}")
+    with open(path, 'a', encoding='utf-8') as spill_file:
+        _dump_rows(spill_file, rows)
+    logger.warning(f"Spilled {len(rows)} change log rows to {path}")
+
+
+def _dump_rows(spill_file: Any, rows: List[Dict[str, Any]]) -> None:
+    for row in rows:
+        spill_file.write(json.dumps(dict(row, changed_at=row['changed_at'].isoformat())))
+        spill_file.write('\n')
+    spill_file.flush()
+    os.fsync(spill_file.fileno())
+
+
+def _rewrite_spilled(path: str, rows: List[Dict[str, Any]]) -> None:
+    """
+    Atomically replace claimed spill file with rows not written yet.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.rewrite.',
+                                    suffix=_SPILL_SUFFIX)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_file:
+            _dump_rows(tmp_file, rows)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _claim_spilled(spill_dir: str) -> List[str]:
+    """
+    Rename spill files to .replay.{pid}.{name}, so exactly one process
+    replays each. Files claimed by a process that died are taken over.
+    """
+    claimed: List[str] = []
+    try:
+        file_names: List[str] = sorted(os.listdir(spill_dir))
+    except FileNotFoundError:
+        return claimed
+
+    current_pid: int = os.getpid()
+    for file_name in file_names:
+        if file_name.startswith('.replay.'):
+            owner_pid, _, spill_name = file_name[len('.replay.'):].partition('.')
+            if owner_pid == str(current_pid):
+                claimed.append(os.path.join(spill_dir, file_name))
+                continue
+            if not owner_pid.isdigit() or _pid_alive(int(owner_pid)):
+                continue
+        elif file_name.startswith(_SPILL_PREFIX) and file_name.endswith(_SPILL_SUFFIX):
+            spill_name = file_name
+        else:
+            continue
+
+        claimed_path: str = os.path.join(spill_dir, f".replay.{current_pid}.{spill_name}")
+        try:
+            os.rename(os.path.join(spill_dir, file_name), claimed_path)
+        except FileNotFoundError:
+            # Another process claimed it
+            continue
+        claimed.append(claimed_path)
+    return claimed
+
+
+def _read_spilled(path: str) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with open(path, encoding='utf-8') as spill_file:
+        for line in spill_file:
+            try:
+                row: Dict[str, Any] = json.loads(line)
+                row['changed_at'] = datetime.datetime.fromisoformat(row['changed_at'])
+                rows.append(row)
+            except (ValueError, KeyError) as e:
+                # Torn last line of a process killed mid-write
+                logger.error(f"Skipped broken change log row in {path}. Error: {e}")
+    return rows
+
+
+def _write_rows(rows: List[Dict[str, Any]]) -> int:
+    """
+    Bulk insert rows. If some row is rejected (e.g. value too long),
+    insert them one by one and drop the rejected ones, so they don't fail
+    the rest forever. All or nothing otherwise: any other error rolls back
+    rows inserted so far. Return number of rows written.
+    """
+    batch_size: int = getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE', 100)
+    try:
+        with transaction.atomic():
+            ConfigChangeLog.objects.bulk_create([ConfigChangeLog(**row) for row in rows],
+                                                batch_size=batch_size)
+        return len(rows)
+    except (DataError, IntegrityError) as e:
+        logger.error(f"Change log batch of {len(rows)} rows rejected, "
+                     f"writing row by row. Error: {e}")
+
+    written: int = 0
+    with transaction.atomic():
+        for row in rows:
+            try:
+                # Savepoint, rejected row doesn't roll back the others
+                with transaction.atomic():
+                    ConfigChangeLog.objects.create(**row)
+                written += 1
+            except (DataError, IntegrityError) as e:
+                logger.error(f"Dropped change log row of key {str(row.get('key'))[:100]!r} "
+                             f"changed at {row.get('changed_at')}. Error: {e}")
+    return written
+
+
+def flush() -> int:
+    """
+    Write buffered rows, then rows spilled to disk. Spill them if the
+    database fails. Return number of rows written to the database.
+    """
+    with _flush_lock:
+        with _buffer_lock:
+            rows: List[Dict[str, Any]] = list(_buffer)
+            del _buffer[:]
+
+        spill_dir: Optional[str] = _spill_dir()
+        written: int = 0
+        try:
+            if rows:
+                written += _write_rows(rows)
+                logger.debug(f"Wrote {written} change log rows to DB")
+        except Exception as e:
+            logger.error(f"Failed to write {len(rows)} change log rows. Error: {e}")
+            if spill_dir:
+                try:
+                    _spill(rows, spill_dir)
+                    return written
+                except OSError as spill_e:
+                    logger.error(f"Failed to spill change log rows to {spill_dir}. "
+                                 f"Error: {spill_e}")
+            with _buffer_lock:
+                _buffer[:0] = rows
+            return written
+
+        if spill_dir and (rows or time.monotonic() >= _next_replay_time):
+            written += _replay_spilled(spill_dir)
+        return written
+
+
+def _replay_spilled(spill_dir: str) -> int:
+    """
+    Write spilled rows to the database, a batch per transaction. If it fails,
+    claimed file keeps the rows not written yet and is retried after
+    _REPLAY_RETRY_INTERVAL. Call with _flush_lock held.
+    """
+    global _next_replay_time
+    batch_size: int = getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE', 100)
+    written: int = 0
+    for path in _claim_spilled(spill_dir):
+        file_written: int = 0
+        try:
+            rows: List[Dict[str, Any]] = _read_spilled(path)
+            for start in range(0, len(rows), batch_size):
+                file_written += _write_rows(rows[start:start + batch_size])
+                if start + batch_size < len(rows):
+                    _rewrite_spilled(path, rows[start + batch_size:])
+            os.unlink(path)
+        except OSError as e:
+            logger.error(f"Failed to read or update spilled change log {path}. Error: {e}")
+            written += file_written
+            continue
+        except Exception as e:
+            logger.error(f"Failed to replay spilled change log {path}, "
+                         f"{file_written} rows written. Error: {e}")
+            written += file_written
+            _next_replay_time = time.monotonic() + _REPLAY_RETRY_INTERVAL
+            break
+        written += file_written
+        logger.info(f"Replayed {file_written} spilled change log rows from {path}")
+    return written
+
+
+def run_writer() -> None:
+    """
+    Flush buffer on batch size or every REALTIME_CONFIG_CHANGE_LOG_FLUSH_INTERVAL.
+    """
+    flush_interval: float = getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_FLUSH_INTERVAL', 0.5)
+    logger.info(f"Change log writer started, flushing every {flush_interval}s")
+
+    while True:
+        _flush_requested.wait(flush_interval)
+        _flush_requested.clear()
+        # Long-running thread: drop connections that are broken or too old
+        close_old_connections()
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Unexpected error in change log writer: {e}", exc_info=True)
+
+
+def start_writer() -> None:
+    global _writer_thread
+    with _buffer_lock:
+        if _writer_thread is not None and _writer_thread.is_alive():
+            return
+        _writer_thread = threading.Thread(
+            target=run_writer,
+            daemon=True,
+            name="ConfigChangeLogWriter"
+        )
+        _writer_thread.start()
+    logger.info(f"Started change log writer thread (PID: {os.getpid()})")
+
+
+def flush_on_exit() -> None:
+    """
+    Flush before process exits. Rows that neither database nor spill dir
+    took are lost, log them.
+    """
+    with _buffer_lock:
+        if not _buffer:
+            return
+    try:
+        flush()
+    except Exception as e:
+        logger.error(f"Failed to flush change log on exit. Error: {e}", exc_info=True)
+
+    with _buffer_lock:
+        for row in _buffer:
+            logger.error(f"Lost change log row on exit: {row}")
+
+
+atexit.register(flush_on_exit)
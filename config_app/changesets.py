@@ -0,0 +1,146 @@
+"""
+Atomic multi-key config changes.
+
+apply_changeset() reads current values under WATCH and writes changed keys to
+constance's Redis keys and bumps the version counter in one MULTI/EXEC
+transaction, retried if a key changes in between. Then it publishes one changeset
+message with all of them under that version. Subscribers apply the whole set
+with one cache swap, so no reader sees half of it. Change log rows of the
+changeset are buffered together and written by one bulk insert.
+
+Constance admin form saves through it (see admin.py). config_updated signal
+is sent per changed key after the transaction, with changeset=True, so other
+receivers keep working; config_updated_handler skips those, the changeset
+message and change log rows replace them.
+"""
+
+import datetime
+import logging
+import time
+import redis
+from django.conf import settings
+from django.utils import timezone
+from constance import config, settings as constance_settings
+from constance.codecs import dumps, loads
+from constance.signals import config_updated
+
+from . import change_log_writer
+from .redis_client import get_redis_connection
+from .update_messages import encode_changeset, version_counter_key
+
+from typing import Any, Dict, List, Mapping, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Transaction attempts when watched keys keep changing
+_MAX_ATTEMPTS: int = 5
+
+
+def _uses_key_tracking() -> bool:
+    return getattr(settings, 'REALTIME_CONFIG_INVALIDATION_BACKEND', 'pubsub') == 'tracking'
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Naive datetimes are made aware with USE_TZ, as constance admin form does.
+    """
+    if settings.USE_TZ and isinstance(value, datetime.datetime) and timezone.is_naive(value):
+        return timezone.make_aware(value)
+    return value
+
+
+def apply_changeset(changes: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Set several configs at once. Keys whose value doesn't change are skipped.
+    Return previous values of changed keys.
+    Raise ValueError for keys not in CONSTANCE_CONFIG, RedisError if Redis fails
+    or keys keep changing (nothing is written then) or TypeError if a value
+    can't be serialized.
+    """
+    constance_defs: Mapping[str, Any] = getattr(settings, 'CONSTANCE_CONFIG', {})
+    unknown: List[str] = [key for key in changes if key not in constance_defs]
+    if unknown:
+        raise ValueError(f"Unknown config keys: {', '.join(unknown)}")
+    if not changes:
+        return {}
+
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if redis_client is None:
+        raise redis.exceptions.ConnectionError("No Redis connection to write changeset")
+
+    # None: subscribers are notified by Redis key tracking, nothing to publish
+    channel_name: Optional[str] = None
+    if not _uses_key_tracking():
+        channel_name = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+        if not channel_name:
+            raise ValueError("REDIS_PUB_SUB_CHANNEL not defined")
+
+    prefix: str = constance_settings.REDIS_PREFIX
+    keys: List[str] = list(changes)
+    redis_keys: List[str] = [f"{prefix}{key}" for key in keys]
+    new_values: Dict[str, Any] = {key: _normalize(changes[key]) for key in keys}
+
+    with redis_client.pipeline() as pipe:
+        for attempt in range(1, _MAX_ATTEMPTS + 1):
+            try:
+                # Old values can't change until EXEC, or it fails
+                pipe.watch(*redis_keys)
+                old_values: Dict[str, Any] = {
+                    key: _normalize(loads(raw) if raw is not None else constance_defs[key][0])
+                    for key, raw in zip(keys, pipe.mget(redis_keys))
+                }
+                values: Dict[str, Any] = {key: value for key, value in new_values.items()
+                                          if value != old_values[key]}
+                if not values:
+                    pipe.unwatch()
+                    return {}
+                serialized: Dict[str, str] = {key: dumps(value) for key, value in values.items()}
+
+                pipe.multi()
+                pipe.mset({f"{prefix}{key}": value for key, value in serialized.items()})
+                if channel_name is not None:
+                    pipe.incr(version_counter_key(channel_name))
+                results: List[Any] = pipe.execute()
+                break
+            except redis.exceptions.WatchError:
+                logger.info(f"Configs {', '.join(keys)} changed during changeset, "
+                            f"retrying (attempt {attempt})")
+        else:
+            raise redis.exceptions.WatchError(f"Configs {', '.join(keys)} kept changing, "
+                                              f"changeset not applied")
+
+    changed_old_values: Dict[str, Any] = {key: old_values[key] for key in values}
+    if channel_name is not None:
+        _publish(redis_client, channel_name, values, results[-1], changed_old_values)
+
+    change_log_writer.enqueue_many([(key, changed_old_values[key], value)
+                                    for key, value in values.items()])
+
+    for key, value in values.items():
+        config_updated.send(sender=config, key=key, old_value=changed_old_values[key],
+                            new_value=value, changeset=True)
+    return changed_old_values
+
+
+def _publish(redis_client: redis.Redis, channel_name: str, values: Dict[str, Any],
+             version: int, old_values: Dict[str, Any]) -> None:
+    """
+    Publish changeset message. Values are already written, so a failed
+    publish is logged, not raised.
+    """
+    try:
+        message: str = encode_changeset(values, version, published_at=time.time(),
+                                        old_values=old_values)
+        got_msg_count: int = redis_client.publish(channel_name, message)
+        logger.info(f"Published changeset of keys: {', '.join(values)} (version {version}) "
+                    f"to Redis channel '{channel_name}'. Subscribers notified: {got_msg_count}")
+
+        # For subscribers still on bare-key format during rolling upgrade
+        if getattr(settings, 'REDIS_PUB_SUB_LEGACY_PUBLISH', False):
+            for key in values:
+                redis_client.publish(channel_name, key)
+
+    except redis.exceptions.RedisError as e:
+        logger.error(f"Redis error during publishing changeset of keys: "
+                     f"{', '.join(values)}. Error: {e}", exc_info=True)
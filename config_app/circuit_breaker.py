@@ -0,0 +1,175 @@
+"""
+Circuit breaker for Redis with background health probing.
+
+- closed: requests go to Redis, failures are counted
+- open: requests fail fast, probe thread waits for backoff delay
+- half-open: probe thread checks Redis, requests still fail fast
+
+Request threads never run the probe, so they don't pay its latency.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from django.conf import settings
+
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+CLOSED: str = 'closed'
+OPEN: str = 'open'
+HALF_OPEN: str = 'half_open'
+
+_breakers: "weakref.WeakSet[CircuitBreaker]" = weakref.WeakSet()
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, probe: Callable[[], Any],
+                 on_trip: Optional[Callable[[], None]] = None):
+        """
+        probe: call that raises if the service is still unavailable.
+        on_trip: called every time breaker opens on request failures.
+        """
+        self.name: str = name
+        self._probe: Callable[[], Any] = probe
+        self._on_trip: Optional[Callable[[], None]] = on_trip
+        self._lock: threading.Lock = threading.Lock()
+        # Read without lock on request path
+        self._state: str = CLOSED
+        self._failures: int = 0
+        self._attempt: int = 0
+        self._next_probe_time: float = 0.0
+        self._trips: int = 0
+        self._probe_thread: Optional[threading.Thread] = None
+        _breakers.add(self)
+
+    @property
+    def state(self) -> str:
+        return self._state
+
+    def allow_request(self) -> bool:
+        """
+        True if requests may go to the service.
+        """
+        return self._state == CLOSED
+
+    def record_success(self) -> None:
+        if self._failures:
+            with self._lock:
+                self._failures = 0
+
+    def record_failure(self) -> None:
+        """
+        Count failed request, open breaker on
+        REDIS_BREAKER_FAILURE_THRESHOLD consecutive failures.
+        """
+        threshold: int = getattr(settings, 'REDIS_BREAKER_FAILURE_THRESHOLD', 1)
+        with self._lock:
+            if self._state != CLOSED:
+                return
+            self._failures += 1
+            if self._failures < threshold:
+                return
+            self._open_locked()
+            self._trips += 1
+        logger.warning(f"Circuit breaker '{self.name}' opened after "
+                       f"{self._failures} failures")
+        if self._on_trip is not None:
+            self._on_trip()
+
+    def reset(self) -> None:
+        """
+        Close breaker and forget failures. Probe thread exits on its own.
+        """
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._attempt = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self._state,
+                'failures': self._failures,
+                'trips': self._trips,
+                'next_probe_in': max(0.0, self._next_probe_time - time.monotonic())
+                                 if self._state != CLOSED else 0.0,
+            }
+
+    def _backoff_delay(self) -> float:
+        """
+        Exponential backoff from REDIS_RETRY_INTERVAL up to
+        REDIS_BREAKER_MAX_DELAY, with jitter so processes don't probe at once.
+        """
+        base_delay: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+        max_delay: float = getattr(settings, 'REDIS_BREAKER_MAX_DELAY', 60.0)
+        delay: float = min(max_delay, base_delay * (2 ** self._attempt))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _open_locked(self) -> None:
+        self._state = OPEN
+        self._next_probe_time = time.monotonic() + self._backoff_delay()
+        self._attempt += 1
+        if self._probe_thread is None or not self._probe_thread.is_alive():
+            self._probe_thread = threading.Thread(
+                target=self._run_probe,
+                daemon=True,
+                name=f"CircuitBreakerProbe-{self.name}"
+            )
+            self._probe_thread.start()
+
+    def _run_probe(self) -> None:
+        while True:
+            with self._lock:
+                if self._state == CLOSED:
+                    return
+                wait_time: float = self._next_probe_time - time.monotonic()
+            if wait_time > 0:
+                time.sleep(wait_time)
+                continue
+
+            with self._lock:
+                if self._state == CLOSED:
+                    return
+                self._state = HALF_OPEN
+
+            try:
+                self._probe()
+            except Exception as e:
+                with self._lock:
+                    if self._state == CLOSED:
+                        return
+                    self._open_locked()
+                logger.warning(f"Circuit breaker '{self.name}' probe failed, "
+                               f"next probe in {self.stats()['next_probe_in']:.1f}s. "
+                               f"Error: {e}")
+                continue
+
+            with self._lock:
+                self._state = CLOSED
+                self._failures = 0
+                self._attempt = 0
+            logger.info(f"Circuit breaker '{self.name}' closed, probe succeeded")
+            return
+
+
+def _reset_breakers_after_fork() -> None:
+    """
+    Probe thread doesn't survive fork, so a breaker open in parent would
+    never close in child. Child starts closed and trips again on its own
+    failures; the lock may have been held by a parent thread.
+    """
+    for breaker in list(_breakers):
+        breaker._lock = threading.Lock()
+        breaker._probe_thread = None
+        breaker._state = CLOSED
+        breaker._failures = 0
+        breaker._attempt = 0
+
+
+os.register_at_fork(after_in_child=_reset_breakers_after_fork)
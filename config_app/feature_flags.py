@@ -0,0 +1,204 @@
+"""
+Percentage rollout flags on top of realtime configs.
+
+Flag is a constance config of type 'rollout_flag' (see CONSTANCE_ADDITIONAL_FIELDS),
+stored as JSON string:
+{"percentage": 25.0, "allow": ["42"], "deny": ["7"], "salt": "NEW_CHECKOUT"}
+
+User is in the flag if listed in "allow" and not in "deny", or, if in neither,
+when user's bucket is below percentage. Bucket is a deterministic hash of salt
+and user ID in 0..9999, so the same users stay in as percentage grows, and a
+new salt reshuffles them. User IDs are compared as strings.
+
+Definition is read with get_config() (so scoped overrides apply) and compiled
+once per distinct definition string. Invalid definition disables the flag.
+"""
+
+import hashlib
+import json
+import logging
+from django import forms
+from django.core.exceptions import ValidationError
+
+from .log_utils import LogSampler
+from .realtime_config import get_config
+
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+BUCKETS: int = 10000
+
+# Compiled flags by definition string, bounded as overrides may add many
+_MAX_COMPILED: int = 1024
+_compiled: Dict[str, "RolloutFlag"] = {}
+_invalid_log_sampler: LogSampler = LogSampler()
+
+
+class RolloutFlag(NamedTuple):
+    # Users with bucket below threshold are in, 0..BUCKETS
+    threshold: int
+    allow: FrozenSet[str]
+    deny: FrozenSet[str]
+    # blake2b already fed with salt, copied per user
+    seed: Any
+
+
+def _seed(salt: str) -> Any:
+    return hashlib.blake2b(f"{salt}:".encode('utf-8'), digest_size=8)
+
+
+DISABLED: RolloutFlag = RolloutFlag(threshold=0, allow=frozenset(), deny=frozenset(),
+                                    seed=_seed(''))
+
+
+def _id_list(value: Any, name: str) -> FrozenSet[str]:
+    if not isinstance(value, list):
+        raise ValueError(f"'{name}' must be a list of user IDs")
+    return frozenset(str(user_id) for user_id in value)
+
+
+def parse_flag(definition: str) -> RolloutFlag:
+    """
+    Compile JSON flag definition. Raise ValueError if it's invalid.
+    """
+    data: Any = json.loads(definition)
+    if not isinstance(data, dict):
+        raise ValueError("Flag definition must be a JSON object")
+
+    percentage: Any = data.get('percentage', 0)
+    if isinstance(percentage, bool) or not isinstance(percentage, (int, float)) \
+            or not 0 <= percentage <= 100:
+        raise ValueError("'percentage' must be a number from 0 to 100")
+    salt: Any = data.get('salt', '')
+    if not isinstance(salt, str):
+        raise ValueError("'salt' must be a string")
+
+    return RolloutFlag(threshold=round(percentage * BUCKETS / 100),
+                       allow=_id_list(data.get('allow', []), 'allow'),
+                       deny=_id_list(data.get('deny', []), 'deny'),
+                       seed=_seed(salt))
+
+
+def flag_definition(percentage: float = 0, allow: Iterable[Any] = (),
+                    deny: Iterable[Any] = (), salt: str = '') -> str:
+    """
+    Build JSON flag definition, e.g. for config_updated scripts or defaults.
+    """
+    definition: str = json.dumps({'percentage': percentage,
+                                  'allow': [str(user_id) for user_id in allow],
+                                  'deny': [str(user_id) for user_id in deny],
+                                  'salt': salt})
+    parse_flag(definition)
+    return definition
+
+
+def get_flag(key: str, scope: Optional[Tuple[str, ...]] = None) -> RolloutFlag:
+    """
+    Compiled flag from cached config definition.
+    """
+    definition: Any = get_config(key, scope=scope)
+    flag: Optional[RolloutFlag] = _compiled.get(definition) \
+        if isinstance(definition, str) else None
+    if flag is not None:
+        return flag
+
+    try:
+        if not isinstance(definition, str):
+            raise ValueError(f"Flag definition must be a string, got {type(definition).__name__}")
+        flag = parse_flag(definition)
+    except ValueError as e:
+        if _invalid_log_sampler():
+            logger.error(f"Invalid rollout flag {key}, treating as disabled. Error: {e}")
+        return DISABLED
+
+    if len(_compiled) >= _MAX_COMPILED:
+        _compiled.clear()
+    _compiled[definition] = flag
+    return flag
+
+
+def bucket(flag: RolloutFlag, user_id: Any) -> int:
+    """
+    User's bucket in 0..BUCKETS-1 for flag's salt.
+    """
+    hasher: Any = flag.seed.copy()
+    hasher.update(str(user_id).encode('utf-8'))
+    return int.from_bytes(hasher.digest(), 'big') % BUCKETS
+
+
+def is_enabled(key: str, user_id: Any, scope: Optional[Tuple[str, ...]] = None) -> bool:
+    """
+    Whether flag is on for the user.
+    """
+    flag: RolloutFlag = get_flag(key, scope)
+    user: str = str(user_id)
+    if user in flag.deny:
+        return False
+    if user in flag.allow:
+        return True
+    return bucket(flag, user) < flag.threshold
+
+
+def evaluate_many(key: str, user_ids: Iterable[Any],
+                  scope: Optional[Tuple[str, ...]] = None) -> List[bool]:
+    """
+    Whether flag is on, for each of user_ids in order. Definition is read
+    once, and nothing is hashed at 0% or 100%.
+    """
+    flag: RolloutFlag = get_flag(key, scope)
+    users: List[str] = [str(user_id) for user_id in user_ids]
+    allow: FrozenSet[str] = flag.allow
+    deny: FrozenSet[str] = flag.deny
+    threshold: int = flag.threshold
+
+    if threshold <= 0:
+        return [user in allow and user not in deny for user in users]
+    if threshold >= BUCKETS:
+        return [user not in deny for user in users]
+
+    seed: Any = flag.seed
+    results: List[bool] = []
+    append: Any = results.append
+    for user in users:
+        if user in deny:
+            append(False)
+        elif user in allow:
+            append(True)
+        else:
+            hasher: Any = seed.copy()
+            hasher.update(user.encode('utf-8'))
+            append(int.from_bytes(hasher.digest(), 'big') % BUCKETS < threshold)
+    return results
+
+
+def enabled_users(key: str, user_ids: Iterable[Any],
+                  scope: Optional[Tuple[str, ...]] = None) -> List[Any]:
+    """
+    user_ids the flag is on for, e.g. to segment users in a Celery fan-out.
+    """
+    user_ids = list(user_ids)
+    return [user_id for user_id, enabled in zip(user_ids, evaluate_many(key, user_ids, scope))
+            if enabled]
+
+
+class RolloutFlagField(forms.CharField):
+    """
+    Constance admin field for 'rollout_flag' configs: validated, normalized JSON.
+    """
+
+    def __init__(self, **kwargs: Any) -> None:
+        kwargs.setdefault('widget', forms.Textarea(attrs={'rows': 3}))
+        super().__init__(**kwargs)
+
+    def clean(self, value: Any) -> str:
+        value = super().clean(value)
+        try:
+            parse_flag(value)
+            data: Mapping[str, Any] = json.loads(value)
+        except ValueError as e:
+            raise ValidationError(f"Invalid rollout flag: {e}") from e
+        return flag_definition(percentage=data.get('percentage', 0),
+                               allow=data.get('allow', []), deny=data.get('deny', []),
+                               salt=data.get('salt', ''))
@@ -0,0 +1,191 @@
+"""
+In-process fan-out of applied config updates to streaming clients
+(/api/configs/stream/ and /api/configs/updates/).
+
+Subscribers publish() every applied versioned update. Recent updates are kept
+in a ring buffer of REALTIME_CONFIG_STREAM_BACKLOG events, so a client that
+reconnects with the cursor it got last receives only the updates it missed.
+
+Cursor is the update version (global Pub/Sub version counter, valid in any
+process), or "~{pid}.{epoch}" for a snapshot taken after reset() before any
+versioned update, valid only in this process until the next reset().
+reset() is called on changes without versions: subscriber (re)subscribed,
+legacy bare-key message, key tracking invalidation, shared cache reload.
+
+When missed updates are unknown, the client needs a full snapshot instead:
+reset() since the cursor, cursor older than the backlog, or newer than this
+process has seen (version counter reset, or this process lags behind).
+
+Each client has a bounded asyncio.Queue, filled from subscriber thread or
+task with call_soon_threadsafe(). Updates of one changeset share a version
+and are queued together, so clients should only take the version as cursor
+after the last of them. None in the queue means "send snapshot",
+also put when a slow client's queue overflows.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from django.conf import settings
+
+from .update_messages import ConfigUpdate
+
+from typing import Any, Deque, List, NamedTuple, Optional, Set, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+class StreamEvent(NamedTuple):
+    version: int
+    key: str
+    value: Any
+    old_value: Any
+    # Unix time of publish, None if publisher didn't send it
+    published_at: Optional[float]
+
+
+class StreamSubscription(NamedTuple):
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Optional[StreamEvent]]"
+
+
+_lock: threading.Lock = threading.Lock()
+_events: Deque[StreamEvent] = deque()
+# Max version seen since last reset()
+_latest_version: int = 0
+# Clients at this version or later can resume from _events, None after reset()
+_floor_version: Optional[int] = None
+# Number of reset() calls, and whether _events still has all updates since the last
+_epoch: int = 0
+_epoch_complete: bool = True
+_subscriptions: Set[StreamSubscription] = set()
+
+
+def _deliver(queue: "asyncio.Queue[Optional[StreamEvent]]",
+             events: Optional[List[StreamEvent]]) -> None:
+    """
+    Runs in client's event loop. Events of one call are queued together.
+    Overflowed client gets snapshot instead.
+    """
+    if events is not None and queue.maxsize - queue.qsize() >= len(events):
+        for event in events:
+            queue.put_nowait(event)
+        return
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+def _notify(subscriptions: List[StreamSubscription],
+            events: Optional[List[StreamEvent]]) -> None:
+    for subscription in subscriptions:
+        try:
+            subscription.loop.call_soon_threadsafe(_deliver, subscription.queue, events)
+        except RuntimeError:
+            # Event loop closed without unsubscribe()
+            with _lock:
+                _subscriptions.discard(subscription)
+
+
+def publish(update: ConfigUpdate) -> None:
+    """
+    Record applied versioned update and send it to connected clients.
+    """
+    publish_many([update])
+
+
+def publish_many(updates: List[ConfigUpdate]) -> None:
+    """
+    Record applied versioned updates, e.g. keys of one changeset sharing
+    a version, and send them to connected clients at once.
+    """
+    global _latest_version, _floor_version, _epoch_complete
+    events: List[StreamEvent] = [
+        StreamEvent(version=update.version, key=update.key, value=update.value,
+                    old_value=update.old_value, published_at=update.published_at)
+        for update in updates if update.version is not None
+    ]
+    if not events:
+        return
+    backlog: int = max(len(events), getattr(settings, 'REALTIME_CONFIG_STREAM_BACKLOG', 1000))
+    with _lock:
+        if _floor_version is None:
+            # Updates before the first one after reset() went unseen
+            _floor_version = events[0].version - 1
+        while len(_events) + len(events) > backlog:
+            _floor_version = _events.popleft().version
+            _epoch_complete = False
+        _events.extend(events)
+        _latest_version = max(_latest_version, max(event.version for event in events))
+        subscriptions: List[StreamSubscription] = list(_subscriptions)
+    _notify(subscriptions, events)
+
+
+def reset() -> None:
+    """
+    Config changed in a way that can't be replayed from backlog:
+    connected and resuming clients get full snapshot.
+    """
+    global _latest_version, _floor_version, _epoch, _epoch_complete
+    with _lock:
+        _events.clear()
+        _latest_version = 0
+        _floor_version = None
+        _epoch += 1
+        _epoch_complete = True
+        subscriptions: List[StreamSubscription] = list(_subscriptions)
+    _notify(subscriptions, None)
+
+
+def _cursor_locked() -> str:
+    if _floor_version is None:
+        return f"~{os.getpid()}.{_epoch}"
+    return str(_latest_version)
+
+
+def _events_since_locked(cursor: Optional[str]) -> Optional[List[StreamEvent]]:
+    if not cursor:
+        return None
+    if cursor.startswith('~'):
+        if cursor == f"~{os.getpid()}.{_epoch}" and _epoch_complete:
+            return list(_events)
+        return None
+
+    try:
+        since: int = int(cursor)
+    except ValueError:
+        return None
+    if _floor_version is None or since < _floor_version or since > _latest_version:
+        return None
+    return [event for event in _events if event.version > since]
+
+
+def subscribe(cursor: Optional[str]) -> Tuple[StreamSubscription, Optional[List[StreamEvent]], str]:
+    """
+    Subscribe current event loop to updates. Return subscription, updates after
+    cursor (None if client needs snapshot) and current cursor.
+    Updates published after this call go to subscription queue.
+    """
+    queue_size: int = getattr(settings, 'REALTIME_CONFIG_STREAM_QUEUE_SIZE', 100)
+    subscription: StreamSubscription = StreamSubscription(
+        loop=asyncio.get_running_loop(), queue=asyncio.Queue(maxsize=max(1, queue_size)))
+    with _lock:
+        _subscriptions.add(subscription)
+        return subscription, _events_since_locked(cursor), _cursor_locked()
+
+
+def unsubscribe(subscription: StreamSubscription) -> None:
+    with _lock:
+        _subscriptions.discard(subscription)
+
+
+def current_cursor() -> str:
+    with _lock:
+        return _cursor_locked()
+
+
+def clients_count() -> int:
+    return len(_subscriptions)
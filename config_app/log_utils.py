@@ -0,0 +1,181 @@
+"""
+Low-overhead logging for config hot paths, used in production log mode
+(REALTIME_CONFIG_LOG_MODE, see settings):
+
+- QueueLogHandler: request threads only put records to a bounded queue,
+  a listener thread formats and writes them. Records are dropped, never
+  waited for, when the queue is full.
+- LogSampler: lets one of every REALTIME_CONFIG_LOG_SAMPLE_EVERY
+  high-frequency events be logged.
+- Activity summary thread: logs config cache counters (hits, misses,
+  fallbacks...) per REALTIME_CONFIG_LOG_SUMMARY_INTERVAL instead of
+  per-call lines, from metrics.
+
+Formatting in hot paths should still be guarded with logger.isEnabledFor().
+"""
+
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+from django.conf import settings
+
+from . import metrics
+
+from typing import Any, Dict, Iterator, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_handlers: weakref.WeakSet["QueueLogHandler"] = weakref.WeakSet()
+_summary_thread: Optional[threading.Thread] = None
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler: records go to a bounded queue, written to stream
+    (stderr by default) by listener thread. Formatter set in LOGGING is used
+    by the listener. Listener is restarted in forked children.
+    """
+
+    def __init__(self, stream: Any = None, queue_size: int = 10000) -> None:
+        # Same object as self.queue, typed as queue.Queue for join() / maxsize
+        self.records: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=queue_size)
+        super().__init__(self.records)
+        self.target: logging.StreamHandler = logging.StreamHandler(stream or sys.stderr)
+        self.dropped: int = 0
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._start_listener()
+        _handlers.add(self)
+
+    def _start_listener(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.records, self.target,
+                                                       respect_handler_level=True)
+        self.listener.start()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Formatting is left to the listener. Only args are merged now,
+        as they may be mutated later.
+        """
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """
+        Wait until queued records are written.
+        """
+        listener: Optional[logging.handlers.QueueListener] = self.listener
+        if listener is not None and listener._thread is not None:
+            self.records.join()
+        self.target.flush()
+
+    def close(self) -> None:
+        listener: Optional[logging.handlers.QueueListener] = self.listener
+        self.listener = None
+        if listener is not None and listener._thread is not None:
+            listener.stop()
+        _handlers.discard(self)
+        super().close()
+
+
+def _restart_listeners_after_fork() -> None:
+    """
+    Listener threads don't survive fork. Records queued in parent
+    are the parent's to write.
+    """
+    for handler in list(_handlers):
+        handler.records = queue.Queue(maxsize=handler.records.maxsize)
+        handler.queue = handler.records
+        handler.dropped = 0
+        handler._start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_listeners_after_fork)
+
+
+def flush_handlers() -> None:
+    """
+    Write queued records, e.g. before a process exits without atexit.
+    """
+    for handler in list(_handlers):
+        try:
+            handler.flush()
+        except Exception:
+            pass
+
+
+class LogSampler:
+    """
+    True for one of every REALTIME_CONFIG_LOG_SAMPLE_EVERY calls,
+    starting with the first. Takes no lock.
+    """
+
+    def __init__(self) -> None:
+        self._counter: Iterator[int] = itertools.count()
+
+    def __call__(self) -> bool:
+        every: int = getattr(settings, 'REALTIME_CONFIG_LOG_SAMPLE_EVERY', 1)
+        return every <= 1 or next(self._counter) % every == 0
+
+
+def log_summary(previous: Dict[str, int], interval: float) -> Dict[str, int]:
+    """
+    Log metrics counters increase since previous counters, if any.
+    Return current counters.
+    """
+    counters: Dict[str, int] = metrics.collect()['counters']
+    changes: Dict[str, int] = {name: value - previous.get(name, 0)
+                               for name, value in counters.items()}
+    if any(changes.values()):
+        logger.info(f"Config activity in last {interval:g}s (PID: {os.getpid()}): " +
+                    ", ".join(f"{name.removesuffix('_total')}={value}"
+                              for name, value in changes.items()))
+    return counters
+
+
+def run_log_summary(interval: float) -> None:
+    previous: Dict[str, int] = metrics.collect()['counters']
+    while True:
+        time.sleep(interval)
+        try:
+            previous = log_summary(previous, interval)
+        except Exception as e:
+            logger.error(f"Failed to log config activity summary. Error: {e}")
+
+
+def start_log_summary() -> None:
+    """
+    Start activity summary thread if REALTIME_CONFIG_LOG_SUMMARY_INTERVAL is set.
+    """
+    global _summary_thread
+    interval: Optional[float] = getattr(settings, 'REALTIME_CONFIG_LOG_SUMMARY_INTERVAL', None)
+    if not interval:
+        return
+    if _summary_thread is not None and _summary_thread.is_alive():
+        return
+
+    _summary_thread = threading.Thread(
+        target=run_log_summary,
+        args=(interval,),
+        daemon=True,
+        name="RealtimeConfigLogSummary"
+    )
+    _summary_thread.start()
+    logger.info(f"Started config activity summary thread (PID: {os.getpid()})")
@@ -0,0 +1,307 @@
+"""
+Benchmark realtime_config hot paths, print results as JSON.
+
+python manage.py benchmark_realtime_config [--fakeredis] [--output results.json]
+"""
+
+import json
+import logging
+import os
+import platform
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.test import override_settings
+from constance import config as constance_config
+from constance.codecs import dumps
+
+from typing import Any, Callable, Dict, Iterator, List
+
+from config_app import realtime_config
+from config_app.circuit_breaker import CircuitBreaker
+from config_app.update_messages import encode_update
+
+
+def _latency_stats(samples_s: List[float]) -> Dict[str, float]:
+    """
+    Latency percentiles in microseconds, interpolated between samples
+    (never beyond max). Empty if there are no samples.
+    """
+    samples_us: List[float] = sorted(sample * 1e6 for sample in samples_s)
+    if not samples_us:
+        return {}
+    # quantiles() needs 2 points, one sample is every percentile
+    quantiles: List[float] = statistics.quantiles(samples_us, n=100, method='inclusive') \
+        if len(samples_us) > 1 else samples_us * 99
+    return {
+        'samples': len(samples_us),
+        'mean_us': round(statistics.fmean(samples_us), 2),
+        'p50_us': round(quantiles[49], 2),
+        'p95_us': round(quantiles[94], 2),
+        'p99_us': round(quantiles[98], 2),
+        'max_us': round(samples_us[-1], 2),
+    }
+
+
+def _reset_cache() -> None:
+    realtime_config.clear_cache()
+    realtime_config._reset_versions()
+    realtime_config.redis_breaker.reset()
+
+
+def _wait_for(condition: Callable[[], bool], timeout: float) -> bool:
+    deadline: float = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0)
+    return True
+
+
+class Command(BaseCommand):
+    help = ("Benchmark realtime_config: cache hit throughput, miss latency, "
+            "fail-fast fallback cost and publish-to-invalidation time. "
+            "Uses Redis from settings, or in-process fakeredis with --fakeredis.")
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--threads', type=int, default=8,
+                            help="Max number of threads for hit throughput (1, 2, 4... up to it)")
+        parser.add_argument('--iterations', type=int, default=200000,
+                            help="get_config() calls per hit throughput run")
+        parser.add_argument('--samples', type=int, default=200,
+                            help="Samples per latency measurement")
+        parser.add_argument('--fakeredis', action='store_true',
+                            help="Run against in-process fakeredis instead of Redis server")
+        parser.add_argument('--output', type=str, default=None,
+                            help="Write JSON results to file instead of stdout")
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+        if not keys:
+            raise CommandError("CONSTANCE_CONFIG is empty, nothing to benchmark")
+        if options['samples'] < 2:
+            raise CommandError("--samples must be at least 2 to compute percentiles")
+
+        # Fallback path logs a warning per call, which would be measured instead
+        config_logger: logging.Logger = logging.getLogger('config_app')
+        saved_level: int = config_logger.level
+        config_logger.setLevel(logging.ERROR)
+
+        # Own channel, so other processes don't get benchmark updates
+        channel_name: str = f"{getattr(settings, 'REDIS_PUB_SUB_CHANNEL', 'realtime_config_updates')}" \
+                            f":benchmark:{os.getpid()}"
+        try:
+            # Acks would go to Redis from settings even with --fakeredis
+            with override_settings(REDIS_PUB_SUB_CHANNEL=channel_name,
+                                   REALTIME_CONFIG_PROPAGATION_ACKS=False), \
+                 self._redis(options['fakeredis']):
+                realtime_config.load_defaults()
+                results: Dict[str, Any] = {
+                    'hit_throughput': self._bench_hits(keys[0], options['threads'],
+                                                       options['iterations']),
+                    'miss_latency': self._bench_misses(keys[0], options['samples']),
+                    'batch_miss_latency': self._bench_batch_misses(keys, options['samples']),
+                    'fallback': self._bench_fallback(keys[0], options['iterations']),
+                    'publish_to_apply': self._bench_publish(keys[0], channel_name,
+                                                            options['samples']),
+                }
+        finally:
+            config_logger.setLevel(saved_level)
+            _reset_cache()
+
+        report: Dict[str, Any] = {
+            'meta': {
+                'timestamp': time.time(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'pid': os.getpid(),
+                'redis': 'fakeredis' if options['fakeredis'] else 'server',
+                'keys': len(keys),
+            },
+            'results': results,
+        }
+        output: str = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+            self.stderr.write(f"Benchmark results written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+    @contextmanager
+    def _redis(self, use_fakeredis: bool) -> Iterator[None]:
+        """
+        Point constance backend and realtime_config at fakeredis if asked.
+        """
+        if not use_fakeredis:
+            yield
+            return
+
+        try:
+            import fakeredis
+        except ImportError:
+            raise CommandError("--fakeredis requires fakeredis package "
+                               "(pip install fakeredis)") from None
+
+        server: Any = fakeredis.FakeServer()
+        backend: Any = constance_config._backend
+        saved_client: Any = backend._rd
+        saved_get_connection: Callable[[], Any] = realtime_config.get_redis_connection
+        saved_get_pubsub_connection: Callable[[], Any] = realtime_config.get_pubsub_connection
+
+        backend._rd = fakeredis.FakeRedis(server=server)
+        # Constance writes missing keys on read, that would fire config_updated
+        for key, options in getattr(settings, 'CONSTANCE_CONFIG', {}).items():
+            backend._rd.set(backend.add_prefix(key), dumps(options[0]))
+        realtime_config.get_redis_connection = \
+            lambda: fakeredis.FakeRedis(server=server)  # type: ignore[assignment]
+        realtime_config.get_pubsub_connection = \
+            lambda: fakeredis.FakeRedis(server=server)  # type: ignore[assignment]
+        try:
+            yield
+        finally:
+            backend._rd = saved_client
+            realtime_config.get_redis_connection = saved_get_connection  # type: ignore[assignment]
+            realtime_config.get_pubsub_connection = saved_get_pubsub_connection  # type: ignore[assignment]
+
+    def _bench_hits(self, key: str, max_threads: int, iterations: int) -> List[Dict[str, Any]]:
+        """
+        get_config() cache hit throughput with 1, 2, 4... max_threads threads.
+        """
+        _reset_cache()
+        realtime_config.get_config(key)
+
+        results: List[Dict[str, Any]] = []
+        thread_counts: List[int] = []
+        threads_count: int = 1
+        while threads_count < max_threads:
+            thread_counts.append(threads_count)
+            threads_count *= 2
+        thread_counts.append(max_threads)
+
+        for threads_count in thread_counts:
+            per_thread: int = max(1, iterations // threads_count)
+            barrier: threading.Barrier = threading.Barrier(threads_count + 1)
+
+            def work() -> None:
+                get_config: Callable[..., Any] = realtime_config.get_config
+                barrier.wait()
+                for _ in range(per_thread):
+                    get_config(key)
+
+            threads: List[threading.Thread] = [threading.Thread(target=work)
+                                               for _ in range(threads_count)]
+            for thread in threads:
+                thread.start()
+            barrier.wait()
+            start_time: float = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed: float = time.perf_counter() - start_time
+
+            total: int = per_thread * threads_count
+            results.append({
+                'threads': threads_count,
+                'calls': total,
+                'ops_per_s': round(total / elapsed),
+                'ns_per_op': round(elapsed / total * 1e9, 1),
+            })
+        return results
+
+    def _bench_misses(self, key: str, samples: int) -> Dict[str, float]:
+        """
+        get_config() latency on cache miss (one Redis round trip).
+        """
+        _reset_cache()
+        timings: List[float] = []
+        for _ in range(samples):
+            realtime_config.clear_cache()
+            start_time: float = time.perf_counter()
+            realtime_config.get_config(key)
+            timings.append(time.perf_counter() - start_time)
+        return _latency_stats(timings)
+
+    def _bench_batch_misses(self, keys: List[str], samples: int) -> Dict[str, float]:
+        """
+        get_configs() latency for all keys on empty cache (one MGET).
+        """
+        _reset_cache()
+        timings: List[float] = []
+        for _ in range(samples):
+            realtime_config.clear_cache()
+            start_time: float = time.perf_counter()
+            realtime_config.get_configs(keys)
+            timings.append(time.perf_counter() - start_time)
+        return _latency_stats(timings)
+
+    def _bench_fallback(self, key: str, iterations: int) -> Dict[str, Any]:
+        """
+        get_config() cost on cache miss with Redis circuit breaker open.
+        """
+        _reset_cache()
+        saved_breaker: CircuitBreaker = realtime_config.redis_breaker
+
+        def fail() -> None:
+            raise ConnectionError("benchmark")
+
+        # Probe is far away, breaker stays open for the whole run
+        with override_settings(REDIS_RETRY_INTERVAL=3600.0, REDIS_BREAKER_MAX_DELAY=3600.0):
+            realtime_config.redis_breaker = CircuitBreaker('benchmark', probe=fail)
+            realtime_config.redis_breaker.record_failure()
+            try:
+                calls: int = max(1, iterations // 10)
+                start_time: float = time.perf_counter()
+                for _ in range(calls):
+                    realtime_config.get_config(key)
+                elapsed: float = time.perf_counter() - start_time
+            finally:
+                realtime_config.redis_breaker = saved_breaker
+
+        return {
+            'calls': calls,
+            'ns_per_op': round(elapsed / calls * 1e9, 1),
+        }
+
+    def _bench_publish(self, key: str, channel_name: str, samples: int) -> Dict[str, Any]:
+        """
+        Time from publish to the update applied by run_subscriber(),
+        for versioned messages and legacy bare-key invalidations.
+        """
+        _reset_cache()
+        redis_client: Any = realtime_config.get_redis_connection()
+        if redis_client is None:
+            raise CommandError("No Redis connection for publish benchmark")
+
+        threading.Thread(target=realtime_config.run_subscriber, daemon=True,
+                         name="BenchmarkSubscriber").start()
+        if not _wait_for(lambda: redis_client.pubsub_numsub(channel_name)[0][1] > 0, 5.0):
+            raise CommandError(f"Subscriber didn't subscribe to {channel_name}")
+
+        value: Any = realtime_config.get_config(key)
+        apply_timings: List[float] = []
+        invalidate_timings: List[float] = []
+        lost: int = 0
+
+        for version in range(1, samples + 1):
+            start_time: float = time.perf_counter()
+            redis_client.publish(channel_name, encode_update(key, value, version))
+            if _wait_for(lambda: realtime_config._key_versions.get(key) == version, 1.0):
+                apply_timings.append(time.perf_counter() - start_time)
+            else:
+                lost += 1
+
+            start_time = time.perf_counter()
+            redis_client.publish(channel_name, key)
+            if _wait_for(lambda: key not in realtime_config._local_cache, 1.0):
+                invalidate_timings.append(time.perf_counter() - start_time)
+            else:
+                lost += 1
+
+        return {
+            'versioned_apply': _latency_stats(apply_timings),
+            'bare_key_invalidate': _latency_stats(invalidate_timings),
+            'lost_messages': lost,
+        }
@@ -0,0 +1,450 @@
+"""
+Low-overhead realtime_config metrics with Prometheus text exposition.
+
+Counters and histograms are recorded into per-thread shards, so recording
+takes no lock: each thread only writes its own shard, collect() sums them.
+Hot paths may increment thread_local.shard.counters directly, falling back
+to inc() on AttributeError, to save a function call.
+Gauges are callables evaluated at collect time.
+
+With REALTIME_CONFIG_METRICS_DIR set, every process periodically writes its
+metrics to {dir}/metrics_{pid}.json and the endpoint sums all of them, so
+metrics are aggregated across gunicorn workers. Counters of exited workers
+are kept (they stay monotonic): on scrape, files of dead PIDs are folded into
+{dir}/dead_processes.json and deleted, as prometheus_client's
+mark_process_dead() does, so the directory doesn't grow with every restarted
+worker. Gauges are reported for live workers only. The directory must not be
+shared between hosts or containers, as PIDs are checked locally.
+Empty it on deploy start.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_PREFIX: str = 'realtime_config'
+
+# Counter indexes for inc()
+CACHE_HITS: int = 0
+CACHE_MISSES: int = 1
+FALLBACKS: int = 2
+INVALIDATIONS: int = 3
+SUBSCRIBER_RECONNECTS: int = 4
+BREAKER_TRIPS: int = 5
+
+COUNTERS: Dict[int, Any] = {
+    CACHE_HITS: ('cache_hits_total', "get_config() calls served from local cache"),
+    CACHE_MISSES: ('cache_misses_total', "get_config() calls that missed local cache"),
+    FALLBACKS: ('fallbacks_total', "Values returned from defaults instead of Redis"),
+    INVALIDATIONS: ('invalidations_total', "Cache entries updated or invalidated by push"),
+    SUBSCRIBER_RECONNECTS: ('subscriber_reconnects_total',
+                            "Subscriber reconnects to Redis after connection loss"),
+    BREAKER_TRIPS: ('breaker_trips_total', "Redis circuit breaker openings"),
+}
+
+# Histogram indexes for observe()
+FETCH_DURATION: int = 0
+PROPAGATION_DURATION: int = 1
+
+HISTOGRAMS: Dict[int, Any] = {
+    FETCH_DURATION: ('fetch_duration_seconds', "Duration of config fetches from Redis"),
+    PROPAGATION_DURATION: ('propagation_duration_seconds',
+                           "Time from config update publish to apply in this process"),
+}
+
+BUCKETS: List[float] = [0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+
+class _Shard:
+    """
+    Metrics of one thread. Written only by its thread.
+    """
+    __slots__ = ('thread', 'counters', 'buckets', 'sums')
+
+    def __init__(self) -> None:
+        self.thread: weakref.ref[threading.Thread] = weakref.ref(threading.current_thread())
+        self.counters: List[int] = [0] * len(COUNTERS)
+        # Last bucket is +Inf
+        self.buckets: List[List[int]] = [[0] * (len(BUCKETS) + 1) for _ in HISTOGRAMS]
+        self.sums: List[float] = [0.0] * len(HISTOGRAMS)
+
+
+thread_local: threading.local = threading.local()
+_shards: List[_Shard] = []
+# Totals of shards whose threads exited
+_retired: _Shard = _Shard()
+_shards_lock: threading.Lock = threading.Lock()
+
+_gauges: Dict[str, Any] = {}
+
+_writer_thread: Optional[threading.Thread] = None
+
+# Summed counters and histograms of exited processes in metrics directory
+_DEAD_FILE_NAME: str = 'dead_processes.json'
+
+
+def _retire_dead_locked() -> None:
+    """
+    Fold shards of exited threads into _retired. Call with _shards_lock held.
+    """
+    alive: List[_Shard] = []
+    for shard in _shards:
+        thread: Optional[threading.Thread] = shard.thread()
+        if thread is not None and thread.is_alive():
+            alive.append(shard)
+            continue
+        for index, value in enumerate(shard.counters):
+            _retired.counters[index] += value
+        for index, buckets in enumerate(shard.buckets):
+            for bucket, value in enumerate(buckets):
+                _retired.buckets[index][bucket] += value
+            _retired.sums[index] += shard.sums[index]
+    _shards[:] = alive
+
+
+def _new_shard() -> _Shard:
+    shard: _Shard = _Shard()
+    with _shards_lock:
+        _retire_dead_locked()
+        _shards.append(shard)
+    thread_local.shard = shard
+    return shard
+
+
+def inc(counter: int, amount: int = 1) -> None:
+    try:
+        thread_local.shard.counters[counter] += amount
+    except AttributeError:
+        _new_shard().counters[counter] += amount
+
+
+def observe(histogram: int, seconds: float) -> None:
+    try:
+        shard: _Shard = thread_local.shard
+    except AttributeError:
+        shard = _new_shard()
+    shard.buckets[histogram][bisect_left(BUCKETS, seconds)] += 1
+    shard.sums[histogram] += seconds
+
+
+def register_gauge(name: str, help_text: str, value: Callable[[], float]) -> None:
+    """
+    Gauge value is taken from callable on every collect().
+    """
+    _gauges[name] = (help_text, value)
+
+
+def _reset_after_fork() -> None:
+    """
+    Child process starts from zero, its parent's metrics are the parent's.
+    Forking thread's shard is zeroed in place, as hot paths reference it.
+    """
+    global _retired, _shards_lock, _writer_thread
+    _shards.clear()
+    shard: Optional[_Shard] = getattr(thread_local, 'shard', None)
+    if shard is not None:
+        shard.thread = weakref.ref(threading.current_thread())
+        shard.counters[:] = [0] * len(COUNTERS)
+        shard.buckets[:] = [[0] * (len(BUCKETS) + 1) for _ in HISTOGRAMS]
+        shard.sums[:] = [0.0] * len(HISTOGRAMS)
+        _shards.append(shard)
+    _retired = _Shard()
+    _shards_lock = threading.Lock()
+    _writer_thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def collect() -> Dict[str, Any]:
+    """
+    Metrics of this process summed over threads.
+    """
+    with _shards_lock:
+        _retire_dead_locked()
+        shards: List[_Shard] = [_retired] + list(_shards)
+
+    counters: Dict[str, int] = {}
+    for index, (name, _) in COUNTERS.items():
+        counters[name] = sum(shard.counters[index] for shard in shards)
+
+    histograms: Dict[str, Dict[str, Any]] = {}
+    for index, (name, _) in HISTOGRAMS.items():
+        histograms[name] = {
+            'buckets': [sum(values) for values in
+                        zip(*(shard.buckets[index] for shard in shards))],
+            'sum': sum(shard.sums[index] for shard in shards),
+        }
+
+    gauges: Dict[str, float] = {}
+    for name, (_, value) in list(_gauges.items()):
+        try:
+            gauges[name] = float(value())
+        except Exception as e:
+            logger.debug(f"Failed to collect gauge {name}. Error: {e}")
+
+    return {'pid': os.getpid(), 'counters': counters,
+            'histograms': histograms, 'gauges': gauges}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_metrics_file(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Parsed metrics file, None if it's gone or broken.
+    """
+    try:
+        with open(path) as metrics_file:
+            process: Dict[str, Any] = json.load(metrics_file)
+        return process
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read metrics file {path}. Error: {e}")
+        return None
+
+
+def _file_pid(file_name: str) -> Optional[int]:
+    """
+    PID of metrics_{pid}.json file, None for other files.
+    """
+    if not (file_name.startswith('metrics_') and file_name.endswith('.json')):
+        return None
+    try:
+        return int(file_name[len('metrics_'):-len('.json')])
+    except ValueError:
+        return None
+
+
+def _add_process(total: Dict[str, Any], process: Dict[str, Any]) -> None:
+    """
+    Add counters and histograms of process to total, in place.
+    """
+    for name, value in process.get('counters', {}).items():
+        total['counters'][name] = total['counters'].get(name, 0) + value
+    for name, histogram in process.get('histograms', {}).items():
+        summed: Optional[Dict[str, Any]] = total['histograms'].get(name)
+        if summed is None:
+            total['histograms'][name] = {'buckets': list(histogram['buckets']),
+                                         'sum': histogram['sum']}
+        elif len(summed['buckets']) == len(histogram['buckets']):
+            summed['buckets'] = [a + b for a, b in zip(summed['buckets'], histogram['buckets'])]
+            summed['sum'] += histogram['sum']
+
+
+@contextmanager
+def _locked_dir(metrics_dir: str) -> Iterator[None]:
+    """
+    Hold exclusive flock of metrics directory, so concurrent scrapes don't
+    fold a file twice or read it while it's being folded.
+    """
+    lock_fd: int = os.open(os.path.join(metrics_dir, '.metrics.lock'),
+                           os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(lock_fd)
+
+
+def _fold_dead_processes(metrics_dir: str, file_names: List[str]) -> None:
+    """
+    Add metrics files of dead processes to dead_processes.json and delete them.
+    Call with _locked_dir() held.
+    """
+    dead_path: str = os.path.join(metrics_dir, _DEAD_FILE_NAME)
+    total: Dict[str, Any] = _read_metrics_file(dead_path) or \
+        {'pid': None, 'counters': {}, 'histograms': {}, 'gauges': {}}
+    folded: List[str] = []
+    for file_name in file_names:
+        path: str = os.path.join(metrics_dir, file_name)
+        process: Optional[Dict[str, Any]] = _read_metrics_file(path)
+        if process is not None:
+            _add_process(total, process)
+            folded.append(path)
+    if not folded:
+        return
+    _write_json(metrics_dir, dead_path, total)
+    for path in folded:
+        os.unlink(path)
+    logger.info(f"Folded metrics of {len(folded)} exited processes into {dead_path}")
+
+
+def _read_process_metrics(metrics_dir: str) -> List[Dict[str, Any]]:
+    """
+    Metrics files of other processes, current process is collected live.
+    Files of dead processes are folded into dead_processes.json first.
+    """
+    current_pid: int = os.getpid()
+    processes: List[Dict[str, Any]] = [collect()]
+    try:
+        with _locked_dir(metrics_dir):
+            pids: Dict[str, int] = {}
+            for file_name in os.listdir(metrics_dir):
+                pid: Optional[int] = _file_pid(file_name)
+                if pid is not None and pid != current_pid:
+                    pids[file_name] = pid
+            dead: List[str] = [file_name for file_name, pid in pids.items()
+                               if not _pid_alive(pid)]
+            if dead:
+                try:
+                    _fold_dead_processes(metrics_dir, dead)
+                except OSError as e:
+                    logger.error(f"Failed to fold metrics of exited processes in "
+                                 f"{metrics_dir}. Error: {e}")
+
+            for file_name in [_DEAD_FILE_NAME] + list(pids):
+                process: Optional[Dict[str, Any]] = _read_metrics_file(
+                    os.path.join(metrics_dir, file_name))
+                if process is not None:
+                    processes.append(process)
+    except OSError as e:
+        logger.error(f"Failed to read metrics directory {metrics_dir}. Error: {e}")
+    return processes
+
+
+def collect_all() -> List[Dict[str, Any]]:
+    """
+    Metrics of all processes sharing REALTIME_CONFIG_METRICS_DIR,
+    or only of this process if it's not set.
+    """
+    metrics_dir: Optional[str] = getattr(settings, 'REALTIME_CONFIG_METRICS_DIR', None)
+    if not metrics_dir:
+        return [collect()]
+    return _read_process_metrics(metrics_dir)
+
+
+def render(processes: List[Dict[str, Any]]) -> str:
+    """
+    Prometheus text format: counters and histograms summed over processes,
+    gauges per live process with pid label.
+    """
+    lines: List[str] = []
+
+    for name, help_text in COUNTERS.values():
+        total: int = sum(process['counters'].get(name, 0) for process in processes)
+        lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {_PREFIX}_{name} counter")
+        lines.append(f"{_PREFIX}_{name} {total}")
+
+    for name, help_text in HISTOGRAMS.values():
+        buckets: List[int] = [0] * (len(BUCKETS) + 1)
+        total_sum: float = 0.0
+        for process in processes:
+            histogram: Optional[Dict[str, Any]] = process['histograms'].get(name)
+            if not histogram or len(histogram['buckets']) != len(buckets):
+                continue
+            buckets = [a + b for a, b in zip(buckets, histogram['buckets'])]
+            total_sum += histogram['sum']
+
+        lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {_PREFIX}_{name} histogram")
+        cumulative: int = 0
+        for bound, count in zip(BUCKETS + ['+Inf'], buckets):
+            cumulative += count
+            lines.append(f'{_PREFIX}_{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f"{_PREFIX}_{name}_sum {total_sum}")
+        lines.append(f"{_PREFIX}_{name}_count {cumulative}")
+
+    live: List[Dict[str, Any]] = [process for process in processes
+                                  if process['pid'] is not None and _pid_alive(process['pid'])]
+    for name, (help_text, _) in list(_gauges.items()):
+        lines.append(f"# HELP {_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {_PREFIX}_{name} gauge")
+        for process in live:
+            if name in process['gauges']:
+                lines.append(f'{_PREFIX}_{name}{{pid="{process["pid"]}"}} '
+                             f'{process["gauges"][name]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _write_json(metrics_dir: str, path: str, data: Dict[str, Any]) -> None:
+    """
+    Atomically replace metrics file.
+    """
+    payload: str = json.dumps(data)
+    fd, tmp_path = tempfile.mkstemp(dir=metrics_dir, prefix='.metrics.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as tmp_file:
+            tmp_file.write(payload)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_process_metrics(metrics_dir: str) -> None:
+    """
+    Atomically replace this process's metrics file.
+    """
+    _write_json(metrics_dir, os.path.join(metrics_dir, f"metrics_{os.getpid()}.json"),
+                collect())
+
+
+def run_metrics_writer(metrics_dir: str) -> None:
+    """
+    Write this process's metrics every REALTIME_CONFIG_METRICS_INTERVAL seconds.
+    """
+    interval: float = getattr(settings, 'REALTIME_CONFIG_METRICS_INTERVAL', 5.0)
+    logger.info(f"Metrics writer started, writing to {metrics_dir} every {interval}s")
+
+    while True:
+        try:
+            write_process_metrics(metrics_dir)
+        except Exception as e:
+            logger.error(f"Failed to write metrics to {metrics_dir}. Error: {e}")
+        time.sleep(interval)
+
+
+def start_metrics_writer() -> None:
+    """
+    Start metrics writer thread if REALTIME_CONFIG_METRICS_DIR is set.
+    """
+    global _writer_thread
+    metrics_dir: Optional[str] = getattr(settings, 'REALTIME_CONFIG_METRICS_DIR', None)
+    if not metrics_dir:
+        return
+
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+
+    try:
+        os.makedirs(metrics_dir, exist_ok=True)
+    except OSError as e:
+        logger.error(f"Failed to create metrics directory {metrics_dir}. Error: {e}")
+        return
+
+    _writer_thread = threading.Thread(
+        target=run_metrics_writer,
+        args=(metrics_dir,),
+        daemon=True,
+        name="RealtimeConfigMetricsWriter"
+    )
+    _writer_thread.start()
+    logger.info(f"Started metrics writer thread (PID: {os.getpid()})")
@@ -1,20 +1,75 @@
 import logging
 import os
 
-from typing import Callable
+from typing import Awaitable, Callable, Union, cast
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpRequest, HttpResponse
 
+from . import realtime_config
+from .log_utils import LogSampler
+
 logger = logging.getLogger(__name__)
 
 
+# get_response of a middleware, sync or async
+GetResponse = Callable[[HttpRequest], Union[HttpResponse, Awaitable[HttpResponse]]]
+
+
 class LogRequestPIDMiddleware:
-    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+    """
+    Log PID per request, 1 of every REALTIME_CONFIG_LOG_SAMPLE_EVERY requests.
+    Sync and async capable, so it doesn't add a thread hop under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: GetResponse):
         self.get_response = get_response
+        self.sampler = LogSampler()
+        self.is_async: bool = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def _log(self, request: HttpRequest) -> None:
+        if logger.isEnabledFor(logging.INFO) and self.sampler():
+            logger.info(f"MIDDLEWARE - PID {os.getpid()} - request {request.method} {request.path}")
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if self.is_async:
+            return self.__acall__(request)
+        self._log(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        self._log(request)
+        response: HttpResponse = await cast(Awaitable[HttpResponse], self.get_response(request))
+        return response
+
+
+class ConfigSnapshotMiddleware:
+    """
+    Pin one config snapshot per request, so the whole request sees
+    consistent config values and get_config() is a plain dict lookup.
+    The snapshot is built on the first config read, requests reading
+    no configs don't pay for it. Under ASGI aconfig_snapshot() is used,
+    so misses are fetched without blocking the event loop.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response: GetResponse):
+        self.get_response = get_response
+        self.is_async: bool = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> Union[HttpResponse, Awaitable[HttpResponse]]:
+        if self.is_async:
+            return self.__acall__(request)
+        with realtime_config.config_snapshot(lazy=True):
+            return self.get_response(request)
 
-    def __call__(self, request: HttpRequest) -> HttpResponse:
-        pid: int = os.getpid()
-        logger.info(f"MIDDLEWARE - PID {pid} - request {request.method} {request.path}")
-        
-        response: HttpResponse = self.get_response(request)
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        async with realtime_config.aconfig_snapshot(lazy=True):
+            response: HttpResponse = await cast(Awaitable[HttpResponse], self.get_response(request))
         return response
-    
\ No newline at end of file
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 10:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('config_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='configchangelog',
+            name='changed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 10:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('config_app', '0002_alter_configchangelog_changed_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='configchangelog',
+            options={'ordering': ['-changed_at', '-id'], 'verbose_name': 'Config Change Log', 'verbose_name_plural': 'Config Change Logs'},
+        ),
+        migrations.AddIndex(
+            model_name='configchangelog',
+            index=models.Index(fields=['-changed_at', '-id'], name='changelog_changed_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='configchangelog',
+            index=models.Index(fields=['key', '-changed_at', '-id'], name='changelog_key_changed_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class ConfigChangeLog(models.Model):
     key: models.CharField = models.CharField(
@@ -11,12 +12,19 @@ class ConfigChangeLog(models.Model):
     )
     new_value: models.TextField = models.TextField()
 
+    # Time of the change, set when it's queued, not when the row is written
     changed_at: models.DateTimeField = models.DateTimeField(
-        auto_now_add=True
+        default=timezone.now,
+        editable=False
     )
     
     class Meta:
-        ordering: list[str] = ['-changed_at']
+        # id breaks ties, so keyset pagination on (changed_at, id) is stable
+        ordering: list[str] = ['-changed_at', '-id']
+        indexes: list[models.Index] = [
+            models.Index(fields=['-changed_at', '-id'], name='changelog_changed_at_id_idx'),
+            models.Index(fields=['key', '-changed_at', '-id'], name='changelog_key_changed_idx'),
+        ]
         verbose_name: str = 'Config Change Log'
         verbose_name_plural: str = 'Config Change Logs'
 
@@ -0,0 +1,318 @@
+"""
+Scoped config overrides: per-tenant and per-environment values of
+CONSTANCE_CONFIG keys, resolved tenant -> environment -> global.
+
+Overrides of a key are stored in one Redis hash, {constance prefix}overrides:{key},
+field is scope id ("tenant:{name}" or "env:{name}"), value serialized with
+constance codecs.
+
+Each process keeps an index of all overrides: {key: {scope id: value}}.
+It's loaded once (first scoped lookup, or subscriber (re)subscribe) and then
+updated one entry per override message from Pub/Sub, or one key per key
+tracking invalidation. Scoped lookup is a dict get per scope in the chain,
+whatever the number of tenants, and a single dict get for keys without
+overrides. Without loaded index (Redis unavailable), lookups resolve to global.
+"""
+
+import logging
+import os
+import threading
+import time
+import redis
+from django.conf import settings
+from django.db import models
+from constance import settings as constance_settings
+from constance.codecs import dumps, loads
+
+from . import change_log_writer
+from .models import ConfigChangeLog
+from .redis_client import get_redis_connection
+from .update_messages import ConfigUpdate, encode_override, version_counter_key
+
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+TENANT: str = 'tenant'
+ENVIRONMENT: str = 'env'
+OVERRIDES_PREFIX: str = 'overrides:'
+
+# Returned by resolve() when no scope in the chain overrides the key
+MISSING: Any = object()
+
+# Readers take no lock: single dict operations are atomic, so entries
+# are updated in place. Updates and loads are serialized by _lock
+_index: Dict[str, Dict[str, Any]] = {}
+_lock: threading.Lock = threading.Lock()
+# Index reflects Redis, apart from updates in flight
+_loaded: bool = False
+# Monotonic time of next load attempt after a failed one
+_next_load_time: float = 0.0
+# Latest applied version per (key, scope id)
+_versions: Dict[Tuple[str, str], int] = {}
+
+
+def config_scope(tenant: Optional[str] = None,
+                 environment: Optional[str] = None) -> Tuple[str, ...]:
+    """
+    Scope chain for get_config(key, scope=...), most specific first.
+    Build it once per request, e.g. in middleware.
+    """
+    chain: List[str] = []
+    if tenant is not None:
+        chain.append(f"{TENANT}:{tenant}")
+    if environment is not None:
+        chain.append(f"{ENVIRONMENT}:{environment}")
+    return tuple(chain)
+
+
+def _scope_id(tenant: Optional[str], environment: Optional[str]) -> str:
+    chain: Tuple[str, ...] = config_scope(tenant, environment)
+    if len(chain) != 1:
+        raise ValueError("Override needs either tenant or environment")
+    return chain[0]
+
+
+def _change_log_key(key: str, scope_id: str) -> str:
+    """
+    ConfigChangeLog key of override. Raise ValueError if it doesn't fit
+    the column, checked before anything is written.
+    """
+    log_key: str = f"{key}@{scope_id}"
+    field: Any = ConfigChangeLog._meta.get_field('key')
+    max_length: Optional[int] = field.max_length if isinstance(field, models.Field) else None
+    if max_length is not None and len(log_key) > max_length:
+        raise ValueError(f"Scope '{scope_id}' is too long for override of {key}: "
+                         f"'{key}@{{scope}}' must fit in {max_length} characters")
+    return log_key
+
+
+def overrides_key(key: str) -> str:
+    """
+    Redis hash of key's overrides.
+    """
+    return f"{constance_settings.REDIS_PREFIX}{OVERRIDES_PREFIX}{key}"
+
+
+def _decode(value: Any) -> str:
+    return value.decode('utf-8') if isinstance(value, bytes) else str(value)
+
+
+def _load_fields(fields: Mapping[Any, Any]) -> Dict[str, Any]:
+    return {_decode(scope_id): loads(_decode(value)) for scope_id, value in fields.items()}
+
+
+def needs_load() -> bool:
+    return not _loaded and time.monotonic() >= _next_load_time
+
+
+def load(force: bool = False) -> bool:
+    """
+    Load overrides of all CONSTANCE_CONFIG keys with one pipeline and swap
+    in new index. Keep the previous index if Redis fails, retry not sooner
+    than REDIS_RETRY_INTERVAL. Return True on success.
+    Without force, concurrent callers waiting for the lock don't load again.
+    """
+    global _index, _loaded, _next_load_time
+    keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}))
+    with _lock:
+        if not force:
+            if _loaded:
+                return True
+            if time.monotonic() < _next_load_time:
+                return False
+        try:
+            redis_client: Optional[redis.Redis] = get_redis_connection()
+            if redis_client is None:
+                raise redis.exceptions.ConnectionError("No Redis connection")
+            pipe: Any = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.hgetall(overrides_key(key))
+            results: List[Mapping[Any, Any]] = pipe.execute()
+            index: Dict[str, Dict[str, Any]] = {key: _load_fields(fields)
+                                                for key, fields in zip(keys, results)
+                                                if fields}
+        except Exception as e:
+            _loaded = False
+            _next_load_time = time.monotonic() + getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+            logger.error(f"Failed to load config overrides. Error: {e}")
+            return False
+
+        _index = index
+        _versions.clear()
+        _loaded = True
+    logger.info(f"Loaded {sum(map(len, index.values()))} overrides of "
+                f"{len(index)} configs (PID: {os.getpid()})")
+    return True
+
+
+def reload() -> bool:
+    """
+    Load index again, e.g. after updates may have been missed.
+    """
+    global _loaded
+    _loaded = False
+    return load(force=True)
+
+
+def reload_key(key: str) -> bool:
+    """
+    Load one key's overrides again, for key tracking invalidation.
+    """
+    if not _loaded:
+        return False
+    with _lock:
+        try:
+            redis_client: Optional[redis.Redis] = get_redis_connection()
+            if redis_client is None:
+                raise redis.exceptions.ConnectionError("No Redis connection")
+            scoped: Dict[str, Any] = _load_fields(redis_client.hgetall(overrides_key(key)))
+        except Exception as e:
+            # Whole index is reloaded on next lookup
+            _mark_stale()
+            logger.error(f"Failed to reload overrides of config {key}. Error: {e}")
+            return False
+        if scoped:
+            _index[key] = scoped
+        else:
+            _index.pop(key, None)
+    logger.info(f"Reloaded {len(scoped)} overrides of config {key}")
+    return True
+
+
+def _mark_stale() -> None:
+    global _loaded
+    _loaded = False
+
+
+def resolve(key: str, scope: Tuple[str, ...]) -> Any:
+    """
+    Value of the first scope in chain overriding key, or MISSING.
+    """
+    scoped: Optional[Dict[str, Any]] = _index.get(key)
+    if scoped is not None:
+        for scope_id in scope:
+            value: Any = scoped.get(scope_id, MISSING)
+            if value is not MISSING:
+                return value
+    return MISSING
+
+
+def apply_update(update: ConfigUpdate) -> bool:
+    """
+    Apply override message to index unless a newer or same version of
+    this key's scope was already applied. Return True if applied.
+    """
+    assert update.scope is not None and update.version is not None
+    version_key: Tuple[str, str] = (update.key, update.scope)
+    with _lock:
+        if update.version <= _versions.get(version_key, 0):
+            return False
+        _versions[version_key] = update.version
+        scoped: Optional[Dict[str, Any]] = _index.get(update.key)
+        if update.deleted:
+            if scoped is not None:
+                scoped.pop(update.scope, None)
+        elif scoped is None:
+            _index[update.key] = {update.scope: update.value}
+        else:
+            scoped[update.scope] = update.value
+    return True
+
+
+def get_overrides(key: str) -> Dict[str, Any]:
+    """
+    Overrides of key in this process's index, by scope id.
+    """
+    return dict(_index.get(key, {}))
+
+
+def _check_value(key: str, value: Any) -> Any:
+    """
+    Value checked against config type, int converted for float configs.
+    bool is not accepted as int or float.
+    """
+    constance_defs: Mapping[str, Tuple[Any, ...]] = getattr(settings, 'CONSTANCE_CONFIG', {})
+    if key not in constance_defs:
+        raise ValueError(f"Unknown config key '{key}'")
+    definition: Tuple[Any, ...] = constance_defs[key]
+    expected_type: Any = definition[2] if len(definition) > 2 else type(definition[0])
+    if not isinstance(expected_type, type):
+        return value
+    if expected_type in (int, float) and isinstance(value, bool):
+        raise TypeError(f"Override of {key} must be {expected_type.__name__}, got bool")
+    if expected_type is float and isinstance(value, int):
+        return float(value)
+    if not isinstance(value, expected_type):
+        raise TypeError(f"Override of {key} must be {expected_type.__name__}, "
+                        f"got {type(value).__name__}")
+    return value
+
+
+def _write(key: str, scope_id: str, value: Any, deleted: bool) -> Any:
+    """
+    Write override to Redis and publish it with the next version of the
+    global counter. Return previous value, or None.
+    """
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if redis_client is None:
+        raise redis.exceptions.ConnectionError("No Redis connection to write override")
+
+    hash_key: str = overrides_key(key)
+    old_raw: Any = redis_client.hget(hash_key, scope_id)
+    old_value: Any = loads(_decode(old_raw)) if old_raw is not None else None
+
+    # Subscribers are notified by Redis key tracking
+    if getattr(settings, 'REALTIME_CONFIG_INVALIDATION_BACKEND', 'pubsub') == 'tracking':
+        if deleted:
+            redis_client.hdel(hash_key, scope_id)
+        else:
+            redis_client.hset(hash_key, scope_id, dumps(value))
+        return old_value
+
+    channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+    if not channel_name:
+        raise ValueError("REDIS_PUB_SUB_CHANNEL not defined")
+
+    pipe: Any = redis_client.pipeline()
+    if deleted:
+        pipe.hdel(hash_key, scope_id)
+    else:
+        pipe.hset(hash_key, scope_id, dumps(value))
+    pipe.incr(version_counter_key(channel_name))
+    version: int = pipe.execute()[-1]
+
+    got_msg_count: int = redis_client.publish(
+        channel_name, encode_override(key, scope_id, value, version,
+                                      published_at=time.time(), deleted=deleted))
+    logger.info(f"Published override of key='{key}' for {scope_id} to Redis channel "
+                f"'{channel_name}'. Subscribers notified: {got_msg_count}")
+    return old_value
+
+
+def set_override(key: str, value: Any, tenant: Optional[str] = None,
+                 environment: Optional[str] = None) -> None:
+    """
+    Override config for a tenant or an environment in all processes.
+    Raise ValueError or TypeError for unknown key, too long scope or value
+    of wrong type, RedisError if Redis fails.
+    """
+    value = _check_value(key, value)
+    scope_id: str = _scope_id(tenant, environment)
+    log_key: str = _change_log_key(key, scope_id)
+    old_value: Any = _write(key, scope_id, value, deleted=False)
+    change_log_writer.enqueue(log_key, old_value, value)
+
+
+def delete_override(key: str, tenant: Optional[str] = None,
+                    environment: Optional[str] = None) -> None:
+    """
+    Remove tenant's or environment's override, config resolves to the next
+    scope in chain.
+    """
+    scope_id: str = _scope_id(tenant, environment)
+    log_key: str = _change_log_key(key, scope_id)
+    old_value: Any = _write(key, scope_id, None, deleted=True)
+    if old_value is not None:
+        change_log_writer.enqueue(log_key, old_value, None)
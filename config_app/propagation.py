@@ -0,0 +1,245 @@
+"""
+Config update propagation acknowledgements.
+
+Subscribers record every applied update version. Background reporter thread
+acknowledges them to Redis, off the subscriber loop:
+- PUBLISH ack (pid, host, key, version, apply latency) on {channel}:acks
+- push latency to {channel}:ack_latencies, capped list of recent samples
+- SET process state (applied version) to {channel}:process:{host}:{pid}
+  with TTL, refreshed every REALTIME_CONFIG_ACK_HEARTBEAT seconds, so exited
+  processes disappear
+- ZADD {host}:{pid} to {channel}:processes registry, scored with the state
+  expiry time, so status reads live processes without scanning the keyspace
+
+propagation_status() compares processes with the version counter to find
+processes still behind, and computes latency percentiles against
+REALTIME_CONFIG_PROPAGATION_SLO.
+"""
+
+import json
+import logging
+import os
+import socket
+import statistics
+import threading
+import time
+import redis
+from django.conf import settings
+
+from . import metrics
+from .redis_client import get_redis_connection
+from .update_messages import version_counter_key
+
+from typing import Any, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Acks kept while Redis is unavailable
+_MAX_PENDING_ACKS: int = 1000
+
+_state_lock: threading.Lock = threading.Lock()
+# Max update version applied by this process, or version counter on subscribe
+_applied_version: int = 0
+_pending_acks: List[Dict[str, Any]] = []
+# Subscriber (re)subscribed, reporter reads version counter as baseline
+_resubscribed: bool = False
+_report_requested: threading.Event = threading.Event()
+_reporter_thread: Optional[threading.Thread] = None
+
+
+def ack_channel(channel_name: str) -> str:
+    return f"{channel_name}:acks"
+
+
+def _latencies_key(channel_name: str) -> str:
+    return f"{channel_name}:ack_latencies"
+
+
+def _process_key_prefix(channel_name: str) -> str:
+    return f"{channel_name}:process:"
+
+
+def _processes_key(channel_name: str) -> str:
+    return f"{channel_name}:processes"
+
+
+def _acks_enabled() -> bool:
+    return getattr(settings, 'REALTIME_CONFIG_PROPAGATION_ACKS', True)
+
+
+def mark_subscribed() -> None:
+    """
+    Call when subscriber (re)subscribes. Updates published before were
+    either missed (values are fetched from Redis) or are delivered now.
+    """
+    global _resubscribed
+    if not _acks_enabled():
+        return
+    with _state_lock:
+        _resubscribed = True
+    start_ack_reporter()
+    _report_requested.set()
+
+
+def record_applied(key: str, version: int, published_at: Optional[float]) -> None:
+    """
+    Remember applied update, reporter thread acknowledges it.
+    """
+    global _applied_version
+    if not _acks_enabled():
+        return
+
+    applied_at: float = time.time()
+    if published_at is not None:
+        metrics.observe(metrics.PROPAGATION_DURATION, max(0.0, applied_at - published_at))
+    ack: Dict[str, Any] = {
+        'pid': os.getpid(),
+        'host': socket.gethostname(),
+        'key': key,
+        'version': version,
+        'applied_at': applied_at,
+        'latency': applied_at - published_at if published_at is not None else None,
+    }
+    with _state_lock:
+        _applied_version = max(_applied_version, version)
+        _pending_acks.append(ack)
+        if len(_pending_acks) > _MAX_PENDING_ACKS:
+            del _pending_acks[:-_MAX_PENDING_ACKS]
+    _report_requested.set()
+
+
+def report(redis_client: redis.Redis, channel_name: str) -> None:
+    """
+    Send pending acks and refresh process state in one pipeline.
+    Pending acks are kept if Redis fails.
+    """
+    global _applied_version, _resubscribed
+    with _state_lock:
+        resubscribed: bool = _resubscribed
+        _resubscribed = False
+    if resubscribed:
+        counter: Optional[bytes] = redis_client.get(version_counter_key(channel_name))
+        with _state_lock:
+            _applied_version = max(_applied_version, int(counter or 0))
+
+    with _state_lock:
+        acks: List[Dict[str, Any]] = list(_pending_acks)
+        del _pending_acks[:]
+        applied_version: int = _applied_version
+
+    heartbeat: float = getattr(settings, 'REALTIME_CONFIG_ACK_HEARTBEAT', 10.0)
+    max_samples: int = getattr(settings, 'REALTIME_CONFIG_ACK_LATENCY_SAMPLES', 1000)
+    host: str = socket.gethostname()
+    pid: int = os.getpid()
+    state: Dict[str, Any] = {'pid': pid, 'host': host, 'version': applied_version,
+                             'reported_at': time.time()}
+
+    ttl: int = max(1, int(heartbeat * 3))
+    try:
+        pipe: Any = redis_client.pipeline(transaction=False)
+        pipe.set(f"{_process_key_prefix(channel_name)}{host}:{pid}", json.dumps(state), ex=ttl)
+        pipe.zadd(_processes_key(channel_name), {f"{host}:{pid}": state['reported_at'] + ttl})
+        for ack in acks:
+            pipe.publish(ack_channel(channel_name), json.dumps(ack))
+            if ack['latency'] is not None:
+                pipe.lpush(_latencies_key(channel_name), ack['latency'])
+        if acks:
+            pipe.ltrim(_latencies_key(channel_name), 0, max_samples - 1)
+        pipe.execute()
+    except BaseException:
+        with _state_lock:
+            _pending_acks[:0] = acks
+            del _pending_acks[:-_MAX_PENDING_ACKS]
+        raise
+
+
+def run_ack_reporter() -> None:
+    """
+    Report acks as soon as updates are applied, heartbeat otherwise.
+    """
+    heartbeat: float = getattr(settings, 'REALTIME_CONFIG_ACK_HEARTBEAT', 10.0)
+    logger.info(f"Propagation ack reporter started, heartbeat every {heartbeat}s")
+
+    while True:
+        _report_requested.wait(heartbeat)
+        _report_requested.clear()
+
+        channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+        redis_client: Optional[redis.Redis] = get_redis_connection()
+        if not channel_name or redis_client is None:
+            continue
+        try:
+            report(redis_client, channel_name)
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Failed to report config update acks. Error: {e}")
+            time.sleep(getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0))
+        except Exception as e:
+            logger.error(f"Unexpected error in ack reporter: {e}", exc_info=True)
+
+
+def start_ack_reporter() -> None:
+    global _reporter_thread
+    with _state_lock:
+        if _reporter_thread is not None and _reporter_thread.is_alive():
+            return
+        _reporter_thread = threading.Thread(
+            target=run_ack_reporter,
+            daemon=True,
+            name="RealtimeConfigAckReporter"
+        )
+        _reporter_thread.start()
+    logger.info(f"Started propagation ack reporter thread (PID: {os.getpid()})")
+
+
+def _percentile(samples: List[float], percent: int) -> Optional[float]:
+    if not samples:
+        return None
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+def propagation_status(redis_client: redis.Redis, channel_name: str) -> Dict[str, Any]:
+    """
+    Latest published version, live processes with their applied version,
+    and recent propagation latency percentiles.
+    """
+    latest_version: int = int(redis_client.get(version_counter_key(channel_name)) or 0)
+
+    # Drop registry entries of processes whose state expired
+    redis_client.zremrangebyscore(_processes_key(channel_name), '-inf', time.time())
+    process_keys: List[str] = [
+        f"{_process_key_prefix(channel_name)}{member.decode('utf-8')}"
+        for member in redis_client.zrange(_processes_key(channel_name), 0, -1)]
+    processes: List[Dict[str, Any]] = []
+    for raw_state in (redis_client.mget(process_keys) if process_keys else []):
+        if raw_state is None:
+            continue
+        state: Dict[str, Any] = json.loads(raw_state)
+        state['behind'] = latest_version - state['version']
+        processes.append(state)
+    processes.sort(key=lambda state: (-state['behind'], state['host'], state['pid']))
+
+    latencies: List[float] = sorted(
+        float(sample) for sample in redis_client.lrange(_latencies_key(channel_name), 0, -1))
+    slo: float = getattr(settings, 'REALTIME_CONFIG_PROPAGATION_SLO', 1.0)
+    within_slo: int = sum(1 for latency in latencies if latency <= slo)
+
+    return {
+        'latest_version': latest_version,
+        'converged': all(state['behind'] <= 0 for state in processes),
+        'processes': processes,
+        'processes_behind': sum(1 for state in processes if state['behind'] > 0),
+        'latency': {
+            'samples': len(latencies),
+            'p50': _percentile(latencies, 50),
+            'p95': _percentile(latencies, 95),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'slo': {
+            'target': slo,
+            'within': within_slo / len(latencies) if latencies else None,
+        },
+    }
@@ -1,30 +1,133 @@
+import asyncio
+import contextvars
 import threading
 import os
 import logging
 from django.conf import settings
 from constance import config as constance_config
+from constance import settings as constance_settings
+from constance.codecs import loads
 import redis
+import redis.asyncio
 import time
 
-from .redis_client import get_redis_connection
+from . import live_updates, metrics, overrides, propagation
+from .metrics import CACHE_HITS, thread_local as _metrics_local
+from .circuit_breaker import CLOSED, CircuitBreaker
+from .log_utils import LogSampler
+from .redis_client import get_redis_connection, get_async_redis_connection, \
+    get_pubsub_connection, get_async_pubsub_connection, on_server_loop
+from .shared_cache import SharedConfigRegion
+from .snapshot_file import locked_snapshot_file, read_snapshot_file, write_snapshot_file
+from .update_messages import ConfigChangeset, ConfigUpdate, decode_update, version_counter_key
 
-from typing import Any, Union, Optional, Dict, Tuple
+from contextlib import asynccontextmanager, contextmanager
+from types import MappingProxyType
+from typing import Any, Union, Optional, Dict, Tuple, Mapping, List, Iterable, \
+    Iterator, AsyncIterator, Callable, NamedTuple
 
 
 logger = logging.getLogger(__name__)
 
-_local_cache: Dict[str, Any] = {}
+# Immutable snapshot of cached configs. Readers use it without locking,
+# writers build a new snapshot under _cache_lock and swap the reference
+_local_cache: Mapping[str, Any] = MappingProxyType({})
 _cache_lock: threading.Lock = threading.Lock()
+# Snapshot pinned by config_snapshot() for current thread or task,
+# _LazySnapshot until first read in lazy scope
+_pinned_snapshot: contextvars.ContextVar[Optional[Mapping[str, Any]]] = \
+    contextvars.ContextVar('realtime_config_snapshot', default=None)
+# Marks a cache miss, as None is a valid cached value
+_MISSING: Any = object()
+# Last applied Pub/Sub update version per key, guarded by _cache_lock
+_key_versions: Dict[str, int] = {}
+# When each cached key was stored (monotonic), guarded by _cache_lock
+_cached_at: Dict[str, float] = {}
+# Versioned messages per key whose bare-key copy (REDIS_PUB_SUB_LEGACY_PUBLISH)
+# didn't arrive yet, so it doesn't evict the pushed value. Guarded by _cache_lock
+_pending_legacy: Dict[str, int] = {}
 # Fill in AppConfig.ready() with load_defaults()
 _default_values: Dict[str, Any] = {}
 
+
+class _Derived(NamedTuple):
+    keys: Tuple[str, ...]
+    func: Callable[..., Any]
+
+
+# Derived configs by name, see register_derived()
+_derived_defs: Dict[str, _Derived] = {}
+# Source config key -> names of derived configs computed from it
+_derived_dependents: Dict[str, List[str]] = {}
+# Memoized derived value and source values it was computed from.
+# Read without lock, changed under _cache_lock along with local cache
+_derived_values: Dict[str, Tuple[Any, Tuple[Any, ...]]] = {}
+
+
+class _Flight:
+    """
+    Cache miss fetch in progress, shared by concurrent get_config() calls.
+    """
+    __slots__ = ('event', 'value')
+
+    def __init__(self) -> None:
+        self.event: threading.Event = threading.Event()
+        self.value: Any = _MISSING
+
+
+_inflight: Dict[str, _Flight] = {}
+_inflight_lock: threading.Lock = threading.Lock()
+_single_flight_stats: Dict[str, int] = {'fetches': 0, 'coalesced': 0, 'timeouts': 0}
+
+_async_inflight: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+# Key tracking invalidations are delivered here in RESP2
+_TRACKING_CHANNEL: str = '__redis__:invalidate'
+# redis.asyncio calls have no socket read timeout, see get_async_redis_connection()
+_ASYNC_REDIS_TIMEOUT: float = 5.0
+
 _subscriber_thread: Optional[threading.Thread] = None
 _subscriber_lock: threading.Lock = threading.Lock()
+# True while Pub/Sub or tracking subscriber is subscribed
+_subscriber_connected: bool = False
+_async_subscriber_task: Optional["asyncio.Task[None]"] = None
+
+_refresher_thread: Optional[threading.Thread] = None
+
+# Per-host shared-memory snapshot (REALTIME_CONFIG_SHARED_CACHE_PATH)
+_shared_region: Optional[SharedConfigRegion] = None
+# seq of shared snapshot local cache was loaded from or written to
+_shared_seq: int = 0
+# Set on every local cache change, owner then writes shared snapshot
+_cache_changed: threading.Event = threading.Event()
+_shared_owner_thread: Optional[threading.Thread] = None
+
+# Last-known-good snapshot file (REALTIME_CONFIG_SNAPSHOT_FILE)
+_snapshot_dirty: threading.Event = threading.Event()
+_snapshot_writer_thread: Optional[threading.Thread] = None
+# Values loaded from snapshot file: key -> (_cached_at when loaded, file stamp),
+# written back with the file stamp until replaced. Guarded by _cache_lock
+_file_stamps: Dict[str, Tuple[float, Tuple[int, float]]] = {}
+
+# High-frequency warnings while Redis is down, logged 1 of REALTIME_CONFIG_LOG_SAMPLE_EVERY
+_blocked_log_sampler: LogSampler = LogSampler()
+_fallback_log_sampler: LogSampler = LogSampler()
+_derived_log_sampler: LogSampler = LogSampler()
 
-# Redis connection fail fast
-_redis_available: bool = True
-_last_redis_error_time: float = 0.0
-_redis_status_lock = threading.Lock()
+# Redis connection fail fast, state is visible to the rest of the app
+redis_breaker: CircuitBreaker = CircuitBreaker(
+    'redis',
+    probe=lambda: _probe_redis(),
+    on_trip=lambda: metrics.inc(metrics.BREAKER_TRIPS)
+)
+
+metrics.register_gauge('subscriber_connected', "1 if subscriber is connected to Redis",
+                       lambda: _subscriber_connected)
+metrics.register_gauge('breaker_open', "1 if Redis circuit breaker is not closed",
+                       lambda: redis_breaker.state != CLOSED)
+metrics.register_gauge('cached_keys', "Number of configs in local cache",
+                       lambda: len(_local_cache))
+metrics.register_gauge('stream_clients', "Number of connected config stream clients",
+                       live_updates.clients_count)
 
 
 def load_defaults() -> None:
@@ -45,88 +148,1109 @@ def load_defaults() -> None:
         _default_values = {}
 
 
-def get_config(key: str, default: Any = None) -> Any:
+def _store_locked(values: Mapping[str, Any]) -> None:
+    """
+    Swap in new cache snapshot with values added (copy-on-write).
+    Call with _cache_lock held.
+    """
+    global _local_cache
+    if _derived_values:
+        _invalidate_derived_locked([key for key, value in values.items()
+                                    if _local_cache.get(key, _MISSING) != value])
+    new_cache: Dict[str, Any] = dict(_local_cache)
+    new_cache.update(values)
+    _local_cache = MappingProxyType(new_cache)
+
+    stored_at: float = time.monotonic()
+    for key in values:
+        _cached_at[key] = stored_at
+    _cache_changed.set()
+    _snapshot_dirty.set()
+
+
+def _cache_set(key: str, value: Any) -> None:
+    """
+    Store value in local cache.
+    """
+    with _cache_lock:
+        _store_locked({key: value})
+
+
+def _cache_update(values: Mapping[str, Any]) -> None:
+    """
+    Store several values in local cache with one snapshot swap.
+    """
+    if not values:
+        return
+    with _cache_lock:
+        _store_locked(values)
+
+
+def _versions_of(keys: Iterable[str]) -> Dict[str, int]:
+    """
+    Applied Pub/Sub versions of keys, taken before fetching them from Redis.
+    """
+    with _cache_lock:
+        return {key: _key_versions.get(key, 0) for key in keys}
+
+
+def _cache_fetched(values: Mapping[str, Any], versions: Mapping[str, int]) -> Dict[str, Any]:
+    """
+    Store values fetched from Redis, except keys a pushed update was
+    applied for since the fetch started (versions from _versions_of()):
+    the fetched value may be older than the pushed one.
+    Return values as cached, with pushed values for those keys.
+    """
+    if not values:
+        return {}
+    with _cache_lock:
+        fresh: Dict[str, Any] = {key: value for key, value in values.items()
+                                 if _key_versions.get(key, 0) == versions.get(key, 0)}
+        if fresh:
+            _store_locked(fresh)
+        cache: Mapping[str, Any] = _local_cache
+    return {key: fresh[key] if key in fresh else cache.get(key, value)
+            for key, value in values.items()}
+
+
+def _cache_pop(key: str) -> Any:
+    """
+    Remove key from local cache (copy-on-write).
+    Return removed value, or _MISSING if key wasn't cached.
+    """
+    global _local_cache
+    with _cache_lock:
+        if key not in _local_cache:
+            return _MISSING
+        new_cache: Dict[str, Any] = dict(_local_cache)
+        removed_value: Any = new_cache.pop(key)
+        _local_cache = MappingProxyType(new_cache)
+        _cached_at.pop(key, None)
+        _invalidate_derived_locked((key,))
+    _cache_changed.set()
+    return removed_value
+
+
+def clear_cache() -> None:
+    """
+    Drop all locally cached config values.
+    """
+    global _local_cache
+    with _cache_lock:
+        _local_cache = MappingProxyType({})
+        _cached_at.clear()
+        _file_stamps.clear()
+        _derived_values.clear()
+    _cache_changed.set()
+
+
+def _probe_redis() -> None:
+    """
+    Health probe for redis_breaker, runs in breaker's background thread.
+    """
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if redis_client is None:
+        raise redis.exceptions.ConnectionError("No Redis connection")
+    redis_client.ping()
+
+
+def _redis_blocked(current_pid: int) -> bool:
+    """
+    Fail fast: True if Redis circuit breaker doesn't allow requests.
+    """
+    if redis_breaker.allow_request():
+        return False
+
+    if _blocked_log_sampler():
+        logger.warning(f"Redis circuit breaker is {redis_breaker.state} "
+                       f"(PID: {current_pid}) - not attempting connection")
+    return True
+
+
+def _fallback(key: str, default: Any, current_pid: int) -> Any:
+    """
+    Return passed default, or preloaded default from settings.
+    """
+    metrics.inc(metrics.FALLBACKS)
+    log_fallback: bool = _fallback_log_sampler()
+    if default is not None:
+        if log_fallback:
+            logger.warning(f"Fallback for config '{key}', returning passed default {default}")
+        return default
+
+    if key in _default_values:
+        preloaded_default: Any = _default_values.get(key)
+        if log_fallback:
+            logger.warning(f"Fallback for config '{key}', "
+                           f"returning preloaded default {preloaded_default}")
+        return preloaded_default
+
+    logger.error(f"No value found for config {key} (PID: {current_pid})")
+    return None
+
+
+def _fetch_one(key: str, current_pid: int) -> Any:
+    """
+    Fetch config from Redis via constance and cache it.
+    Return _MISSING on failure.
+    """
+    if _redis_blocked(current_pid):
+        return _MISSING
+
+    versions: Dict[str, int] = _versions_of((key,))
+    # Attempting to connect to Redis
+    start_time: float = time.perf_counter()
+    try:
+        value: Any = getattr(constance_config, key)
+        redis_breaker.record_success()
+
+        value = _cache_fetched({key: value}, versions)[key]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Fetched config '{key}' from Redis and cached - {value} "
+                         f"(PID: {current_pid})")
+        return value
+
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Redis operation failed for config '{key}' "
+                       f"(PID: {current_pid}). Error: {e}")
+        redis_breaker.record_failure()
+
+    except AttributeError:
+        logger.error(f"Config '{key}' not found in Constance (PID: {current_pid})")
+
+    except Exception as e:
+        logger.error(f"Unexpected error getting config '{key}' "
+                     f"(PID: {current_pid}): {e}", exc_info=True)
+
+    finally:
+        metrics.observe(metrics.FETCH_DURATION, time.perf_counter() - start_time)
+
+    return _MISSING
+
+
+def _fetch_single_flight(key: str, current_pid: int) -> Any:
+    """
+    Fetch config with per-key single-flight: the first thread to miss
+    fetches, concurrent threads wait for its result at most
+    REALTIME_CONFIG_SINGLE_FLIGHT_TIMEOUT seconds.
+    Return _MISSING on failure or timeout.
+    """
+    with _inflight_lock:
+        flight: Optional[_Flight] = _inflight.get(key)
+        is_leader: bool = flight is None
+        if flight is None:
+            flight = _inflight[key] = _Flight()
+            _single_flight_stats['fetches'] += 1
+        else:
+            _single_flight_stats['coalesced'] += 1
+
+    if not is_leader:
+        timeout: float = getattr(settings, 'REALTIME_CONFIG_SINGLE_FLIGHT_TIMEOUT', 1.0)
+        if flight.event.wait(timeout):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Coalesced fetch of config '{key}' (PID: {current_pid})")
+            return flight.value
+        with _inflight_lock:
+            _single_flight_stats['timeouts'] += 1
+        logger.warning(f"Timed out waiting for fetch of config '{key}' "
+                       f"(PID: {current_pid})")
+        return _MISSING
+
+    try:
+        # Previous leader may have just cached the value
+        value: Any = _local_cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = _fetch_one(key, current_pid)
+        flight.value = value
+        return value
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        flight.event.set()
+
+
+def get_single_flight_stats() -> Dict[str, int]:
+    """
+    Return counters of Redis fetches on cache miss, fetches coalesced into
+    another thread's fetch, and waits timed out.
+    """
+    with _inflight_lock:
+        return dict(_single_flight_stats)
+
+
+def get_config(key: str, default: Any = None,
+               scope: Optional[Tuple[str, ...]] = None) -> Any:
+    """
+    Get config value by key with caching.
+
+    - Return override of the first scope in chain, if any (see overrides.config_scope())
+    - Return local cache if there is any
+    - Or try to get config from Redis (one fetch per key for concurrent misses):
+     - save and return on success
+     - otherwise, return default if given, or default from constance_config
+    """
+    if scope:
+        # Open breaker: resolve to global without waiting for Redis
+        if overrides.needs_load() and redis_breaker.allow_request():
+            overrides.load()
+        value: Any = overrides.resolve(key, scope)
+        if value is not overrides.MISSING:
+            return value
+
+    pinned: Optional[Mapping[str, Any]] = _pinned()
+    if pinned is not None:
+        value = pinned.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.inc(metrics.CACHE_HITS)
+            return value
+        return _fallback(key, default, os.getpid())
+
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+
+    # Hit path: no lock and no message formatting unless debug is on
+    value = _local_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        try:
+            _metrics_local.shard.counters[CACHE_HITS] += 1
+        except AttributeError:
+            metrics.inc(CACHE_HITS)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Config {key} retrieved from local cache - "
+                         f"{value} (PID: {os.getpid()})")
+        return value
+
+    metrics.inc(metrics.CACHE_MISSES)
+    current_pid: int = os.getpid()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Cache miss for config '{key}' (PID: {current_pid})")
+
+    value = _fetch_single_flight(key, current_pid)
+    if value is not _MISSING:
+        return value
+
+    # Fallback
+    return _fallback(key, default, current_pid)
+
+
+def _known_keys(keys: List[str], constance_defs: Mapping[str, Any],
+                current_pid: int) -> List[str]:
+    """
+    Filter out keys not defined in CONSTANCE_CONFIG.
+    """
+    known_keys: List[str] = []
+    for key in keys:
+        if key in constance_defs:
+            known_keys.append(key)
+        else:
+            logger.error(f"Config '{key}' not found in Constance (PID: {current_pid})")
+    return known_keys
+
+
+def _split_cached(keys: List[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Split keys into values found in local cache and missing keys.
+    """
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+
+    snapshot: Mapping[str, Any] = _local_cache
+    found: Dict[str, Any] = {}
+    missing: List[str] = []
+    for key in keys:
+        value: Any = snapshot.get(key, _MISSING)
+        if value is _MISSING:
+            missing.append(key)
+        else:
+            found[key] = value
+    return found, missing
+
+
+def _fetch_many(keys: List[str], current_pid: int) -> Dict[str, Any]:
+    """
+    Fetch several configs from Redis in one MGET round trip.
+    Keys unset in Redis get their constance default.
+    Return empty dict if Redis is unavailable.
+    """
+    constance_defs: Dict[str, Tuple[Any, str, type]] = \
+        getattr(settings, 'CONSTANCE_CONFIG', {})
+    known_keys: List[str] = _known_keys(keys, constance_defs, current_pid)
+
+    if not known_keys or _redis_blocked(current_pid):
+        return {}
+
+    start_time: float = time.perf_counter()
+    try:
+        values: Dict[str, Any] = dict(constance_config._backend.mget(known_keys))
+        redis_breaker.record_success()
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Redis operation failed for configs {known_keys} "
+                       f"(PID: {current_pid}). Error: {e}")
+        redis_breaker.record_failure()
+        return {}
+    except Exception as e:
+        logger.error(f"Unexpected error getting configs {known_keys} "
+                     f"(PID: {current_pid}): {e}", exc_info=True)
+        return {}
+    finally:
+        metrics.observe(metrics.FETCH_DURATION, time.perf_counter() - start_time)
+
+    for key in known_keys:
+        if key not in values:
+            values[key] = constance_defs[key][0]
+    return values
+
+
+def _get_pinned(pinned: Mapping[str, Any], keys: List[str],
+                defaults: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    get_configs() inside config_snapshot() scope: no Redis access.
+    """
+    values: Dict[str, Any] = {}
+    for key in keys:
+        value: Any = pinned.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.inc(metrics.CACHE_HITS)
+            values[key] = value
+        else:
+            values[key] = _fallback(key, defaults.get(key), os.getpid())
+    return values
+
+
+def get_configs(keys: Iterable[str],
+                defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Get several config values at once, in order of keys.
+
+    - Take cached values from local cache
+    - Fetch all misses from Redis in one round trip and cache them
+    - Fallback per key as in get_config(), with defaults[key] as passed default
+    """
+    keys = list(keys)
+    defaults = defaults or {}
+
+    pinned: Optional[Mapping[str, Any]] = _pinned()
+    if pinned is not None:
+        return _get_pinned(pinned, keys, defaults)
+
+    found, missing = _split_cached(keys)
+    metrics.inc(metrics.CACHE_HITS, len(found))
+    metrics.inc(metrics.CACHE_MISSES, len(missing))
+
+    if missing:
+        current_pid: int = os.getpid()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Cache miss for configs {missing} (PID: {current_pid})")
+
+        versions: Dict[str, int] = _versions_of(missing)
+        fetched: Dict[str, Any] = _cache_fetched(_fetch_many(missing, current_pid), versions)
+        if fetched:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Fetched configs {list(fetched)} from Redis and cached "
+                             f"(PID: {current_pid})")
+        found.update(fetched)
+
+        for key in missing:
+            if key not in found:
+                found[key] = _fallback(key, defaults.get(key), current_pid)
+
+    return {key: found[key] for key in keys}
+
+
+async def _afetch_many(keys: List[str], current_pid: int) -> Dict[str, Any]:
+    """
+    Async _fetch_many(): read constance keys from Redis with redis.asyncio MGET
+    and cache them. Return empty dict if Redis is unavailable.
+    """
+    constance_defs: Dict[str, Tuple[Any, str, type]] = \
+        getattr(settings, 'CONSTANCE_CONFIG', {})
+    known_keys: List[str] = _known_keys(keys, constance_defs, current_pid)
+
+    if not known_keys or _redis_blocked(current_pid):
+        return {}
+
+    versions: Dict[str, int] = _versions_of(known_keys)
+    if not on_server_loop():
+        # Short-lived loop (async view under WSGI): an async pool would be
+        # created for it and never closed, read via sync pool in a thread
+        fetched: Dict[str, Any] = await asyncio.to_thread(_fetch_many, known_keys, current_pid)
+        return _cache_fetched(fetched, versions)
+
+    redis_client: Optional[redis.asyncio.Redis] = get_async_redis_connection()
+    if redis_client is None:
+        return {}
+
+    start_time: float = time.perf_counter()
+    try:
+        raw_values: List[Optional[bytes]] = await asyncio.wait_for(
+            redis_client.mget([f"{constance_settings.REDIS_PREFIX}{key}"
+                               for key in known_keys]),
+            timeout=_ASYNC_REDIS_TIMEOUT
+        )
+        redis_breaker.record_success()
+    except (redis.exceptions.RedisError, asyncio.TimeoutError) as e:
+        logger.warning(f"Redis operation failed for configs {known_keys} "
+                       f"(PID: {current_pid}). Error: {e!r}")
+        redis_breaker.record_failure()
+        return {}
+    except Exception as e:
+        logger.error(f"Unexpected error getting configs {known_keys} "
+                     f"(PID: {current_pid}): {e}", exc_info=True)
+        return {}
+    finally:
+        metrics.observe(metrics.FETCH_DURATION, time.perf_counter() - start_time)
+
+    values: Dict[str, Any] = {
+        key: loads(raw_value) if raw_value else constance_defs[key][0]
+        for key, raw_value in zip(known_keys, raw_values)
+    }
+    values = _cache_fetched(values, versions)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Fetched configs {known_keys} from Redis and cached "
+                     f"(PID: {current_pid})")
+    return values
+
+
+async def _afetch_single_flight(key: str, current_pid: int) -> Any:
+    """
+    Async _fetch_single_flight(): concurrent tasks missing the same key
+    await one fetch. Return _MISSING on failure or timeout.
+    """
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+
+    with _inflight_lock:
+        task: Optional["asyncio.Task[Dict[str, Any]]"] = _async_inflight.get(key)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(_afetch_many([key], current_pid))
+            _async_inflight[key] = task
+            task.add_done_callback(lambda done: _async_inflight_done(key, done))
+            _single_flight_stats['fetches'] += 1
+        else:
+            _single_flight_stats['coalesced'] += 1
+
+    timeout: float = getattr(settings, 'REALTIME_CONFIG_SINGLE_FLIGHT_TIMEOUT', 1.0)
+    try:
+        # shield: a waiter timing out doesn't cancel the shared fetch
+        values: Dict[str, Any] = await asyncio.wait_for(asyncio.shield(task), timeout)
+    except asyncio.TimeoutError:
+        with _inflight_lock:
+            _single_flight_stats['timeouts'] += 1
+        logger.warning(f"Timed out waiting for fetch of config '{key}' "
+                       f"(PID: {current_pid})")
+        return _MISSING
+
+    return values.get(key, _MISSING)
+
+
+def _async_inflight_done(key: str, task: "asyncio.Task[Dict[str, Any]]") -> None:
+    with _inflight_lock:
+        if _async_inflight.get(key) is task:
+            del _async_inflight[key]
+
+
+async def aget_config(key: str, default: Any = None,
+                      scope: Optional[Tuple[str, ...]] = None) -> Any:
+    """
+    Async get_config(): cache misses go to Redis via redis.asyncio
+    without blocking the event loop.
+    """
+    if scope:
+        if overrides.needs_load() and redis_breaker.allow_request():
+            await asyncio.to_thread(overrides.load)
+        value: Any = overrides.resolve(key, scope)
+        if value is not overrides.MISSING:
+            return value
+
+    pinned: Optional[Mapping[str, Any]] = await _apinned()
+    if pinned is not None:
+        value = pinned.get(key, _MISSING)
+        if value is not _MISSING:
+            metrics.inc(metrics.CACHE_HITS)
+            return value
+        return _fallback(key, default, os.getpid())
+
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+
+    value = _local_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        try:
+            _metrics_local.shard.counters[CACHE_HITS] += 1
+        except AttributeError:
+            metrics.inc(CACHE_HITS)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Config {key} retrieved from local cache - "
+                         f"{value} (PID: {os.getpid()})")
+        return value
+
+    metrics.inc(metrics.CACHE_MISSES)
+    current_pid: int = os.getpid()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Cache miss for config '{key}' (PID: {current_pid})")
+
+    value = await _afetch_single_flight(key, current_pid)
+    if value is not _MISSING:
+        return value
+
+    # Fallback
+    return _fallback(key, default, current_pid)
+
+
+async def aget_configs(keys: Iterable[str],
+                       defaults: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Async get_configs(): all misses are fetched in one redis.asyncio MGET.
+    """
+    keys = list(keys)
+    defaults = defaults or {}
+
+    pinned: Optional[Mapping[str, Any]] = await _apinned()
+    if pinned is not None:
+        return _get_pinned(pinned, keys, defaults)
+
+    found, missing = _split_cached(keys)
+    metrics.inc(metrics.CACHE_HITS, len(found))
+    metrics.inc(metrics.CACHE_MISSES, len(missing))
+
+    if missing:
+        current_pid: int = os.getpid()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Cache miss for configs {missing} (PID: {current_pid})")
+
+        found.update(await _afetch_many(missing, current_pid))
+
+        for key in missing:
+            if key not in found:
+                found[key] = _fallback(key, defaults.get(key), current_pid)
+
+    return {key: found[key] for key in keys}
+
+
+def register_derived(name: str, keys: Iterable[str], func: Callable[..., Any]) -> None:
+    """
+    Register config derived from source config keys: func(*values of keys).
+    Result is memoized until one of keys changes in local cache, then
+    recomputed on the next get_derived(name).
+    """
+    definition: _Derived = _Derived(keys=tuple(keys), func=func)
+    with _cache_lock:
+        previous: Optional[_Derived] = _derived_defs.get(name)
+        if previous is not None:
+            for key in previous.keys:
+                _derived_dependents[key].remove(name)
+        _derived_defs[name] = definition
+        for key in definition.keys:
+            _derived_dependents.setdefault(key, []).append(name)
+        _derived_values.pop(name, None)
+
+
+def _invalidate_derived_locked(keys: Iterable[str]) -> None:
+    """
+    Drop memoized values derived from keys. Call with _cache_lock held.
+    """
+    for key in keys:
+        for name in _derived_dependents.get(key, ()):
+            _derived_values.pop(name, None)
+
+
+def _derived_memo(name: str) -> Any:
+    """
+    Memoized derived value, or _MISSING. In config_snapshot() scope, only
+    if it was computed from the pinned values.
+    """
+    entry: Optional[Tuple[Any, Tuple[Any, ...]]] = _derived_values.get(name)
+    if entry is None:
+        return _MISSING
+    pinned: Optional[Mapping[str, Any]] = _pinned()
+    if pinned is not None:
+        for key, source in zip(_derived_defs[name].keys, entry[1]):
+            if pinned.get(key, _MISSING) != source:
+                return _MISSING
+    return entry[0]
+
+
+def _derive(name: str, definition: _Derived, sources: Tuple[Any, ...], default: Any) -> Any:
+    """
+    Compute derived value, memoize it if sources are still current.
+    Return default if func fails.
+    """
+    try:
+        value: Any = definition.func(*sources)
+    except Exception as e:
+        if _derived_log_sampler():
+            logger.error(f"Failed to compute derived config {name} from "
+                         f"{dict(zip(definition.keys, sources))}. Error: {e}")
+        return default
+
+    with _cache_lock:
+        # Changed since, or from fallback or older pinned snapshot
+        if _derived_defs.get(name) is definition and \
+           all(_local_cache.get(key, _MISSING) == source
+               for key, source in zip(definition.keys, sources)):
+            _derived_values[name] = (value, sources)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Computed derived config {name} - {value} (PID: {os.getpid()})")
+    return value
+
+
+def get_derived(name: str, default: Any = None) -> Any:
+    """
+    Get derived config registered with register_derived(): memoized value,
+    or computed from get_config() of its keys. Return default if computation
+    fails. Raise KeyError if name isn't registered.
+    """
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+
+    value: Any = _derived_memo(name)
+    if value is not _MISSING:
+        return value
+
+    definition: _Derived = _derived_defs[name]
+    sources: Tuple[Any, ...] = tuple(get_config(key) for key in definition.keys)
+    return _derive(name, definition, sources, default)
+
+
+async def aget_derived(name: str, default: Any = None) -> Any:
+    """
+    Async get_derived(): source keys missing in cache are fetched with aget_config().
+    """
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+    # Build lazy pinned snapshot without blocking, before _derived_memo() reads it
+    await _apinned()
+
+    value: Any = _derived_memo(name)
+    if value is not _MISSING:
+        return value
+
+    definition: _Derived = _derived_defs[name]
+    sources: Tuple[Any, ...] = tuple([await aget_config(key) for key in definition.keys])
+    return _derive(name, definition, sources, default)
+
+
+def _build_snapshot() -> Mapping[str, Any]:
+    """
+    Immutable mapping of all configs. Reuse local cache snapshot if it has
+    every key, otherwise fetch misses in one round trip.
+    """
+    keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    found, missing = _split_cached(keys)
+    if not missing:
+        return _local_cache
+    return MappingProxyType(get_configs(keys))
+
+
+async def _abuild_snapshot() -> Mapping[str, Any]:
+    keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    found, missing = _split_cached(keys)
+    if not missing:
+        return _local_cache
+    return MappingProxyType(await aget_configs(keys))
+
+
+class _LazySnapshot(Mapping[str, Any]):
+    """
+    Snapshot pinned by config_snapshot(lazy=True), built on first read,
+    so scopes reading no configs don't pay for it.
+    """
+    __slots__ = ('_snapshot',)
+
+    def __init__(self) -> None:
+        self._snapshot: Optional[Mapping[str, Any]] = None
+
+    def resolve(self) -> Mapping[str, Any]:
+        snapshot: Optional[Mapping[str, Any]] = self._snapshot
+        if snapshot is None:
+            # Unpinned, or get_configs() would resolve this snapshot again
+            with config_unpinned():
+                snapshot = _build_snapshot()
+            self._snapshot = snapshot
+        return snapshot
+
+    async def aresolve(self) -> Mapping[str, Any]:
+        snapshot: Optional[Mapping[str, Any]] = self._snapshot
+        if snapshot is None:
+            with config_unpinned():
+                snapshot = await _abuild_snapshot()
+            self._snapshot = snapshot
+        return snapshot
+
+    def resolve_cached(self) -> Optional[Mapping[str, Any]]:
+        """
+        Build snapshot only if local cache has every config, never fetch.
+        """
+        if self._snapshot is None:
+            keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+            found, missing = _split_cached(keys)
+            if not missing:
+                self._snapshot = _local_cache
+        return self._snapshot
+
+    def __getitem__(self, key: str) -> Any:
+        return self.resolve()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.resolve())
+
+    def __len__(self) -> int:
+        return len(self.resolve())
+
+
+def _pinned() -> Optional[Mapping[str, Any]]:
+    """
+    Snapshot pinned for current thread or task, built now if lazy.
+    """
+    pinned: Optional[Mapping[str, Any]] = _pinned_snapshot.get()
+    if isinstance(pinned, _LazySnapshot):
+        return pinned.resolve()
+    return pinned
+
+
+async def _apinned() -> Optional[Mapping[str, Any]]:
+    pinned: Optional[Mapping[str, Any]] = _pinned_snapshot.get()
+    if isinstance(pinned, _LazySnapshot):
+        return await pinned.aresolve()
+    return pinned
+
+
+@contextmanager
+def config_snapshot(lazy: bool = False) -> Iterator[Mapping[str, Any]]:
+    """
+    Pin one consistent snapshot of all configs for the current thread or task.
+    Inside the scope get_config() is a plain dict lookup - no lock, no Redis,
+    and updates arriving meanwhile aren't seen. Nested scopes reuse
+    the outer snapshot. Also usable as a decorator, e.g. for Celery tasks.
+    With lazy=True the snapshot is built on the first config read in the scope.
+    """
+    pinned: Optional[Mapping[str, Any]] = _pinned_snapshot.get()
+    if pinned is not None:
+        yield pinned
+        return
+
+    snapshot: Mapping[str, Any] = _LazySnapshot() if lazy else _build_snapshot()
+    token: contextvars.Token[Optional[Mapping[str, Any]]] = _pinned_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _pinned_snapshot.reset(token)
+
+
+@contextmanager
+def config_unpinned() -> Iterator[None]:
+    """
+    Read current configs inside config_snapshot() scope, e.g. in long-lived
+    requests that must not answer with values from when they started.
+    """
+    token: contextvars.Token[Optional[Mapping[str, Any]]] = _pinned_snapshot.set(None)
+    try:
+        yield
+    finally:
+        _pinned_snapshot.reset(token)
+
+
+@asynccontextmanager
+async def aconfig_snapshot(lazy: bool = False) -> AsyncIterator[Mapping[str, Any]]:
+    """
+    Async config_snapshot(): misses are fetched without blocking the event loop,
+    also when a lazy snapshot is built by aget_config() / aget_configs().
+    """
+    pinned: Optional[Mapping[str, Any]] = _pinned_snapshot.get()
+    if pinned is not None:
+        yield pinned
+        return
+
+    snapshot: Mapping[str, Any] = _LazySnapshot() if lazy else await _abuild_snapshot()
+    token: contextvars.Token[Optional[Mapping[str, Any]]] = _pinned_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _pinned_snapshot.reset(token)
+
+
+def current_snapshot() -> Mapping[str, Any]:
+    """
+    Pinned snapshot, or local cache. Both are immutable and local cache is
+    replaced on every change, so identity of the result tells if configs
+    changed. May miss keys that weren't fetched yet. Never waits for Redis:
+    a lazy snapshot that needs a fetch isn't built here.
+    """
+    pinned: Optional[Mapping[str, Any]] = _pinned_snapshot.get()
+    if isinstance(pinned, _LazySnapshot):
+        pinned = pinned.resolve_cached()
+    if pinned is not None:
+        return pinned
+    if _shared_region is not None:
+        _sync_shared(_shared_region)
+    return _local_cache
+
+
+def warm_up_cache(timeout: Optional[float] = None) -> bool:
+    """
+    Bulk-load all configs from Redis into local cache in one round trip.
+    Wait at most timeout seconds (REALTIME_CONFIG_WARMUP_TIMEOUT by default),
+    otherwise discard the result and keep serving defaults until
+    get_config() fetches lazily.
+    Return True if cache was warmed up.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'REALTIME_CONFIG_WARMUP_TIMEOUT', 2.0)
+
+    current_pid: int = os.getpid()
+
+    if _shared_region is not None and _load_shared(_shared_region):
+        logger.info(f"Warmed up config cache from shared snapshot (PID: {current_pid})")
+        return True
+    keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    result: Dict[str, Dict[str, Any]] = {}
+    versions: Dict[str, int] = _versions_of(keys)
+
+    def fetch() -> None:
+        result['values'] = _fetch_many(keys, current_pid)
+
+    start_time: float = time.monotonic()
+    # Separate thread, as constance Redis client may block with no timeout
+    fetch_thread: threading.Thread = threading.Thread(
+        target=fetch,
+        daemon=True,
+        name="RealtimeConfigWarmUp"
+    )
+    fetch_thread.start()
+    fetch_thread.join(timeout)
+    elapsed_ms: float = (time.monotonic() - start_time) * 1000
+
+    if fetch_thread.is_alive():
+        logger.warning(f"Config cache warm-up timed out after {elapsed_ms:.1f} ms "
+                       f"(PID: {current_pid}) - using defaults")
+        return False
+
+    values: Dict[str, Any] = result.get('values') or {}
+    if not values:
+        logger.warning(f"Config cache warm-up failed after {elapsed_ms:.1f} ms "
+                       f"(PID: {current_pid}) - using defaults")
+        return False
+
+    _cache_fetched(values, versions)
+    logger.info(f"Warmed up config cache with {len(values)} keys "
+                f"in {elapsed_ms:.1f} ms (PID: {current_pid})")
+    return True
+
+
+def _soft_ttl(key: str) -> Optional[float]:
+    """
+    Soft TTL for key from REALTIME_CONFIG_SOFT_TTL_PER_KEY,
+    or REALTIME_CONFIG_SOFT_TTL. None if key never expires.
+    """
+    per_key_ttls: Dict[str, float] = getattr(settings, 'REALTIME_CONFIG_SOFT_TTL_PER_KEY', {})
+    if key in per_key_ttls:
+        return per_key_ttls[key]
+    ttl: Optional[float] = getattr(settings, 'REALTIME_CONFIG_SOFT_TTL', None)
+    return ttl
+
+
+def _refresh_keys(stored_at: Dict[str, float], current_pid: int) -> int:
+    """
+    Re-read keys from Redis in one batch. Keys written to cache since
+    stored_at (e.g. by a Pub/Sub update) are left as they are.
+    Return number of refreshed keys, -1 if Redis is unavailable.
+    """
+    fetched: Dict[str, Any] = _fetch_many(list(stored_at), current_pid)
+    if not fetched:
+        return -1
+
+    with _cache_lock:
+        fresh: Dict[str, Any] = {key: value for key, value in fetched.items()
+                                 if _cached_at.get(key) == stored_at[key]}
+        if fresh:
+            _store_locked(fresh)
+    return len(fresh)
+
+
+def refresh_expired() -> int:
+    """
+    Re-read cached configs past their soft TTL from Redis in one batch.
+    Cached values keep being served meanwhile.
+    Return number of refreshed keys.
+    """
+    now: float = time.monotonic()
+    with _cache_lock:
+        stored_at: Dict[str, float] = dict(_cached_at)
+
+    expired: Dict[str, float] = {}
+    for key, key_stored_at in stored_at.items():
+        ttl: Optional[float] = _soft_ttl(key)
+        if ttl is not None and now - key_stored_at >= ttl:
+            expired[key] = key_stored_at
+
+    if not expired:
+        return 0
+
+    current_pid: int = os.getpid()
+    refreshed: int = max(0, _refresh_keys(expired, current_pid))
+    logger.debug(f"Refreshed {refreshed} of {len(expired)} expired configs "
+                 f"(PID: {current_pid})")
+    return refreshed
+
+
+def run_refresher() -> None:
+    """
+    Periodically refresh cached configs past their soft TTL.
+    """
+    refresh_interval: float = getattr(settings, 'REALTIME_CONFIG_REFRESH_INTERVAL', 1.0)
+    logger.info(f"Config refresher started, checking every {refresh_interval}s")
+
+    while True:
+        time.sleep(refresh_interval)
+        try:
+            refresh_expired()
+        except Exception as e:
+            logger.error(f"Unexpected error in config refresher: {e}", exc_info=True)
+
+
+def _apply_update(key: str, value: Any, version: int) -> bool:
+    """
+    Store pushed value in local cache unless a newer or same version
+    was already applied. Return True if applied.
+    """
+    with _cache_lock:
+        if version <= _key_versions.get(key, 0):
+            return False
+        _store_locked({key: value})
+        _key_versions[key] = version
+    return True
+
+
+def _apply_changeset(values: Mapping[str, Any], version: int) -> Dict[str, Any]:
     """
-    Get config value by key with caching.
+    Store changeset values in local cache with one snapshot swap, except keys
+    a newer or same version was already applied for. Return applied values.
+    """
+    with _cache_lock:
+        applied: Dict[str, Any] = {key: value for key, value in values.items()
+                                   if version > _key_versions.get(key, 0)}
+        if applied:
+            _store_locked(applied)
+            for key in applied:
+                _key_versions[key] = version
+    return applied
 
-    - Return local cache if there is any
-    - Or try to get config from Redis:
-     - save and return on success
-     - otherwise, return default if given, or default from constance_config
+
+def _reset_versions() -> None:
+    with _cache_lock:
+        _key_versions.clear()
+        _pending_legacy.clear()
+
+
+def _expect_legacy(keys: Iterable[str]) -> None:
     """
-    global _redis_available, _last_redis_error_time
+    Publisher follows versioned message with bare keys for old subscribers,
+    skip them when they arrive (same channel, so always after).
+    """
+    if not getattr(settings, 'REDIS_PUB_SUB_LEGACY_PUBLISH', False):
+        return
+    with _cache_lock:
+        for key in keys:
+            _pending_legacy[key] = _pending_legacy.get(key, 0) + 1
 
-    current_pid: int = os.getpid()
 
+def _legacy_expected(key: str) -> bool:
+    """
+    Consume one expected bare-key copy of key, True if there was one.
+    """
     with _cache_lock:
-        if key in _local_cache:
-            logger.debug(f"Config {key} retrieved from local cache - "
-                         f"{_local_cache[key]} (PID: {current_pid})")
-            return _local_cache[key]
+        pending: int = _pending_legacy.get(key, 0)
+        if not pending:
+            return False
+        if pending == 1:
+            del _pending_legacy[key]
+        else:
+            _pending_legacy[key] = pending - 1
+    return True
 
-    logger.debug(f"Cache miss for config '{key}' (PID: {current_pid})")
 
-    # Fail fast if going for Redis
-    
-    with _redis_status_lock:
-        current_redis_available: bool = _redis_available
-        current_last_error_time: float = _last_redis_error_time
+def _handle_message(data: Union[bytes, str, None]) -> None:
+    """
+    Apply Pub/Sub config update message to local cache.
+    """
+    update: Union[ConfigUpdate, ConfigChangeset, None] = decode_update(data)
+    if update is None:
+        logger.warning(f"Received invalid config update message: {data!r}")
+        return
 
-    current_time: float = time.time()
-    redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+    if isinstance(update, ConfigChangeset):
+        _handle_changeset(update)
+        return
 
-    if not current_redis_available and \
-       (current_time - current_last_error_time) < redis_retry_interval:
-        logger.warning(f"Redis marked unavailable (PID: {current_pid}) - "
-                       "not attempting connection for another "
-                       f"{(redis_retry_interval - (current_time - current_last_error_time)):.1f}s")
-    # Attempting to connect to Redis
-    else:
-        try:
-            value: Any = getattr(constance_config, key)
-            with _redis_status_lock:
-                _redis_available = True
+    key: str = update.key
+    if update.scope is not None:
+        if update.version is None:
+            # Overrides are ordered and acknowledged by version only
+            logger.warning(f"Ignored override of key: {key} for {update.scope} without version")
+            return
+        if overrides.apply_update(update):
+            metrics.inc(metrics.INVALIDATIONS)
+            propagation.record_applied(f"{key}@{update.scope}", update.version,
+                                       update.published_at)
+            logger.info(f"Applied override of key: {key} for {update.scope} "
+                        f"(version {update.version})")
+        else:
+            logger.debug(f"Ignored stale override of key: {key} for {update.scope} "
+                         f"(version {update.version})")
+        return
 
-            with _cache_lock:
-                _local_cache[key] = value
-            logger.debug(f"Fetched config '{key}' from Redis and cached - {value} "
-                         f"(PID: {current_pid})")
-            return value
+    if update.version is not None:
+        _expect_legacy([key])
+        if _apply_update(key, update.value, update.version):
+            metrics.inc(metrics.INVALIDATIONS)
+            propagation.record_applied(key, update.version, update.published_at)
+            live_updates.publish(update)
+            logger.info(f"Applied update for key: {key} (version {update.version})")
+        else:
+            logger.debug(f"Ignored stale update for key: {key} (version {update.version})")
+        return
 
-        except redis.exceptions.RedisError as e:
-            logger.warning(f"Redis operation failed for config '{key}' "
-                           f"(PID: {current_pid}). Error: {e}")
-            with _redis_status_lock:
-                _redis_available = False
-                _last_redis_error_time = current_time
+    # Legacy bare-key message
+    if _legacy_expected(key):
+        logger.debug(f"Ignored bare-key copy of versioned update for key: {key}")
+        return
+    logger.info(f"Received update notification for key: {key}")
+    live_updates.reset()
+    if _cache_pop(key) is not _MISSING:
+        metrics.inc(metrics.INVALIDATIONS)
+        logger.info(f"Invalidated cache for key: {key}")
+    else:
+        logger.debug(f"Key {key} not found in cache, nothing to invalidate")
 
-        except AttributeError:
-            logger.error(f"Config '{key}' not found in Constance (PID: {current_pid})")
 
-        except Exception as e:
-            logger.error(f"Unexpected error getting config '{key}' "
-                         f"(PID: {current_pid}): {e}", exc_info=True)
-    
-    # Fallback
+def _handle_changeset(changeset: ConfigChangeset) -> None:
+    """
+    Apply all keys of changeset message at once: readers see either
+    none or all of them.
+    """
+    _expect_legacy(changeset.values)
+    applied: Dict[str, Any] = _apply_changeset(changeset.values, changeset.version)
+    if not applied:
+        logger.debug(f"Ignored stale changeset of keys: {', '.join(changeset.values)} "
+                     f"(version {changeset.version})")
+        return
 
-    logger.warning(f"Fallback for config '{key}'")
-    if default is not None:
-        logger.warning(f"Returning passed default {default}")
-        return default
-    
-    if key in _default_values:
-        preloaded_default: Any = _default_values.get(key)
-        logger.warning(f"Returning preloaded default {preloaded_default}")
-        return preloaded_default
-    
-    logger.error(f"No value found for config {key} (PID: {current_pid})")
-    return None
+    metrics.inc(metrics.INVALIDATIONS, len(applied))
+    propagation.record_applied(",".join(applied), changeset.version, changeset.published_at)
+    old_values: Mapping[str, Any] = changeset.old_values or {}
+    live_updates.publish_many([
+        ConfigUpdate(key=key, value=value, version=changeset.version,
+                     published_at=changeset.published_at, old_value=old_values.get(key))
+        for key, value in applied.items()
+    ])
+    logger.info(f"Applied changeset of keys: {', '.join(applied)} "
+                f"(version {changeset.version})")
 
 
 def run_subscriber() -> None:
     """
     Run Redis Pub/Sub subscriber that listens for config changes.
     """
+    global _subscriber_connected
     logger.info("Redis Pub/Sub subscriber starting")
     channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
     if not channel_name:
@@ -134,6 +1258,7 @@ def run_subscriber() -> None:
         return
 
     logger.info(f"Subscriber listens to Redis channel '{channel_name}'")
+    connected_before: bool = False
 
     while True:
         redis_client: Optional[redis.Redis] = None
@@ -141,7 +1266,7 @@ def run_subscriber() -> None:
         redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
                 
         try:
-            redis_client = get_redis_connection()
+            redis_client = get_pubsub_connection()
             if not redis_client:
                 logger.warning("Subscriber failed to get Redis connection. "
                                f"Retrying in {redis_retry_interval} seconds...")
@@ -151,26 +1276,24 @@ def run_subscriber() -> None:
             pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
             pubsub.subscribe(channel_name)
             logger.info(f"Subscribed to Redis channel: {channel_name}")
+            # Version counter may have been reset while we were disconnected
+            _reset_versions()
+            live_updates.reset()
+            _subscriber_connected = True
+            # Updates were lost while disconnected
+            if connected_before:
+                logger.info("Subscriber reconnected, invalidated whole config cache")
+                metrics.inc(metrics.SUBSCRIBER_RECONNECTS)
+                clear_cache()
+            connected_before = True
+            # Override messages may have been missed too
+            overrides.reload()
+            propagation.mark_subscribed()
 
             for message in pubsub.listen():
                 logger.debug(f"Subscriber received message: {message}")
                 if message and message['type'] == 'message' and 'data' in message:
-                    key = message.get('data')
-                    if isinstance(key, bytes):
-                        key = key.decode('utf-8')
-                    else:
-                        key = str(key) if key is not None else ""
-                    
-                    if key:
-                        logger.info(f"Received update notification for key: {key}")
-                        with _cache_lock:
-                            # logger.debug(f"PID: {os.getpid()}, cache before invalidation: {_local_cache}")
-                            removed_value: Any = _local_cache.pop(key, None)
-
-                    if removed_value is not None:
-                        logger.info(f"Invalidated cache for key: {key}")
-                    else:
-                        logger.debug(f"Key {key} not found in cache, nothing to invalidate")
+                    _handle_message(message.get('data'))
                 else:
                      logger.warning(f"Received unexpected message format from Pub/Sub: {message}")
 
@@ -183,9 +1306,10 @@ def run_subscriber() -> None:
             time.sleep(redis_retry_interval)
 
         finally:
+            _subscriber_connected = False
             if pubsub:
                 try:
-                    if get_redis_connection() is not None:
+                    if get_pubsub_connection() is not None:
                         pubsub.unsubscribe()
                         pubsub.close()
                         logger.debug("PubSub unsubscribed and connection closed.")
@@ -193,16 +1317,248 @@ def run_subscriber() -> None:
                     logger.debug(f"Error during pubsub cleanup: {close_e}")
 
 
+def _handle_invalidation(data: Any, prefix: str) -> None:
+    """
+    Apply Redis key tracking invalidation: list of changed Redis keys,
+    or None when Redis was flushed.
+    """
+    if data is None:
+        logger.info("Redis flushed, invalidated whole config cache")
+        metrics.inc(metrics.INVALIDATIONS)
+        clear_cache()
+        live_updates.reset()
+        overrides.reload()
+        return
+
+    invalidated: bool = False
+    for redis_key in data:
+        if isinstance(redis_key, bytes):
+            redis_key = redis_key.decode('utf-8')
+        if not redis_key.startswith(prefix):
+            continue
+
+        key: str = redis_key[len(prefix):]
+        if key.startswith(overrides.OVERRIDES_PREFIX):
+            overrides.reload_key(key[len(overrides.OVERRIDES_PREFIX):])
+            continue
+        invalidated = True
+        if _cache_pop(key) is not _MISSING:
+            metrics.inc(metrics.INVALIDATIONS)
+            logger.info(f"Invalidated cache for key: {key}")
+        else:
+            logger.debug(f"Key {key} not found in cache, nothing to invalidate")
+
+    # Invalidations carry no values, streaming clients refetch all
+    if invalidated:
+        live_updates.reset()
+
+
+def run_tracking_subscriber() -> None:
+    """
+    Run Redis key tracking (CLIENT TRACKING BCAST on constance key prefix)
+    subscriber. Invalidates changed constance keys whoever wrote them.
+    Tracking is redirected to the same connection, subscribed to
+    invalidation channel, so it works with RESP2.
+    """
+    global _subscriber_connected
+    prefix: str = constance_settings.REDIS_PREFIX
+    logger.info(f"Redis key tracking subscriber starting for prefix '{prefix}'")
+    connected_before: bool = False
+
+    while True:
+        connection: Optional[redis.connection.AbstractConnection] = None
+        redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+
+        try:
+            redis_client: Optional[redis.Redis] = get_pubsub_connection()
+            if not redis_client:
+                logger.warning("Tracking subscriber failed to get Redis connection. "
+                               f"Retrying in {redis_retry_interval} seconds...")
+                time.sleep(redis_retry_interval)
+                continue
+
+            # Dedicated connection outside the pool, as it stays subscribed
+            pool: redis.ConnectionPool = redis_client.connection_pool
+            connection = pool.connection_class(**pool.connection_kwargs)
+            connection.connect()
+
+            connection.send_command('CLIENT', 'ID')
+            client_id: int = connection.read_response()
+            connection.send_command('CLIENT', 'TRACKING', 'ON', 'REDIRECT', client_id,
+                                    'BCAST', 'PREFIX', prefix)
+            connection.read_response()
+            connection.send_command('SUBSCRIBE', _TRACKING_CHANNEL)
+            connection.read_response()
+            logger.info(f"Tracking Redis keys with prefix '{prefix}'")
+
+            # Invalidations were lost while disconnected
+            live_updates.reset()
+            _subscriber_connected = True
+            if connected_before:
+                logger.info("Tracking subscriber reconnected, invalidated whole config cache")
+                metrics.inc(metrics.SUBSCRIBER_RECONNECTS)
+                clear_cache()
+            connected_before = True
+            overrides.reload()
+
+            while True:
+                response: Any = connection.read_response()
+                logger.debug(f"Tracking subscriber received message: {response}")
+                if isinstance(response, list) and len(response) == 3 and \
+                   response[0] in (b'message', 'message'):
+                    _handle_invalidation(response[2], prefix)
+                else:
+                    logger.warning(f"Received unexpected message from Redis tracking: {response}")
+
+        except redis.ConnectionError as e:
+            logger.warning(f"Redis connection error in tracking subscriber: {e}")
+            time.sleep(redis_retry_interval)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in Redis tracking subscriber: {e}", exc_info=True)
+            time.sleep(redis_retry_interval)
+
+        finally:
+            _subscriber_connected = False
+            if connection:
+                try:
+                    connection.disconnect()
+                    logger.debug("Tracking connection closed.")
+                except Exception as close_e:
+                    logger.debug(f"Error during tracking connection cleanup: {close_e}")
+
+
+def _uses_key_tracking() -> bool:
+    backend: str = getattr(settings, 'REALTIME_CONFIG_INVALIDATION_BACKEND', 'pubsub')
+    return backend == 'tracking'
+
+
+async def arun_subscriber() -> None:
+    """
+    Async run_subscriber() for ASGI deployment, runs as event loop task.
+    """
+    global _subscriber_connected
+    logger.info("Async Redis Pub/Sub subscriber starting")
+    channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+    if not channel_name:
+        logger.error("REDIS_PUB_SUB_CHANNEL is not defined")
+        return
+
+    logger.info(f"Async subscriber listens to Redis channel '{channel_name}'")
+    connected_before: bool = False
+
+    while True:
+        pubsub: Optional[redis.asyncio.client.PubSub] = None
+        redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+
+        try:
+            redis_client: Optional[redis.asyncio.Redis] = get_async_pubsub_connection()
+            if not redis_client:
+                logger.warning("Async subscriber failed to get Redis connection. "
+                               f"Retrying in {redis_retry_interval} seconds...")
+                await asyncio.sleep(redis_retry_interval)
+                continue
+
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(channel_name)
+            logger.info(f"Async subscriber subscribed to Redis channel: {channel_name}")
+            _reset_versions()
+            live_updates.reset()
+            _subscriber_connected = True
+            # Updates were lost while disconnected
+            if connected_before:
+                logger.info("Subscriber reconnected, invalidated whole config cache")
+                metrics.inc(metrics.SUBSCRIBER_RECONNECTS)
+                clear_cache()
+            connected_before = True
+            await asyncio.to_thread(overrides.reload)
+            propagation.mark_subscribed()
+
+            async for message in pubsub.listen():
+                logger.debug(f"Async subscriber received message: {message}")
+                if message and message['type'] == 'message' and 'data' in message:
+                    _handle_message(message.get('data'))
+                else:
+                    logger.warning(f"Received unexpected message format from Pub/Sub: {message}")
+
+        except asyncio.CancelledError:
+            logger.info("Async Redis Pub/Sub subscriber cancelled")
+            raise
+
+        except redis.ConnectionError as e:
+            logger.warning(f"Redis connection error in async subscriber: {e}")
+            await asyncio.sleep(redis_retry_interval)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in async Redis subscriber: {e}", exc_info=True)
+            await asyncio.sleep(redis_retry_interval)
+
+        finally:
+            _subscriber_connected = False
+            if pubsub:
+                try:
+                    await pubsub.aclose()
+                    logger.debug("Async PubSub connection closed.")
+                except Exception as close_e:
+                    logger.debug(f"Error during async pubsub cleanup: {close_e}")
+
+
+def start_async_subscriber() -> None:
+    """
+    Start arun_subscriber() task in running event loop, if not started yet.
+    """
+    global _async_subscriber_task
+
+    # Shared cache owner process runs threaded subscriber
+    if _shared_region is not None:
+        return
+
+    # Key tracking subscriber is threaded only
+    if _uses_key_tracking():
+        if _subscriber_thread is None or not _subscriber_thread.is_alive():
+            start_subscriber_thread()
+        return
+
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    task: Optional["asyncio.Task[None]"] = _async_subscriber_task
+    if task is not None and not task.done() and task.get_loop() is loop:
+        return
+
+    _async_subscriber_task = loop.create_task(arun_subscriber(),
+                                              name="RedisConfigSubscriber")
+    logger.info("Started async Redis Pub/Sub subscriber task")
+
+
+async def stop_async_subscriber() -> None:
+    """
+    Cancel arun_subscriber() task and wait for it to finish.
+    """
+    global _async_subscriber_task
+
+    task: Optional["asyncio.Task[None]"] = _async_subscriber_task
+    _async_subscriber_task = None
+    if task is None or task.done():
+        return
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    logger.info("Stopped async Redis Pub/Sub subscriber task")
+
+
 def start_subscriber_thread() -> None:
     """
-    Start background thread for run_subscriber().
+    Start background thread for run_subscriber(), or run_tracking_subscriber()
+    if REALTIME_CONFIG_INVALIDATION_BACKEND is 'tracking'.
     """
     global _subscriber_thread
 
     with _subscriber_lock:
         if _subscriber_thread is None or not _subscriber_thread.is_alive():
             _subscriber_thread = threading.Thread(
-                target=run_subscriber,
+                target=run_tracking_subscriber if _uses_key_tracking() else run_subscriber,
                 # Don't wait for the thread to finish
                 daemon=True,
                 name="RedisConfigSubscriber"
@@ -211,3 +1567,335 @@ def start_subscriber_thread() -> None:
             logger.info(f"Started Redis Pub/Sub subscriber thread: {_subscriber_thread.name}")
         else:
             logger.info(f"Redis Pub/Sub subscriber thread '{_subscriber_thread.name}' is already running.")
+
+
+def start_refresher_thread() -> None:
+    """
+    Start background thread for run_refresher() if any soft TTL is set.
+    """
+    global _refresher_thread
+
+    if getattr(settings, 'REALTIME_CONFIG_SOFT_TTL', None) is None and \
+       not getattr(settings, 'REALTIME_CONFIG_SOFT_TTL_PER_KEY', {}):
+        return
+
+    # With shared cache, only the owner process refreshes
+    if _shared_region is not None and not _shared_region.is_owner:
+        return
+
+    with _subscriber_lock:
+        if _refresher_thread is None or not _refresher_thread.is_alive():
+            _refresher_thread = threading.Thread(
+                target=run_refresher,
+                daemon=True,
+                name="RealtimeConfigRefresher"
+            )
+            _refresher_thread.start()
+            logger.info(f"Started config refresher thread: {_refresher_thread.name}")
+
+
+def _load_shared(region: SharedConfigRegion) -> bool:
+    """
+    Replace local cache with shared snapshot. Return True if loaded.
+    """
+    global _local_cache, _shared_seq
+
+    snapshot = region.read()
+    if snapshot is None:
+        return False
+
+    with _cache_lock:
+        _local_cache = MappingProxyType(snapshot.values)
+        _cached_at.clear()
+        _derived_values.clear()
+        stored_at: float = time.monotonic()
+        for key in snapshot.values:
+            _cached_at[key] = stored_at
+        _shared_seq = snapshot.seq
+
+    logger.debug(f"Loaded shared config snapshot version {snapshot.version} "
+                 f"(PID: {os.getpid()})")
+    return True
+
+
+def _sync_shared(region: SharedConfigRegion) -> None:
+    """
+    Reload local cache if shared snapshot changed. Costs one read
+    of the seq word when it didn't. Owner's local cache is the source of
+    the snapshot, possibly ahead of it, so the owner never reloads.
+    """
+    if region.is_owner:
+        return
+    if region.seq() != _shared_seq and _load_shared(region):
+        # Shared snapshot has no per-key versions to stream
+        live_updates.reset()
+
+
+def _write_shared(region: SharedConfigRegion, keys: List[str], current_pid: int) -> bool:
+    """
+    Owner: complete local cache with missing keys from Redis
+    and write it as new shared snapshot. Return False if some keys are
+    still missing (Redis unavailable), so the write should be retried.
+    """
+    global _shared_seq
+
+    missing: List[str] = [key for key in keys if key not in _local_cache]
+    if missing:
+        versions: Dict[str, int] = _versions_of(missing)
+        _cache_fetched(_fetch_many(missing, current_pid), versions)
+        # Own update, snapshot below includes it
+        _cache_changed.clear()
+
+    snapshot: Dict[str, Any] = dict(_local_cache)
+    seq: Optional[int] = region.write(snapshot)
+    if seq is not None:
+        with _cache_lock:
+            _shared_seq = seq
+        logger.debug(f"Wrote shared config snapshot with {len(snapshot)} keys "
+                     f"(PID: {current_pid})")
+    return all(key in snapshot for key in keys)
+
+
+def run_shared_cache_owner() -> None:
+    """
+    Wait to become shared cache owner for this host, then run Pub/Sub
+    subscriber and write shared snapshot after every local cache change.
+    """
+    region: Optional[SharedConfigRegion] = _shared_region
+    if region is None:
+        return
+
+    region.acquire_owner_lock()
+    current_pid: int = os.getpid()
+    logger.info(f"PID {current_pid} owns shared config cache {region.path}")
+
+    start_subscriber_thread()
+    start_refresher_thread()
+
+    keys: List[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+    complete: bool = False
+    _cache_changed.set()
+
+    while True:
+        _cache_changed.wait(None if complete else redis_retry_interval)
+        _cache_changed.clear()
+        try:
+            complete = _write_shared(region, keys, current_pid)
+        except Exception as e:
+            logger.error(f"Unexpected error writing shared config snapshot: {e}",
+                         exc_info=True)
+            complete = False
+
+
+def start_shared_cache() -> None:
+    """
+    Map per-host shared config snapshot and start thread competing
+    to own it. Local cache follows the snapshot, and only the owner
+    process subscribes to Pub/Sub and reads Redis.
+    """
+    global _shared_region, _shared_owner_thread
+
+    path: Optional[str] = getattr(settings, 'REALTIME_CONFIG_SHARED_CACHE_PATH', None)
+    if not path:
+        logger.error("REALTIME_CONFIG_SHARED_CACHE_PATH is not defined")
+        return
+    size: int = getattr(settings, 'REALTIME_CONFIG_SHARED_CACHE_SIZE', 1024 * 1024)
+
+    with _subscriber_lock:
+        if _shared_owner_thread is not None and _shared_owner_thread.is_alive():
+            logger.info("Shared config cache is already started")
+            return
+
+        try:
+            _shared_region = SharedConfigRegion(path, size)
+        except OSError as e:
+            logger.error(f"Failed to map shared config cache {path}. Error: {e}",
+                         exc_info=True)
+            return
+
+        _load_shared(_shared_region)
+
+        _shared_owner_thread = threading.Thread(
+            target=run_shared_cache_owner,
+            daemon=True,
+            name="SharedConfigCacheOwner"
+        )
+        _shared_owner_thread.start()
+        logger.info(f"Started shared config cache with {path}")
+
+
+def _revalidate(stored_at: Dict[str, float]) -> None:
+    """
+    Re-read values loaded from snapshot file, as they may be outdated.
+    Retry until Redis answers.
+    """
+    if not stored_at:
+        return
+
+    current_pid: int = os.getpid()
+    while _refresh_keys(stored_at, current_pid) < 0:
+        time.sleep(getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0))
+    logger.info(f"Revalidated configs loaded from snapshot file (PID: {current_pid})")
+
+
+def load_snapshot_file() -> bool:
+    """
+    Load last-known-good values from REALTIME_CONFIG_SNAPSHOT_FILE into
+    local cache and fallback defaults, then re-read them from Redis
+    in background. Return True if loaded.
+    """
+    path: Optional[str] = getattr(settings, 'REALTIME_CONFIG_SNAPSHOT_FILE', None)
+    if not path:
+        return False
+
+    snapshot = read_snapshot_file(path)
+    if snapshot is None:
+        logger.info(f"No config snapshot file {path} to load")
+        return False
+
+    constance_defs: Dict[str, Any] = getattr(settings, 'CONSTANCE_CONFIG', {})
+    values: Dict[str, Any] = {key: value for key, value in snapshot.values.items()
+                              if key in constance_defs}
+    _default_values.update(values)
+    _cache_update(values)
+    with _cache_lock:
+        stored_at: Dict[str, float] = {key: _cached_at[key] for key in values
+                                       if key in _cached_at}
+        _file_stamps.update({key: (cached_at, snapshot.stamps[key])
+                             for key, cached_at in stored_at.items()
+                             if key in snapshot.stamps})
+
+    threading.Thread(
+        target=_revalidate,
+        args=(stored_at,),
+        daemon=True,
+        name="RealtimeConfigRevalidate"
+    ).start()
+
+    logger.info(f"Loaded {len(values)} configs from snapshot file {path} "
+                f"(generation {snapshot.version})")
+    return True
+
+
+def _cache_stamps_locked() -> Dict[str, Tuple[int, float]]:
+    """
+    Update version and wall-clock store time of cached values, as written
+    to snapshot file. Call with _cache_lock held.
+    """
+    now: float = time.time()
+    now_monotonic: float = time.monotonic()
+    stamps: Dict[str, Tuple[int, float]] = {}
+    for key in _local_cache:
+        cached_at: float = _cached_at.get(key, now_monotonic)
+        loaded: Optional[Tuple[float, Tuple[int, float]]] = _file_stamps.get(key)
+        if loaded is not None and loaded[0] == cached_at:
+            stamps[key] = loaded[1]
+        else:
+            stamps[key] = (_key_versions.get(key, 0), now - (now_monotonic - cached_at))
+    return stamps
+
+
+def _version_counter() -> Optional[int]:
+    """
+    Current Pub/Sub update version counter, None if Redis can't tell.
+    """
+    channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if not channel_name or redis_client is None or not redis_breaker.allow_request():
+        return None
+    try:
+        counter: Optional[bytes] = redis_client.get(version_counter_key(channel_name))
+        return int(counter or 0)
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to read update version counter. Error: {e}")
+        return None
+
+
+def _file_value_wins(stamp: Optional[Tuple[int, float]], cached: Tuple[int, float],
+                     counter: Optional[int]) -> bool:
+    """
+    Whether snapshot file value is fresher than the cached one. Update
+    versions order values pushed to both, otherwise (fetched values have
+    version 0, file versions above the counter are from before Redis
+    counter reset) the later stored value wins.
+    """
+    if stamp is None:
+        return False
+    file_version: int = stamp[0] if counter is None or stamp[0] <= counter else 0
+    if file_version and cached[0]:
+        return file_version > cached[0]
+    return stamp[1] > cached[1]
+
+
+def _write_snapshot_file(path: str) -> None:
+    """
+    Merge local cache into snapshot file per key, see _file_value_wins(),
+    so a process behind on updates doesn't overwrite fresher values written
+    by another one. Read-merge-replace runs under flock, concurrent writers
+    don't lose each other's keys. File version is its write generation.
+    """
+    with _cache_lock:
+        values: Dict[str, Any] = dict(_local_cache)
+        stamps: Dict[str, Tuple[int, float]] = _cache_stamps_locked()
+    counter: Optional[int] = _version_counter()
+
+    with locked_snapshot_file(path):
+        generation: int = 1
+        existing = read_snapshot_file(path)
+        if existing is not None:
+            generation = existing.version + 1
+            for key, value in existing.values.items():
+                stamp: Optional[Tuple[int, float]] = existing.stamps.get(key)
+                if key in values and not _file_value_wins(stamp, stamps[key], counter):
+                    continue
+                values[key] = value
+                if stamp is not None:
+                    stamps[key] = stamp
+                else:
+                    stamps.pop(key, None)
+
+        write_snapshot_file(path, generation, values, stamps)
+    logger.debug(f"Wrote {len(values)} configs to snapshot file {path} "
+                 f"(generation {generation})")
+
+
+def run_snapshot_writer(path: str) -> None:
+    """
+    Write snapshot file after local cache changes, at most once
+    per REALTIME_CONFIG_SNAPSHOT_INTERVAL seconds.
+    """
+    while True:
+        _snapshot_dirty.wait()
+        time.sleep(getattr(settings, 'REALTIME_CONFIG_SNAPSHOT_INTERVAL', 1.0))
+        _snapshot_dirty.clear()
+        try:
+            _write_snapshot_file(path)
+        except Exception as e:
+            logger.error(f"Failed to write config snapshot file {path}. Error: {e}",
+                         exc_info=True)
+
+
+def start_snapshot_file() -> None:
+    """
+    Load snapshot file and start background thread keeping it up to date.
+    No-op if REALTIME_CONFIG_SNAPSHOT_FILE is not set.
+    """
+    global _snapshot_writer_thread
+
+    path: Optional[str] = getattr(settings, 'REALTIME_CONFIG_SNAPSHOT_FILE', None)
+    if not path:
+        return
+
+    load_snapshot_file()
+
+    with _subscriber_lock:
+        if _snapshot_writer_thread is None or not _snapshot_writer_thread.is_alive():
+            _snapshot_writer_thread = threading.Thread(
+                target=run_snapshot_writer,
+                args=(path,),
+                daemon=True,
+                name="RealtimeConfigSnapshotWriter"
+            )
+            _snapshot_writer_thread.start()
+            logger.info(f"Started config snapshot file writer for {path}")
@@ -1,55 +1,224 @@
+"""
+Redis connection pools, one per purpose:
+- commands: request path - constance reads and writes (via
+  CONSTANCE_REDIS_CONNECTION_CLASS), update publishing, acks
+- pubsub: long-lived subscriber connections, so they never take
+  a connection slot from requests
+
+Pools are bounded: a command waits at most REALTIME_CONFIG_REDIS_POOL_TIMEOUT
+seconds for a free connection, then fails with ConnectionError. Connections
+use TCP keepalive and are health-checked (PING) before use when idle for
+REALTIME_CONFIG_REDIS_HEALTH_CHECK_INTERVAL seconds.
+
+Pools are reset in forked children (gunicorn --preload, Celery prefork):
+connections inherited from the parent are dropped without touching the
+parent's sockets. Redis clients created before fork keep working, as they
+hold the same pool objects.
+
+redis.asyncio pools are kept per event loop, which is only worth it for
+long-lived server loops (see register_server_loop()). Async code on other
+loops, e.g. async views run by async_to_sync() under WSGI, should use the
+sync pool instead of creating an async pool per call that's never closed.
+"""
+
+import asyncio
+import os
 import redis
+import redis.asyncio
 import logging
+import threading
+import weakref
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 from typing import Any, Optional, Dict, Union
 
 
 logger = logging.getLogger(__name__)
 
-_connection_pool: Optional[redis.ConnectionPool] = None
+COMMANDS: str = 'commands'
+PUBSUB: str = 'pubsub'
+
+_pools: Dict[str, redis.BlockingConnectionPool] = {}
+_pools_lock: threading.Lock = threading.Lock()
+# redis.asyncio connections are bound to event loop, so pools per loop
+_async_connection_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, redis.asyncio.BlockingConnectionPool]]" = \
+    weakref.WeakKeyDictionary()
+# Event loops living as long as the process, e.g. ASGI server's
+_server_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
+
+def _pool_options(purpose: str) -> Dict[str, Any]:
+    """
+    Connection options from settings. Values in CONSTANCE_REDIS_CONNECTION win.
+    """
+    options: Dict[str, Any] = {
+        'max_connections': getattr(settings, 'REALTIME_CONFIG_REDIS_PUBSUB_POOL_SIZE', 4)
+                           if purpose == PUBSUB else
+                           getattr(settings, 'REALTIME_CONFIG_REDIS_POOL_SIZE', 50),
+        'timeout': getattr(settings, 'REALTIME_CONFIG_REDIS_POOL_TIMEOUT', 1.0),
+        'socket_connect_timeout': getattr(settings, 'REALTIME_CONFIG_REDIS_CONNECT_TIMEOUT', 5.0),
+        'socket_keepalive': getattr(settings, 'REALTIME_CONFIG_REDIS_KEEPALIVE', True),
+        'health_check_interval': getattr(settings, 'REALTIME_CONFIG_REDIS_HEALTH_CHECK_INTERVAL', 30),
+    }
+    # Subscribers block on read until a message comes
+    if purpose == COMMANDS:
+        options['socket_timeout'] = getattr(settings, 'REALTIME_CONFIG_REDIS_SOCKET_TIMEOUT', 5.0)
+    return options
+
+
+def _create_pool(pool_class: Any, purpose: str, **overrides: Any) -> Any:
+    """
+    Create pool of pool_class from CONSTANCE_REDIS_CONNECTION, config
+    dictionary or URL. Return None if it's not defined.
+    """
+    redis_config: Union[str, Dict[str, Any], None] = getattr(
+        settings, 'CONSTANCE_REDIS_CONNECTION', None
+    )
+    if not redis_config:
+        logger.error("CONSTANCE_REDIS_CONNECTION not defined")
+        return None
+
+    options: Dict[str, Any] = dict(_pool_options(purpose), **overrides)
+    if isinstance(redis_config, dict):
+        return pool_class(**dict(options, **redis_config))
+    if isinstance(redis_config, str):
+        return pool_class.from_url(redis_config, **options)
+    return None
+
+
+def _get_pool(purpose: str) -> Optional[redis.BlockingConnectionPool]:
+    pool: Optional[redis.BlockingConnectionPool] = _pools.get(purpose)
+    if pool is not None:
+        return pool
+
+    with _pools_lock:
+        pool = _pools.get(purpose)
+        if pool is not None:
+            return pool
+        try:
+            pool = _create_pool(redis.BlockingConnectionPool, purpose)
+        except Exception as e:
+            logger.error(f"Failed to create Redis {purpose} connection pool: {e}",
+                         exc_info=True)
+            return None
+        if pool is None:
+            logger.error("Redis connection pool could not initialize")
+            return None
+        _pools[purpose] = pool
+
+    logger.info(f"Created Redis {purpose} connection pool "
+                f"(max {pool.max_connections} connections, PID: {os.getpid()})")
+    return pool
+
+
+def _reset_pools_after_fork() -> None:
+    """
+    Child must not use parent's sockets. Pool reset drops inherited
+    connections; they are closed in the child only, not shut down.
+    """
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.reset()
+    # Event loops don't survive fork
+    _async_connection_pools.clear()
+    _server_loops.clear()
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
 
 
 def get_redis_connection() -> Optional[redis.Redis]:
     """
-    Get connection to Redis from connection pool.
+    Get Redis client on commands connection pool.
     Works with both config dictionary and URL.
     """
-    global _connection_pool
-    
-    if _connection_pool is None:
+    pool: Optional[redis.BlockingConnectionPool] = _get_pool(COMMANDS)
+    if pool is None:
+        return None
+    return redis.Redis(connection_pool=pool)
+
+
+def get_pubsub_connection() -> Optional[redis.Redis]:
+    """
+    Get Redis client on Pub/Sub connection pool, for subscribers.
+    """
+    pool: Optional[redis.BlockingConnectionPool] = _get_pool(PUBSUB)
+    if pool is None:
+        return None
+    return redis.Redis(connection_pool=pool)
+
+
+def get_constance_connection() -> redis.Redis:
+    """
+    For CONSTANCE_REDIS_CONNECTION_CLASS: constance backend uses
+    commands connection pool too.
+    """
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if redis_client is None:
+        raise ImproperlyConfigured("Can't create Redis connection pool from "
+                                   "CONSTANCE_REDIS_CONNECTION")
+    return redis_client
+
+
+def register_server_loop() -> None:
+    """
+    Mark running event loop as long-lived, so its async pools are reused.
+    """
+    _server_loops.add(asyncio.get_running_loop())
+
+
+def on_server_loop() -> bool:
+    """
+    True if running in event loop marked with register_server_loop().
+    """
+    try:
+        return asyncio.get_running_loop() in _server_loops
+    except RuntimeError:
+        return False
+
+
+def _get_async_pool(purpose: str) -> Optional[redis.asyncio.BlockingConnectionPool]:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    pools: Dict[str, redis.asyncio.BlockingConnectionPool] = \
+        _async_connection_pools.setdefault(loop, {})
+    pool: Optional[redis.asyncio.BlockingConnectionPool] = pools.get(purpose)
+
+    if pool is None:
         try:
-            redis_config: Union[str, Dict[str, Any], None] = getattr(
-                settings, 'CONSTANCE_REDIS_CONNECTION', None
-            )
-            
-            if not redis_config:
-                logger.error("CONSTANCE_REDIS_CONNECTION not defined")
-                return None
-            
-            if isinstance(redis_config, dict):
-                _connection_pool = redis.ConnectionPool(**redis_config)
-            elif isinstance(redis_config, str):
-                _connection_pool = redis.ConnectionPool.from_url(redis_config)
-            else:
-                return None
-                
-            logger.info(f"Created Redis connection pool with {redis_config}")
-        
+            # No socket read timeout, bound command calls with asyncio.wait_for()
+            pool = _create_pool(redis.asyncio.BlockingConnectionPool, purpose,
+                                socket_timeout=None)
         except Exception as e:
-            logger.error(f"Failed to create Redis connection pool: {e}",
+            logger.error(f"Failed to create async Redis {purpose} connection pool: {e}",
                          exc_info=True)
-            _connection_pool = None
             return None
-    
-    if _connection_pool is None:
-        logger.error("Redis connection pool could not initialize")
+        if pool is None:
+            return None
+        pools[purpose] = pool
+        logger.info(f"Created async Redis {purpose} connection pool "
+                    f"(max {pool.max_connections} connections, PID: {os.getpid()})")
+    return pool
+
+
+def get_async_redis_connection() -> Optional[redis.asyncio.Redis]:
+    """
+    Get asyncio Redis client on commands connection pool of running event loop.
+    Works with both config dictionary and URL.
+    Socket read timeout isn't set - bound command calls with asyncio.wait_for().
+    """
+    pool: Optional[redis.asyncio.BlockingConnectionPool] = _get_async_pool(COMMANDS)
+    if pool is None:
         return None
+    return redis.asyncio.Redis(connection_pool=pool)
 
-    try:
-        return redis.Redis(connection_pool=_connection_pool,
-                           socket_timeout=5.0, socket_connect_timeout = 5.0)
-    except Exception as e:
-        logger.error(f"Failed to get Redis connection from pool: {e}",
-                     exc_info=True)
+
+def get_async_pubsub_connection() -> Optional[redis.asyncio.Redis]:
+    """
+    Get asyncio Redis client on Pub/Sub connection pool of running event loop.
+    """
+    pool: Optional[redis.asyncio.BlockingConnectionPool] = _get_async_pool(PUBSUB)
+    if pool is None:
         return None
+    return redis.asyncio.Redis(connection_pool=pool)
@@ -0,0 +1,130 @@
+"""
+Per-host shared-memory config snapshot.
+
+One process per host (elected with flock) owns the Pub/Sub subscription and
+writes a versioned snapshot of all configs into a memory-mapped file.
+Other processes read it with a seqlock consistency check.
+
+Region layout:
+- seq (uint64): odd while snapshot is being written, changes on every write
+- version (uint64): snapshot version, grows across owner changes
+- length (uint32): payload length
+- payload: configs serialized with constance codecs
+"""
+
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import time
+from constance.codecs import dumps, loads
+
+from typing import Any, Dict, NamedTuple, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_SEQ = struct.Struct('<Q')
+_VERSION_LENGTH = struct.Struct('<QI')
+_HEADER_SIZE: int = _SEQ.size + _VERSION_LENGTH.size
+# Reader gives up if snapshot keeps changing under it
+_READ_ATTEMPTS: int = 100
+
+
+class SharedSnapshot(NamedTuple):
+    seq: int
+    version: int
+    values: Dict[str, Any]
+
+
+class SharedConfigRegion:
+    """
+    Memory-mapped config snapshot file. Single writer (lock owner),
+    many lock-free readers.
+    """
+    def __init__(self, path: str, size: int):
+        self.path: str = path
+        self.size: int = size
+        fd: int = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mm: mmap.mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._lock_fd: Optional[int] = None
+
+    def seq(self) -> int:
+        """
+        Current write sequence, 0 if nothing was written yet.
+        """
+        seq: int = _SEQ.unpack_from(self._mm, 0)[0]
+        return seq
+
+    def read(self) -> Optional[SharedSnapshot]:
+        """
+        Read consistent snapshot. Return None if there is none yet,
+        or writer keeps changing it.
+        """
+        for _ in range(_READ_ATTEMPTS):
+            seq_before: int = self.seq()
+            if seq_before == 0:
+                return None
+            if seq_before & 1:
+                time.sleep(0)
+                continue
+
+            version, length = _VERSION_LENGTH.unpack_from(self._mm, _SEQ.size)
+            if length > self.size - _HEADER_SIZE:
+                continue
+            payload: bytes = self._mm[_HEADER_SIZE:_HEADER_SIZE + length]
+
+            if self.seq() != seq_before:
+                continue
+
+            try:
+                values: Dict[str, Any] = loads(payload.decode('utf-8'))
+            except (ValueError, UnicodeDecodeError) as e:
+                logger.error(f"Failed to decode shared config snapshot "
+                             f"{self.path}. Error: {e}")
+                return None
+            return SharedSnapshot(seq=seq_before, version=version, values=values)
+
+        logger.warning(f"Failed to read consistent shared config snapshot {self.path}")
+        return None
+
+    def write(self, values: Dict[str, Any]) -> Optional[int]:
+        """
+        Write new snapshot version. Only call from the owner process.
+        Return new seq, or None if snapshot doesn't fit into region.
+        """
+        payload: bytes = dumps(values).encode('utf-8')
+        if len(payload) > self.size - _HEADER_SIZE:
+            logger.error(f"Config snapshot of {len(payload)} bytes doesn't fit "
+                         f"into shared region {self.path} of {self.size} bytes")
+            return None
+
+        seq: int = self.seq()
+        version: int = _VERSION_LENGTH.unpack_from(self._mm, _SEQ.size)[0]
+        # Odd seq left by an owner that died mid-write stays odd after +2
+        writing_seq: int = seq + 1 if seq % 2 == 0 else seq + 2
+
+        _SEQ.pack_into(self._mm, 0, writing_seq)
+        self._mm[_HEADER_SIZE:_HEADER_SIZE + len(payload)] = payload
+        _VERSION_LENGTH.pack_into(self._mm, _SEQ.size, version + 1, len(payload))
+        _SEQ.pack_into(self._mm, 0, writing_seq + 1)
+        return writing_seq + 1
+
+    def acquire_owner_lock(self) -> None:
+        """
+        Block until this process owns the region. Lock is released by the
+        kernel when the process exits, so a waiting process takes over.
+        """
+        lock_fd: int = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(lock_fd, fcntl.LOCK_EX)
+        self._lock_fd = lock_fd
+
+    @property
+    def is_owner(self) -> bool:
+        return self._lock_fd is not None
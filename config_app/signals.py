@@ -1,8 +1,10 @@
 import logging
 import redis
+import time
 from django.conf import settings
+from . import change_log_writer
 from .redis_client import get_redis_connection
-from .models import ConfigChangeLog
+from .update_messages import encode_update, version_counter_key
 
 from typing import Any, Optional
 
@@ -17,27 +19,32 @@ def config_updated_handler(
         **kwargs: Any
     ) -> None:
     """
-    Call when constance config updates. Publish key to Redis Pub/Sub channel.
-    + Log change to database.
+    Call when constance config updates. Publish key, new value and version
+    to Redis Pub/Sub channel.
+    + Log change to database, after publishing and off this thread.
+    Keys of a changeset (changeset=True) are already published and logged.
     """
+    if kwargs.get('changeset'):
+        return
+
     logger.info(f"Signal config_updated received for key='{key}'. "
                 f"Old='{old_value}', New='{new_value}'")
 
+    _publish_update(key, old_value, new_value)
+
     # Logging to DB
-    try:
-        old: Optional[str] = str(old_value) if old_value is not None else None
-        new: str = str(new_value) if new_value is not None else ""
-
-        ConfigChangeLog.objects.create(
-            key=key,
-            old_value=old,
-            new_value=new
-        )
-        logger.info(f"Logged change for config {key} to DB")
-    except Exception as e:
-        logger.error(f"Failed to log change for config {key}. Error: {e}",
-                     exc_info=True)
-    
+    change_log_writer.enqueue(key, old_value, new_value)
+    logger.debug(f"Queued change log for config {key}")
+
+
+def _publish_update(key: str, old_value: Optional[Any], new_value: Any) -> None:
+    """
+    Publish versioned update message, unless key tracking notifies subscribers.
+    """
+    # Subscribers are notified by Redis key tracking
+    if getattr(settings, 'REALTIME_CONFIG_INVALIDATION_BACKEND', 'pubsub') == 'tracking':
+        return
+
     channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
     if not channel_name:
         logger.error("REDIS_PUB_SUB_CHANNEL not defined")
@@ -49,10 +56,24 @@ def config_updated_handler(
         return
 
     try:
-        got_msg_count: int = redis_client.publish(channel_name, key)
-        logger.info(f"Published key='{key}' to Redis channel '{channel_name}'. "
+        message: str = key
+        try:
+            version: int = redis_client.incr(version_counter_key(channel_name))
+            message = encode_update(key, new_value, version, published_at=time.time(),
+                                    old_value=old_value)
+        except TypeError as e:
+            logger.warning(f"Can't serialize new value for key='{key}', "
+                           f"publishing bare key. Error: {e}")
+
+        got_msg_count: int = redis_client.publish(channel_name, message)
+        logger.info(f"Published update for key='{key}' to Redis channel '{channel_name}'. "
                     f"Subscribers notified: {got_msg_count}")
 
+        # For subscribers still on bare-key format during rolling upgrade
+        if message != key and getattr(settings, 'REDIS_PUB_SUB_LEGACY_PUBLISH', False):
+            redis_client.publish(channel_name, key)
+            logger.info(f"Published bare key='{key}' to Redis channel '{channel_name}'")
+
     except redis.exceptions.RedisError as e:
         logger.error(f"Redis error during publishing for key='{key}'. Error: {e}",
                      exc_info=True)
@@ -1,26 +1,75 @@
-from django.test import TestCase, override_settings
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from unittest import skipUnless
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError
+from django.utils import timezone
 
-from unittest.mock import patch
+from unittest.mock import AsyncMock, MagicMock, patch
+from asgiref.sync import async_to_sync, iscoroutinefunction
+import asyncio
+import datetime
+import importlib.util
+import io
+import json
+import logging
+import os
 import redis
+import socket
+import struct
+import tempfile
+import threading
 import time
 
-from . import realtime_config
+from . import change_log_writer, changesets, circuit_breaker, feature_flags, live_updates, log_utils, \
+    metrics, overrides, propagation, realtime_config, redis_client, views
+from .middleware import ConfigSnapshotMiddleware
+from .models import ConfigChangeLog
+from .signals import config_updated_handler
+from .shared_cache import SharedConfigRegion
+from .snapshot_file import read_snapshot_file, write_snapshot_file
+from .update_messages import encode_override, encode_update
 from constance.backends.redisd import RedisBackend
+from constance import settings as constance_settings
+from constance.codecs import dumps
+from constance.signals import config_updated
+
+
+def redis_server_available():
+    """
+    Check if Redis from settings is reachable, for tests against real server.
+    """
+    try:
+        return redis.Redis(**settings.CONSTANCE_REDIS_CONNECTION,
+                           socket_connect_timeout=0.5).ping()
+    except redis.exceptions.RedisError:
+        return False
 
 
 def reset_set_up():
     """
     Clear module on app start.
     """
-    realtime_config._local_cache.clear()
+    realtime_config.clear_cache()
+    realtime_config._reset_versions()
     realtime_config._default_values.clear()
-    realtime_config._redis_available = True
-    realtime_config._last_redis_error_time = 0.0
+    realtime_config.redis_breaker.reset()
+    propagation._pending_acks.clear()
+    propagation._applied_version = 0
+    change_log_writer._buffer.clear()
+    live_updates.reset()
+    overrides._index.clear()
+    overrides._versions.clear()
+    overrides._mark_stale()
+    overrides._next_load_time = 0.0
         
 
 @override_settings(
-    REDIS_RETRY_INTERVAL=0.01
+    REDIS_RETRY_INTERVAL=0.01,
+    REDIS_BREAKER_MAX_DELAY=0.05
 )
 class RealTimeConfigTests(TestCase):
 
@@ -63,8 +112,8 @@ class RealTimeConfigTests(TestCase):
         value = realtime_config.get_config('WELCOME_MESSAGE')
         self.assertEqual(value, expected_value)
         mock_constance_backend_get_error.assert_called_once_with('WELCOME_MESSAGE')
-        self.assertFalse(realtime_config._redis_available,
-                         "Redis should be marked as unavailable")
+        self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.OPEN,
+                         "Redis circuit breaker should be open")
 
         mock_constance_backend_get_error.reset_mock()
         self.assertEqual(realtime_config.get_config('WELCOME_MESSAGE'),
@@ -72,7 +121,21 @@ class RealTimeConfigTests(TestCase):
         mock_constance_backend_get_error.assert_not_called()
 
         retry_interval = settings.REDIS_RETRY_INTERVAL
-        time.sleep(retry_interval + 0.01)
+
+        # Health probe runs in background, requests keep failing fast
+        with patch.object(realtime_config, '_probe_redis',
+                          side_effect=redis.exceptions.ConnectionError("Redis is down")):
+            time.sleep(retry_interval + 0.05)
+            self.assertEqual(realtime_config.get_config('WELCOME_MESSAGE'),
+                             expected_value)
+            mock_constance_backend_get_error.assert_not_called()
+
+        with patch.object(realtime_config, '_probe_redis'):
+            for _ in range(100):
+                if realtime_config.redis_breaker.state == circuit_breaker.CLOSED:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.CLOSED)
 
         self.assertEqual(realtime_config.get_config('WELCOME_MESSAGE'),
                          expected_value)
@@ -89,4 +152,1285 @@ class RealTimeConfigTests(TestCase):
         value = realtime_config.get_config('SITE_NAME', default=expected_value)
         self.assertEqual(value, expected_value)
         mock_constance_backend_get_error_arg.assert_called_once_with('SITE_NAME')
-        self.assertFalse(realtime_config._redis_available)
+        self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.OPEN)
+
+
+    @patch.object(RedisBackend, 'get')
+    def test_cache_snapshot_copy_on_write(self, mock_constance_backend_get):
+        """
+        Invalidation swaps the cache snapshot, readers' old snapshot stays intact.
+        """
+        mock_constance_backend_get.return_value = 'Cached'
+        realtime_config.get_config('SITE_NAME')
+        snapshot = realtime_config._local_cache
+
+        with self.assertRaises(TypeError):
+            snapshot['SITE_NAME'] = 'Mutated'
+
+        self.assertEqual(realtime_config._cache_pop('SITE_NAME'), 'Cached')
+        self.assertEqual(snapshot['SITE_NAME'], 'Cached')
+        self.assertNotIn('SITE_NAME', realtime_config._local_cache)
+        self.assertIs(realtime_config._cache_pop('SITE_NAME'),
+                      realtime_config._MISSING)
+
+
+    @patch.object(RedisBackend, 'mget')
+    def test_get_configs_batches_misses(self, mock_constance_backend_mget):
+        """
+        Cached keys are served locally, all misses go to Redis in one MGET.
+        Keys unset in Redis get constance defaults.
+        """
+        realtime_config._cache_set('SITE_NAME', 'Cached Name')
+        mock_constance_backend_mget.return_value = iter([('ITEMS_PER_PAGE', 42)])
+
+        values = realtime_config.get_configs(
+            ['SITE_NAME', 'ITEMS_PER_PAGE', 'SHOW_LOGS'])
+
+        self.assertEqual(values, {
+            'SITE_NAME': 'Cached Name',
+            'ITEMS_PER_PAGE': 42,
+            'SHOW_LOGS': settings.CONSTANCE_CONFIG['SHOW_LOGS'][0],
+        })
+        mock_constance_backend_mget.assert_called_once_with(
+            ['ITEMS_PER_PAGE', 'SHOW_LOGS'])
+        self.assertEqual(realtime_config._local_cache['ITEMS_PER_PAGE'], 42)
+
+        mock_constance_backend_mget.reset_mock()
+        realtime_config.get_configs(['SITE_NAME', 'ITEMS_PER_PAGE', 'SHOW_LOGS'])
+        mock_constance_backend_mget.assert_not_called()
+
+
+    @patch.object(RedisBackend, 'mget')
+    @patch.object(RedisBackend, 'get')
+    def test_fetch_doesnt_overwrite_pushed_update(self, mock_constance_backend_get,
+                                                  mock_constance_backend_mget):
+        """
+        Update pushed while a miss is being fetched wins over the fetched
+        value, which may have been read before the update.
+        """
+        def get_then_push(key):
+            realtime_config._handle_message(encode_update(key, 'Pushed', version=1))
+            return 'Fetched'
+
+        def mget_then_push(keys):
+            realtime_config._handle_message(encode_update('THEME_COLOR', '#ffffff', version=2))
+            return iter([(key, 'Fetched') for key in keys])
+
+        mock_constance_backend_get.side_effect = get_then_push
+        self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Pushed')
+        self.assertEqual(realtime_config._local_cache['SITE_NAME'], 'Pushed')
+
+        mock_constance_backend_mget.side_effect = mget_then_push
+        values = realtime_config.get_configs(['THEME_COLOR', 'WELCOME_MESSAGE'])
+        self.assertEqual(values, {'THEME_COLOR': '#ffffff', 'WELCOME_MESSAGE': 'Fetched'})
+        self.assertEqual(realtime_config._local_cache['THEME_COLOR'], '#ffffff')
+        self.assertEqual(realtime_config._local_cache['WELCOME_MESSAGE'], 'Fetched')
+
+
+    @patch.object(RedisBackend, 'mget',
+                  side_effect=redis.exceptions.ConnectionError("Redis is down"))
+    def test_get_configs_fallback(self, mock_constance_backend_mget_error):
+        """
+        Redis unavailable -> per-key fallback to passed or settings defaults.
+        """
+        values = realtime_config.get_configs(
+            ['SITE_NAME', 'LOGS_COUNT'], defaults={'SITE_NAME': 'Argument Default'})
+
+        self.assertEqual(values, {
+            'SITE_NAME': 'Argument Default',
+            'LOGS_COUNT': realtime_config._default_values['LOGS_COUNT'],
+        })
+        mock_constance_backend_mget_error.assert_called_once()
+        self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.OPEN)
+        self.assertNotIn('LOGS_COUNT', realtime_config._local_cache)
+
+
+    @patch.object(RedisBackend, 'mget')
+    def test_warm_up_cache(self, mock_constance_backend_mget):
+        """
+        Warm-up loads every configured key with one MGET.
+        """
+        mock_constance_backend_mget.return_value = iter([('SITE_NAME', 'Warm')])
+
+        self.assertTrue(realtime_config.warm_up_cache(timeout=1.0))
+        mock_constance_backend_mget.assert_called_once_with(
+            list(settings.CONSTANCE_CONFIG.keys()))
+        self.assertEqual(realtime_config._local_cache['SITE_NAME'], 'Warm')
+        self.assertEqual(set(realtime_config._local_cache),
+                         set(settings.CONSTANCE_CONFIG))
+
+
+    @patch.object(RedisBackend, 'mget',
+                  side_effect=lambda keys: time.sleep(0.2) or iter([]))
+    def test_warm_up_cache_timeout(self, mock_constance_backend_mget_slow):
+        """
+        Slow Redis -> warm-up gives up, cache stays empty, defaults are used.
+        """
+        self.assertFalse(realtime_config.warm_up_cache(timeout=0.01))
+        self.assertEqual(len(realtime_config._local_cache), 0)
+        time.sleep(0.25)
+        self.assertEqual(len(realtime_config._local_cache), 0)
+
+
+    def test_versioned_update_message(self):
+        """
+        Versioned message is applied to cache directly, stale and duplicate
+        versions are ignored, legacy bare key invalidates.
+        """
+        realtime_config._reset_versions()
+
+        realtime_config._handle_message(
+            encode_update('ITEMS_PER_PAGE', 20, version=5).encode('utf-8'))
+        self.assertEqual(realtime_config._local_cache['ITEMS_PER_PAGE'], 20)
+
+        realtime_config._handle_message(encode_update('ITEMS_PER_PAGE', 15, version=4))
+        realtime_config._handle_message(encode_update('ITEMS_PER_PAGE', 25, version=5))
+        self.assertEqual(realtime_config._local_cache['ITEMS_PER_PAGE'], 20)
+
+        realtime_config._handle_message(encode_update('ITEMS_PER_PAGE', 30, version=6))
+        self.assertEqual(realtime_config._local_cache['ITEMS_PER_PAGE'], 30)
+
+        realtime_config._handle_message(b'ITEMS_PER_PAGE')
+        self.assertNotIn('ITEMS_PER_PAGE', realtime_config._local_cache)
+
+
+    @patch.object(RedisBackend, 'get',
+                  side_effect=lambda key: time.sleep(0.1) or 'Fetched')
+    def test_single_flight_coalesces_misses(self, mock_constance_backend_get_slow):
+        """
+        Concurrent misses for one key -> one Redis fetch, others wait for it.
+        """
+        stats_before = realtime_config.get_single_flight_stats()
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(realtime_config.get_config('SITE_NAME')))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['Fetched'] * 5)
+        mock_constance_backend_get_slow.assert_called_once_with('SITE_NAME')
+        stats_after = realtime_config.get_single_flight_stats()
+        self.assertEqual(stats_after['fetches'] - stats_before['fetches'], 1)
+        self.assertEqual(stats_after['coalesced'] - stats_before['coalesced'], 4)
+
+
+    @override_settings(REALTIME_CONFIG_SINGLE_FLIGHT_TIMEOUT=0.01)
+    @patch.object(RedisBackend, 'get',
+                  side_effect=lambda key: time.sleep(0.2) or 'Fetched')
+    def test_single_flight_wait_timeout(self, mock_constance_backend_get_slow):
+        """
+        Waiter that times out falls back to default.
+        """
+        leader = threading.Thread(target=realtime_config.get_config,
+                                  args=('SITE_NAME',))
+        leader.start()
+        time.sleep(0.05)
+
+        self.assertEqual(realtime_config.get_config('SITE_NAME', default='Waiter'),
+                         'Waiter')
+        leader.join()
+        mock_constance_backend_get_slow.assert_called_once_with('SITE_NAME')
+
+
+    @override_settings(REALTIME_CONFIG_SOFT_TTL_PER_KEY={'SITE_NAME': 0.0})
+    @patch.object(RedisBackend, 'mget')
+    def test_refresh_expired(self, mock_constance_backend_mget):
+        """
+        Expired key keeps being served from cache, refresher re-reads it.
+        Keys without soft TTL are not refreshed.
+        """
+        realtime_config._cache_update({'SITE_NAME': 'Stale', 'THEME_COLOR': '#000000'})
+        self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Stale')
+        mock_constance_backend_mget.assert_not_called()
+
+        mock_constance_backend_mget.return_value = iter([('SITE_NAME', 'Fresh')])
+        self.assertEqual(realtime_config.refresh_expired(), 1)
+        mock_constance_backend_mget.assert_called_once_with(['SITE_NAME'])
+        self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Fresh')
+        self.assertEqual(realtime_config.get_config('THEME_COLOR'), '#000000')
+
+
+    async def test_aget_config_coalesces_misses(self):
+        """
+        Concurrent async misses for one key -> one redis.asyncio MGET.
+        """
+        async def slow_mget(keys):
+            await asyncio.sleep(0.05)
+            return [dumps('Async Value').encode('utf-8')]
+
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(side_effect=slow_mget)
+        # As in ASGI server, where async pools are used
+        redis_client.register_server_loop()
+
+        with patch.object(realtime_config, 'get_async_redis_connection',
+                          return_value=mock_redis):
+            results = await asyncio.gather(
+                *[realtime_config.aget_config('SITE_NAME') for _ in range(5)])
+
+        self.assertEqual(results, ['Async Value'] * 5)
+        mock_redis.mget.assert_awaited_once()
+        self.assertEqual(realtime_config._local_cache['SITE_NAME'], 'Async Value')
+
+
+    async def test_aget_configs_fallback(self):
+        """
+        Async Redis error -> per-key fallback, unset keys get constance default.
+        """
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(
+            side_effect=redis.exceptions.ConnectionError("Redis is down"))
+        # As in ASGI server, where async pools are used
+        redis_client.register_server_loop()
+
+        with patch.object(realtime_config, 'get_async_redis_connection',
+                          return_value=mock_redis):
+            values = await realtime_config.aget_configs(
+                ['SITE_NAME', 'LOGS_COUNT'], defaults={'SITE_NAME': 'Argument Default'})
+
+        self.assertEqual(values, {
+            'SITE_NAME': 'Argument Default',
+            'LOGS_COUNT': realtime_config._default_values['LOGS_COUNT'],
+        })
+        self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.OPEN)
+
+
+    async def test_aconfig_snapshot_and_aget_derived(self):
+        """
+        aconfig_snapshot() fetches misses through async Redis once and pins
+        values, lazily on first read with lazy=True. aget_derived() memoizes.
+        """
+        realtime_config._cache_update(
+            {key: f"Value {key}" for key in settings.CONSTANCE_CONFIG if key != 'THEME_COLOR'})
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(return_value=[dumps('#102030').encode('utf-8')])
+        redis_client.register_server_loop()
+        calls = []
+
+        def theme_rgb(theme_color):
+            calls.append(theme_color)
+            return views._theme_rgb(theme_color)
+
+        with patch.object(realtime_config, 'get_async_redis_connection',
+                          return_value=mock_redis), \
+             patch.dict(realtime_config._derived_defs), \
+             patch.dict(realtime_config._derived_dependents, {'THEME_COLOR': []}):
+            realtime_config.register_derived('test_theme_rgb', ('THEME_COLOR',), theme_rgb)
+            async with realtime_config.aconfig_snapshot(lazy=True):
+                mock_redis.mget.assert_not_awaited()
+                self.assertEqual(await realtime_config.aget_config('SITE_NAME'), 'Value SITE_NAME')
+                mock_redis.mget.assert_awaited_once()
+                realtime_config._handle_message(encode_update('THEME_COLOR', '#ffffff', version=1))
+                self.assertEqual(await realtime_config.aget_config('THEME_COLOR'), '#102030')
+                self.assertEqual(await realtime_config.aget_derived('test_theme_rgb'), (16, 32, 48))
+
+            async with realtime_config.aconfig_snapshot() as snapshot:
+                self.assertEqual(snapshot['THEME_COLOR'], '#ffffff')
+                self.assertEqual(await realtime_config.aget_derived('test_theme_rgb'), (255, 255, 255))
+            self.assertEqual(await realtime_config.aget_derived('test_theme_rgb'), (255, 255, 255))
+            self.assertEqual(calls, ['#102030', '#ffffff'])
+            mock_redis.mget.assert_awaited_once()
+            realtime_config._derived_values.pop('test_theme_rgb', None)
+
+
+    @patch.object(RedisBackend, 'mget')
+    def test_aget_configs_off_server_loop(self, mock_constance_backend_mget):
+        """
+        Loop of a single async_to_sync() call (async view under WSGI) reads
+        through sync pool, no async pool is created for it.
+        """
+        mock_constance_backend_mget.return_value = iter([('SITE_NAME', 'Sync Pool')])
+        with patch.object(realtime_config, 'get_async_redis_connection') as mock_async_connection:
+            values = async_to_sync(realtime_config.aget_configs)(['SITE_NAME'])
+        self.assertEqual(values, {'SITE_NAME': 'Sync Pool'})
+        mock_async_connection.assert_not_called()
+        self.assertEqual(realtime_config._local_cache['SITE_NAME'], 'Sync Pool')
+
+
+    @patch.object(RedisBackend, 'get')
+    def test_shared_cache_snapshot(self, mock_constance_backend_get):
+        """
+        Reader follows snapshot written by owner, without Redis.
+        Snapshot being written (odd seq) isn't read.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'realtime_config.cache')
+            owner = SharedConfigRegion(path, 4096)
+            reader = SharedConfigRegion(path, 4096)
+            self.assertIsNone(reader.read())
+
+            owner.write({'SITE_NAME': 'Shared', 'ITEMS_PER_PAGE': 7})
+            snapshot = reader.read()
+            self.assertEqual(snapshot.version, 1)
+            self.assertEqual(snapshot.values, {'SITE_NAME': 'Shared', 'ITEMS_PER_PAGE': 7})
+
+            realtime_config._shared_region = reader
+            try:
+                self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Shared')
+                owner.write({'SITE_NAME': 'Updated', 'ITEMS_PER_PAGE': 7})
+                self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Updated')
+            finally:
+                realtime_config._shared_region = None
+                realtime_config._shared_seq = 0
+            mock_constance_backend_get.assert_not_called()
+
+            # Owner's readers keep newer local values over its last snapshot
+            realtime_config._shared_region = owner
+            try:
+                with patch.object(owner, '_lock_fd', -1):
+                    realtime_config._cache_set('SITE_NAME', 'Newer')
+                    self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Newer')
+            finally:
+                realtime_config._shared_region = None
+                realtime_config._shared_seq = 0
+
+            struct.pack_into('<Q', owner._mm, 0, owner.seq() + 1)
+            self.assertIsNone(reader.read())
+            owner.write({'SITE_NAME': 'Recovered'})
+            self.assertEqual(reader.read().values, {'SITE_NAME': 'Recovered'})
+
+
+    def test_key_tracking_invalidation(self):
+        """
+        Tracking invalidation pops constance keys, ignores other prefixes,
+        clears cache on flush.
+        """
+        prefix = constance_settings.REDIS_PREFIX
+        realtime_config._cache_update({'SITE_NAME': 'Old', 'THEME_COLOR': '#000000'})
+
+        realtime_config._handle_invalidation(
+            [f"{prefix}SITE_NAME".encode('utf-8'), b'other:THEME_COLOR'], prefix)
+        self.assertNotIn('SITE_NAME', realtime_config._local_cache)
+        self.assertIn('THEME_COLOR', realtime_config._local_cache)
+
+        realtime_config._handle_invalidation(None, prefix)
+        self.assertEqual(len(realtime_config._local_cache), 0)
+
+
+    @skipUnless(redis_server_available(), "Redis server is not available")
+    def test_key_tracking_against_redis_server(self):
+        """
+        Direct write to constance key in Redis invalidates local cache.
+        """
+        prefix = constance_settings.REDIS_PREFIX
+        redis_client = redis.Redis(**settings.CONSTANCE_REDIS_CONNECTION)
+        realtime_config._cache_set('SITE_NAME', 'Old')
+
+        subscriber = threading.Thread(target=realtime_config.run_tracking_subscriber,
+                                      daemon=True)
+        subscriber.start()
+        time.sleep(0.2)
+
+        redis_client.set(f"{prefix}SITE_NAME", dumps('Written directly'))
+        for _ in range(50):
+            if 'SITE_NAME' not in realtime_config._local_cache:
+                break
+            time.sleep(0.01)
+        self.assertNotIn('SITE_NAME', realtime_config._local_cache)
+        redis_client.delete(f"{prefix}SITE_NAME")
+
+
+    @patch.object(RedisBackend, 'mget')
+    @patch.object(RedisBackend, 'get')
+    def test_config_snapshot_scope(self, mock_constance_backend_get,
+                                   mock_constance_backend_mget):
+        """
+        Inside config_snapshot() values don't change on updates
+        and Redis isn't accessed.
+        """
+        realtime_config._cache_update(
+            {key: f"Value {key}" for key in settings.CONSTANCE_CONFIG})
+
+        with realtime_config.config_snapshot():
+            realtime_config._handle_message(encode_update('SITE_NAME', 'New', version=1))
+            realtime_config._cache_pop('THEME_COLOR')
+
+            self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Value SITE_NAME')
+            self.assertEqual(realtime_config.get_config('THEME_COLOR'), 'Value THEME_COLOR')
+            self.assertEqual(realtime_config.get_configs(['SITE_NAME', 'NOT_A_CONFIG']),
+                             {'SITE_NAME': 'Value SITE_NAME', 'NOT_A_CONFIG': None})
+
+        self.assertEqual(realtime_config.get_config('SITE_NAME'), 'New')
+        mock_constance_backend_get.assert_not_called()
+        mock_constance_backend_mget.assert_not_called()
+
+
+    def test_snapshot_middleware_sync_and_async(self):
+        """
+        Middleware pins a lazy snapshot on both paths: built on first
+        config read, not for requests reading no configs.
+        """
+        realtime_config._cache_update(
+            {key: f"Value {key}" for key in settings.CONSTANCE_CONFIG})
+        seen = []
+
+        def read_configs(request):
+            seen.append(realtime_config.get_config('SITE_NAME'))
+            realtime_config._handle_message(encode_update('SITE_NAME', 'New', version=1))
+            seen.append(realtime_config.get_config('SITE_NAME'))
+            return HttpResponse()
+
+        async def aread_configs(request):
+            seen.append(await realtime_config.aget_config('SITE_NAME'))
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Newer', version=2))
+            seen.append(await realtime_config.aget_config('SITE_NAME'))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with patch.object(realtime_config, '_build_snapshot') as mock_build, \
+                patch.object(realtime_config, '_abuild_snapshot') as mock_abuild:
+            ConfigSnapshotMiddleware(lambda request: HttpResponse())(request)
+            async_to_sync(ConfigSnapshotMiddleware(AsyncMock(return_value=HttpResponse())))(request)
+        mock_build.assert_not_called()
+        mock_abuild.assert_not_called()
+
+        ConfigSnapshotMiddleware(read_configs)(request)
+        middleware = ConfigSnapshotMiddleware(aread_configs)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(request)
+        self.assertEqual(seen, ['Value SITE_NAME', 'Value SITE_NAME', 'New', 'New'])
+        self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Newer')
+
+
+    def test_circuit_breaker_backoff(self):
+        """
+        Breaker opens on failure threshold, probe failures grow backoff,
+        probe success closes it.
+        """
+        probe_results = [redis.exceptions.ConnectionError("down"),
+                         redis.exceptions.ConnectionError("down"), None]
+        probe_calls = []
+
+        def probe():
+            probe_calls.append(time.monotonic())
+            result = probe_results.pop(0)
+            if result is not None:
+                raise result
+
+        breaker = circuit_breaker.CircuitBreaker('test', probe=probe)
+        with self.settings(REDIS_BREAKER_FAILURE_THRESHOLD=2):
+            breaker.record_failure()
+            self.assertTrue(breaker.allow_request())
+            breaker.record_failure()
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.stats()['trips'], 1)
+
+        for _ in range(100):
+            if breaker.state == circuit_breaker.CLOSED:
+                break
+            time.sleep(0.01)
+
+        self.assertEqual(breaker.state, circuit_breaker.CLOSED)
+        self.assertEqual(len(probe_calls), 3)
+        self.assertTrue(breaker.allow_request())
+
+
+    @patch.object(RedisBackend, 'get',
+                  side_effect=redis.exceptions.ConnectionError("Redis is down"))
+    def test_snapshot_file(self, mock_constance_backend_get_error):
+        """
+        Snapshot file written by subscriber process is loaded on start,
+        values are used while Redis is down. Rewrite isn't blocked by a file
+        from before versions started over.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'snapshot.json')
+
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Saved', version=3))
+            realtime_config._write_snapshot_file(path)
+            self.assertEqual(read_snapshot_file(path).version, 1)
+
+            write_snapshot_file(path, 5, {'SITE_NAME': 'Old', 'THEME_COLOR': '#123456'})
+            # Resubscribe after Redis restart, version counter starts over
+            realtime_config._reset_versions()
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Newer', version=1))
+            realtime_config._write_snapshot_file(path)
+            snapshot = read_snapshot_file(path)
+            self.assertEqual(snapshot.version, 6)
+            self.assertEqual(snapshot.values['SITE_NAME'], 'Newer')
+            self.assertEqual(snapshot.values['THEME_COLOR'], '#123456')
+            write_snapshot_file(path, 7, {**snapshot.values, 'NOT_A_CONFIG': 1})
+
+            reset_set_up()
+            realtime_config.load_defaults()
+            with self.settings(REALTIME_CONFIG_SNAPSHOT_FILE=path), \
+                 patch.object(realtime_config, '_revalidate') as mock_revalidate:
+                self.assertTrue(realtime_config.load_snapshot_file())
+            mock_revalidate.assert_called_once()
+
+            self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Newer')
+            self.assertNotIn('NOT_A_CONFIG', realtime_config._local_cache)
+            realtime_config.clear_cache()
+            self.assertEqual(realtime_config.get_config('SITE_NAME'), 'Newer')
+
+
+    @patch.object(realtime_config, '_version_counter', return_value=10)
+    def test_snapshot_file_stale_writer(self, mock_version_counter):
+        """
+        Process behind on updates, writing after a fresh one, doesn't overwrite
+        fresher values. Values loaded from the file keep their stamps. Versions
+        from before Redis counter reset don't block newer values.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'snapshot.json')
+
+            # Fresh process applied version 5 and wrote the file
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Fresh', version=5))
+            realtime_config._write_snapshot_file(path)
+
+            # Stale process still at version 3, its value stored later
+            reset_set_up()
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Stale', version=3))
+            realtime_config._cache_update({'THEME_COLOR': '#abcdef'})
+            realtime_config._write_snapshot_file(path)
+            snapshot = read_snapshot_file(path)
+            self.assertEqual(snapshot.version, 2)
+            self.assertEqual(snapshot.values['SITE_NAME'], 'Fresh')
+            self.assertEqual(snapshot.stamps['SITE_NAME'][0], 5)
+            self.assertEqual(snapshot.values['THEME_COLOR'], '#abcdef')
+
+            # Process started later loads the file, fresh process applies
+            # version 6 before it, then the later process writes
+            reset_set_up()
+            with self.settings(REALTIME_CONFIG_SNAPSHOT_FILE=path), \
+                 patch.object(realtime_config, '_revalidate'):
+                self.assertTrue(realtime_config.load_snapshot_file())
+            write_snapshot_file(path, 3, {**snapshot.values, 'SITE_NAME': 'Fresher'},
+                                {**snapshot.stamps, 'SITE_NAME': (6, time.time() - 0.5)})
+            realtime_config._write_snapshot_file(path)
+            self.assertEqual(read_snapshot_file(path).values['SITE_NAME'], 'Fresher')
+
+            mock_version_counter.return_value = 1
+            realtime_config._reset_versions()
+            realtime_config._handle_message(encode_update('SITE_NAME', 'After reset', version=1))
+            realtime_config._write_snapshot_file(path)
+            self.assertEqual(read_snapshot_file(path).values['SITE_NAME'], 'After reset')
+
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), "fakeredis is not installed")
+    def test_benchmark_command(self):
+        """
+        Benchmark command runs every case against fakeredis and prints JSON.
+        """
+        output = io.StringIO()
+        call_command('benchmark_realtime_config', fakeredis=True, threads=2,
+                     iterations=1000, samples=5, stdout=output)
+        results = json.loads(output.getvalue())['results']
+
+        self.assertEqual([run['threads'] for run in results['hit_throughput']], [1, 2])
+        self.assertEqual(results['miss_latency']['samples'], 5)
+        # Percentiles of few samples stay within them
+        self.assertLessEqual(results['miss_latency']['p99_us'], results['miss_latency']['max_us'])
+        self.assertEqual(results['batch_miss_latency']['samples'], 5)
+        self.assertGreater(results['fallback']['calls'], 0)
+        self.assertEqual(results['publish_to_apply']['lost_messages'], 0)
+        self.assertEqual(realtime_config.redis_breaker.state, circuit_breaker.CLOSED)
+
+
+    @patch.object(RedisBackend, 'get')
+    def test_metrics_counters(self, mock_constance_backend_get):
+        """
+        Hits, misses, fallbacks and fetch latency are counted per thread
+        and summed in collect().
+        """
+        mock_constance_backend_get.return_value = 'Test Value'
+        before = metrics.collect()
+
+        realtime_config.get_config('SITE_NAME')
+        thread = threading.Thread(
+            target=lambda: [realtime_config.get_config('SITE_NAME') for _ in range(3)])
+        thread.start()
+        thread.join()
+        mock_constance_backend_get.side_effect = redis.exceptions.ConnectionError("Redis is down")
+        realtime_config.get_config('THEME_COLOR')
+
+        after = metrics.collect()
+        def delta(name):
+            return after['counters'][name] - before['counters'][name]
+        self.assertEqual(delta('cache_hits_total'), 3)
+        self.assertEqual(delta('cache_misses_total'), 2)
+        self.assertEqual(delta('fallbacks_total'), 1)
+        self.assertEqual(delta('breaker_trips_total'), 1)
+        self.assertEqual(sum(after['histograms']['fetch_duration_seconds']['buckets']) -
+                         sum(before['histograms']['fetch_duration_seconds']['buckets']), 2)
+        self.assertEqual(after['gauges']['breaker_open'], 1.0)
+
+
+    def test_metrics_endpoint_aggregates_processes(self):
+        """
+        /metrics/ sums counters of all worker files, gauges only of live workers.
+        Files of exited workers are folded into one. Scraper needs the token.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            worker = metrics.collect()
+            worker['pid'] = os.getppid()
+            worker['counters']['cache_hits_total'] = 1000
+            worker['gauges']['subscriber_connected'] = 1.0
+            exited = dict(worker, pid=2 ** 22 + 1)
+            for process in (worker, exited):
+                with open(os.path.join(tmp_dir, f"metrics_{process['pid']}.json"), 'w') as f:
+                    f.write(json.dumps(process))
+
+            own_hits = metrics.collect()['counters']['cache_hits_total']
+            with self.settings(REALTIME_CONFIG_METRICS_DIR=tmp_dir,
+                               REALTIME_CONFIG_METRICS_TOKEN='secret'):
+                self.assertEqual(self.client.get('/metrics/').status_code, 401)
+                self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+                                 .status_code, 401)
+                response = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+                self.assertFalse(os.path.exists(os.path.join(tmp_dir, f"metrics_{2 ** 22 + 1}.json")))
+                self.assertTrue(os.path.exists(os.path.join(tmp_dir, 'dead_processes.json')))
+                again = self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn(f"realtime_config_cache_hits_total {own_hits + 2000}\n", text)
+        self.assertIn(f'realtime_config_subscriber_connected{{pid="{os.getppid()}"}} 1.0', text)
+        self.assertNotIn(f'pid="{2 ** 22 + 1}"', text)
+        self.assertIn('realtime_config_fetch_duration_seconds_bucket{le="+Inf"}', text)
+        own_hits = metrics.collect()['counters']['cache_hits_total']
+        self.assertIn(f"realtime_config_cache_hits_total {own_hits + 2000}\n",
+                      again.content.decode())
+
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), "fakeredis is not installed")
+    @patch.object(propagation, '_report_requested', threading.Event())
+    def test_propagation_acks(self):
+        """
+        Applied update is acknowledged with its latency, status shows
+        processes behind the latest version.
+        """
+        import fakeredis
+        redis_client = fakeredis.FakeRedis()
+        channel_name = settings.REDIS_PUB_SUB_CHANNEL
+        redis_client.set(f"{channel_name}:version", 5)
+        redis_client.set(f"{channel_name}:process:other-host:1", json.dumps(
+            {'pid': 1, 'host': 'other-host', 'version': 3, 'reported_at': time.time()}))
+        redis_client.zadd(f"{channel_name}:processes", {'other-host:1': time.time() + 30,
+                                                         'gone-host:2': time.time() - 1})
+
+        realtime_config._handle_message(encode_update('SITE_NAME', 'New', version=5,
+                                                      published_at=time.time() - 0.2))
+        realtime_config._handle_message(encode_update('SITE_NAME', 'Old', version=4,
+                                                      published_at=time.time()))
+        propagation.report(redis_client, channel_name)
+
+        status = propagation.propagation_status(redis_client, channel_name)
+        self.assertEqual(status['latest_version'], 5)
+        self.assertFalse(status['converged'])
+        self.assertEqual(status['processes_behind'], 1)
+        self.assertEqual([(state['host'], state['behind']) for state in status['processes']],
+                         [('other-host', 2), (socket.gethostname(), 0)])
+        self.assertEqual(status['latency']['samples'], 1)
+        self.assertGreaterEqual(status['latency']['p50'], 0.2)
+        self.assertEqual(status['slo']['within'], 1.0)
+        self.assertEqual(redis_client.zscore(f"{channel_name}:processes", 'gone-host:2'), None)
+
+        self.assertEqual(self.client.get('/api/propagation/').status_code, 302)
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        with patch.object(views, 'get_redis_connection', return_value=redis_client):
+            response = self.client.get('/api/propagation/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['processes_behind'], 1)
+
+
+    @patch.object(change_log_writer, 'start_writer')
+    @patch('config_app.signals.get_redis_connection')
+    def test_change_log_written_after_publish(self, mock_get_redis_connection,
+                                              mock_start_writer):
+        """
+        Update is published before change log, which is written in batch later.
+        """
+        mock_redis = mock_get_redis_connection.return_value
+        mock_redis.incr.return_value = 1
+        mock_redis.publish.side_effect = \
+            lambda *args: self.assertFalse(change_log_writer._buffer)
+
+        for value in ('First', 'Second'):
+            config_updated_handler(sender=None, key='SITE_NAME',
+                                   old_value='Old', new_value=value)
+        self.assertEqual(mock_redis.publish.call_count, 2)
+        self.assertFalse(ConfigChangeLog.objects.exists())
+        queued_at = change_log_writer._buffer[0]['changed_at']
+
+        self.assertEqual(change_log_writer.flush(), 2)
+        logs = list(ConfigChangeLog.objects.order_by('id'))
+        self.assertEqual([log.new_value for log in logs], ['First', 'Second'])
+        self.assertEqual(logs[0].changed_at, queued_at)
+
+
+    @patch.object(change_log_writer, 'start_writer')
+    @patch('config_app.signals.get_redis_connection')
+    def test_legacy_dual_publish(self, mock_get_redis_connection, mock_start_writer):
+        """
+        With REDIS_PUB_SUB_LEGACY_PUBLISH, bare-key copy of a versioned update
+        doesn't evict the pushed value. Bare key of an old publisher still does.
+        """
+        mock_redis = mock_get_redis_connection.return_value
+        mock_redis.incr.return_value = 1
+
+        with self.settings(REDIS_PUB_SUB_LEGACY_PUBLISH=True):
+            config_updated_handler(sender=None, key='SITE_NAME',
+                                   old_value='Old', new_value='Pushed')
+            messages = [call.args[1] for call in mock_redis.publish.call_args_list]
+            self.assertEqual(len(messages), 2)
+            self.assertEqual(messages[1], 'SITE_NAME')
+            for message in messages:
+                realtime_config._handle_message(message)
+            self.assertEqual(realtime_config._local_cache['SITE_NAME'], 'Pushed')
+
+            realtime_config._handle_message('SITE_NAME')
+            self.assertNotIn('SITE_NAME', realtime_config._local_cache)
+
+
+    @patch.object(change_log_writer, 'start_writer')
+    def test_change_log_spilled_while_db_down(self, mock_start_writer):
+        """
+        Rows go to spill file while database fails and are written after.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             self.settings(REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR=tmp_dir):
+            change_log_writer.enqueue('SITE_NAME', None, 'Spilled')
+            with patch.object(ConfigChangeLog.objects, 'bulk_create',
+                              side_effect=OperationalError("DB is down")):
+                self.assertEqual(change_log_writer.flush(), 0)
+            self.assertEqual(len(os.listdir(tmp_dir)), 1)
+            self.assertFalse(change_log_writer._buffer)
+
+            change_log_writer.enqueue('THEME_COLOR', None, '#000000')
+            self.assertEqual(change_log_writer.flush(), 2)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+        self.assertEqual(sorted(ConfigChangeLog.objects.values_list('new_value', flat=True)),
+                         ['#000000', 'Spilled'])
+
+
+    @patch.object(change_log_writer, 'start_writer')
+    def test_change_log_replay_fails_midway(self, mock_start_writer):
+        """
+        Replay failing after some batches keeps only rows not written yet,
+        they aren't inserted twice by the next replay.
+        """
+        bulk_create = ConfigChangeLog.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(objs, **kwargs):
+            calls.append(len(objs))
+            if len(calls) == 2:
+                raise OperationalError("DB went down")
+            return bulk_create(objs, **kwargs)
+
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             self.settings(REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR=tmp_dir,
+                           REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE=2):
+            for value in ('First', 'Second', 'Third', 'Fourth', 'Fifth'):
+                change_log_writer.enqueue('SITE_NAME', None, value)
+            with patch.object(ConfigChangeLog.objects, 'bulk_create',
+                              side_effect=OperationalError("DB is down")):
+                change_log_writer.flush()
+
+            with patch.object(ConfigChangeLog.objects, 'bulk_create',
+                              side_effect=fail_second_batch):
+                self.assertEqual(change_log_writer._replay_spilled(tmp_dir), 2)
+            self.assertEqual(calls, [2, 2])
+            self.assertEqual(ConfigChangeLog.objects.count(), 2)
+
+            self.assertEqual(change_log_writer._replay_spilled(tmp_dir), 3)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+        self.assertEqual(sorted(ConfigChangeLog.objects.values_list('new_value', flat=True)),
+                         ['Fifth', 'First', 'Fourth', 'Second', 'Third'])
+
+
+    @patch.object(change_log_writer, 'start_writer')
+    def test_change_log_bad_row_dropped(self, mock_start_writer):
+        """
+        Row rejected by the database is dropped, the rest of the batch
+        and of a replayed spill file is written.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+             self.settings(REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR=tmp_dir):
+            change_log_writer.enqueue('SITE_NAME', None, 'Spilled')
+            with patch.object(ConfigChangeLog.objects, 'bulk_create',
+                              side_effect=OperationalError("DB is down")):
+                change_log_writer.flush()
+            with open(os.path.join(tmp_dir, os.listdir(tmp_dir)[0]), 'a') as spill_file:
+                spill_file.write(json.dumps({'key': 'THEME_COLOR', 'old_value': None,
+                                             'new_value': None,
+                                             'changed_at': timezone.now().isoformat()}) + '\n')
+
+            change_log_writer.enqueue('SITE_NAME', 'Spilled', 'Written')
+            change_log_writer._buffer.append(dict(change_log_writer._buffer[0], new_value=None))
+            with self.assertLogs('config_app.change_log_writer', 'ERROR'):
+                self.assertEqual(change_log_writer.flush(), 2)
+            self.assertEqual(os.listdir(tmp_dir), [])
+            self.assertFalse(change_log_writer._buffer)
+
+        self.assertEqual(sorted(ConfigChangeLog.objects.values_list('new_value', flat=True)),
+                         ['Spilled', 'Written'])
+
+
+    def test_change_logs_keyset_pagination(self):
+        """
+        Logs API pages through logs with cursor, newest first, without
+        skipping rows with equal changed_at. Filters by key and time.
+        """
+        same_time = timezone.now()
+        ConfigChangeLog.objects.bulk_create(
+            [ConfigChangeLog(key='SITE_NAME', new_value=str(i), changed_at=same_time)
+             for i in range(3)] +
+            [ConfigChangeLog(key='THEME_COLOR', new_value='old',
+                             changed_at=same_time - datetime.timedelta(hours=1))])
+
+        pages = []
+        cursor = None
+        while True:
+            params = {'limit': 2, **({'cursor': cursor} if cursor else {})}
+            data = self.client.get('/api/logs/', params).json()
+            pages.append([log['new_value'] for log in data['logs']])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(pages, [['2', '1'], ['0', 'old']])
+
+        data = self.client.get('/api/logs/', {'key': 'THEME_COLOR'}).json()
+        self.assertEqual([log['new_value'] for log in data['logs']], ['old'])
+        data = self.client.get('/api/logs/', {'since': same_time.isoformat()}).json()
+        self.assertEqual(len(data['logs']), 3)
+
+        self.assertEqual(self.client.get('/api/logs/', {'cursor': 'broken'}).status_code, 400)
+
+
+    async def test_config_stream_resumes_from_cursor(self):
+        """
+        Stream sends snapshot, then applied updates with change log entries.
+        Resuming from cursor gets missed updates only, or snapshot if they
+        are no longer in backlog.
+        """
+        realtime_config._cache_update(realtime_config._default_values)
+        stream = views._config_stream(None)
+        self.assertTrue((await anext(stream)).startswith('retry: '))
+        snapshot = await anext(stream)
+        self.assertIn('event: snapshot', snapshot)
+
+        realtime_config._handle_message(encode_update(
+            'SITE_NAME', 'Streamed', version=7, published_at=time.time(), old_value='Old'))
+        update = await asyncio.wait_for(anext(stream), 1.0)
+        config_event, log_event = update.strip().split('\n\n')
+        self.assertTrue(config_event.startswith('id: 7\nevent: config\n'))
+        self.assertEqual(json.loads(config_event.split('data: ')[1]),
+                         {'key': 'SITE_NAME', 'value': 'Streamed', 'version': 7})
+        self.assertEqual(json.loads(log_event.split('data: ')[1])['old_value'], 'Old')
+        await stream.aclose()
+        self.assertEqual(live_updates.clients_count(), 0)
+
+        realtime_config._handle_message(encode_update('THEME_COLOR', '#000000', version=8))
+        response = await self.async_client.get('/api/configs/updates/',
+                                               {'cursor': '7', 'timeout': 0})
+        data = response.json()
+        self.assertEqual(data['cursor'], '8')
+        self.assertEqual([update['key'] for update in data['updates']], ['THEME_COLOR'])
+
+        with self.settings(REALTIME_CONFIG_STREAM_BACKLOG=1):
+            realtime_config._handle_message(encode_update('ITEMS_PER_PAGE', 20, version=9))
+        response = await self.async_client.get('/api/configs/updates/', {'cursor': '7'})
+        data = response.json()
+        self.assertEqual(data['cursor'], '9')
+        self.assertEqual(data['configs']['ITEMS_PER_PAGE'], 20)
+
+
+    async def test_configs_api_etag(self):
+        """
+        Unchanged configs -> same ETag, 304 without rebuilding the payload.
+        Applied update -> new payload and ETag.
+        """
+        realtime_config._cache_update(realtime_config._default_values)
+        response = await self.async_client.get('/api/configs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['SITE_NAME'],
+                         realtime_config._default_values['SITE_NAME'])
+        etag = response['ETag']
+
+        with patch.object(views, '_build_configs_payload') as mock_build:
+            response = await self.async_client.get('/api/configs/', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], etag)
+            mock_build.assert_not_called()
+
+        realtime_config._handle_message(encode_update('SITE_NAME', 'Changed', version=1))
+        response = await self.async_client.get('/api/configs/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['SITE_NAME'], 'Changed')
+
+        # ASGI view serves the same payload
+        request = AsyncRequestFactory().get('/api/configs/')
+        response = await views.aget_all_configs_api(request)
+        self.assertEqual(json.loads(response.content)['SITE_NAME'], 'Changed')
+        self.assertEqual(response['ETag'], views._configs_payload.etag)
+
+
+    def test_production_logging(self):
+        """
+        Queue handler drops records when full instead of blocking, listener
+        writes the rest. Sampler lets 1 of N through. Summary logs counters.
+        """
+        stream = io.StringIO()
+        handler = log_utils.QueueLogHandler(stream=stream, queue_size=1)
+        handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+        queue_logger = logging.getLogger('config_app.tests.queue')
+        queue_logger.addHandler(handler)
+        queue_logger.propagate = False
+        try:
+            handler.listener.stop()
+            queue_logger.warning("first")
+            queue_logger.warning("second")
+            self.assertEqual(handler.dropped, 1)
+            handler._start_listener()
+            handler.flush()
+            self.assertEqual(stream.getvalue(), "WARNING first\n")
+        finally:
+            queue_logger.removeHandler(handler)
+            handler.close()
+
+        with self.settings(REALTIME_CONFIG_LOG_SAMPLE_EVERY=3):
+            sampler = log_utils.LogSampler()
+            self.assertEqual([sampler() for _ in range(4)], [True, False, False, True])
+
+        realtime_config._cache_update({'SITE_NAME': 'Cached'})
+        previous = metrics.collect()['counters']
+        realtime_config.get_config('SITE_NAME')
+        realtime_config.get_config('SITE_NAME')
+        with self.assertLogs('config_app.log_utils', 'INFO') as logs:
+            log_utils.log_summary(previous, 60.0)
+        self.assertIn("cache_hits=2, cache_misses=0", logs.output[0])
+
+
+    @skipUnless(redis_server_available(), "Redis server is not available")
+    def test_redis_pools_fork_safe(self):
+        """
+        Constance shares commands pool, subscribers have their own.
+        Forked child drops inherited connections, parent's keep working.
+        """
+        commands = redis_client.get_redis_connection()
+        pubsub = redis_client.get_pubsub_connection()
+        self.assertIs(RedisBackend()._rd.connection_pool, commands.connection_pool)
+        self.assertIsNot(pubsub.connection_pool, commands.connection_pool)
+        self.assertEqual(pubsub.connection_pool.max_connections,
+                         settings.REALTIME_CONFIG_REDIS_PUBSUB_POOL_SIZE)
+        self.assertIsNone(pubsub.connection_pool.connection_kwargs.get('socket_timeout'))
+
+        self.assertTrue(commands.ping())
+        inherited = list(commands.connection_pool._connections)
+        pid = os.fork()
+        if pid == 0:
+            try:
+                pool = commands.connection_pool
+                ok = not any(connection in pool._connections for connection in inherited) \
+                    and commands.ping() and pool.pid == os.getpid()
+            except BaseException:
+                ok = False
+            os._exit(0 if ok else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertTrue(commands.ping())
+        self.assertTrue(all(connection in commands.connection_pool._connections
+                            for connection in inherited))
+
+
+    @override_settings(REDIS_RETRY_INTERVAL=60.0)
+    def test_circuit_breaker_fork_safe(self):
+        """
+        Breaker open in parent starts closed in forked child, whose probe
+        thread would never run. Parent's stays open.
+        """
+        breaker = circuit_breaker.CircuitBreaker('fork', probe=MagicMock(side_effect=OSError))
+        breaker.record_failure()
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                ok = breaker.allow_request() and breaker.stats()['failures'] == 0
+                breaker.record_failure()
+                ok = ok and breaker.state == circuit_breaker.OPEN
+            except BaseException:
+                ok = False
+            os._exit(0 if ok else 1)
+
+        _, status = os.waitpid(pid, 0)
+        self.assertEqual(os.waitstatus_to_exitcode(status), 0)
+        self.assertEqual(breaker.state, circuit_breaker.OPEN)
+        breaker.reset()
+
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), "fakeredis is not installed")
+    @patch.object(change_log_writer, 'start_writer')
+    @patch.object(RedisBackend, 'get')
+    def test_scoped_overrides(self, mock_constance_backend_get, mock_start_writer):
+        """
+        Scoped lookup resolves tenant, then environment, then global. Index is
+        loaded once, then updated by override messages only.
+        """
+        import fakeredis
+        redis_client = fakeredis.FakeRedis()
+        mock_constance_backend_get.return_value = 5
+        scope = overrides.config_scope(tenant='acme', environment='eu')
+
+        with patch.object(overrides, 'get_redis_connection', return_value=redis_client):
+            overrides.set_override('ITEMS_PER_PAGE', 20, environment='eu')
+            overrides.set_override('ITEMS_PER_PAGE', 50, tenant='acme')
+            with self.assertRaises(TypeError):
+                overrides.set_override('ITEMS_PER_PAGE', 'many', tenant='acme')
+            with self.assertRaises(TypeError):
+                overrides.set_override('ITEMS_PER_PAGE', True, tenant='acme')
+            with self.assertRaises(TypeError):
+                overrides.set_override('UI_POLLING_INTERVAL', True, tenant='acme')
+            overrides.set_override('UI_POLLING_INTERVAL', 60, tenant='acme')
+            overrides.set_override('ITEMS_PER_PAGE', 50, tenant='acme')
+            with self.assertRaises(ValueError):
+                overrides.set_override('ITEMS_PER_PAGE', 1, tenant='acme', environment='eu')
+            with self.assertRaises(ValueError):
+                overrides.set_override('ITEMS_PER_PAGE', 1, tenant='x' * 100)
+            self.assertFalse(redis_client.hexists(overrides.overrides_key('ITEMS_PER_PAGE'),
+                                                  f"tenant:{'x' * 100}"))
+
+            self.assertEqual(realtime_config.get_config('ITEMS_PER_PAGE', scope=scope), 50)
+            polling_interval = realtime_config.get_config('UI_POLLING_INTERVAL', scope=scope)
+            self.assertEqual((polling_interval, type(polling_interval)), (60.0, float))
+            self.assertEqual(realtime_config.get_config(
+                'ITEMS_PER_PAGE', scope=overrides.config_scope(tenant='other', environment='eu')), 20)
+            self.assertEqual(realtime_config.get_config(
+                'ITEMS_PER_PAGE', scope=overrides.config_scope(tenant='other')), 5)
+            self.assertEqual(change_log_writer._buffer[-1]['key'], 'ITEMS_PER_PAGE@tenant:acme')
+
+            # Incremental updates, no reload from Redis
+            redis_client.flushall()
+            realtime_config._handle_message(encode_override('ITEMS_PER_PAGE', 'tenant:acme',
+                                                            None, version=10, deleted=True))
+            self.assertEqual(realtime_config.get_config('ITEMS_PER_PAGE', scope=scope), 20)
+            realtime_config._handle_message(encode_override('ITEMS_PER_PAGE', 'tenant:acme',
+                                                            30, version=9))
+            self.assertEqual(realtime_config.get_config('ITEMS_PER_PAGE', scope=scope), 20)
+            realtime_config._handle_message(encode_override('MAINTENANCE_MODE', 'tenant:acme',
+                                                            True, version=11))
+            self.assertIs(realtime_config.get_config('MAINTENANCE_MODE', scope=scope), True)
+            self.assertNotIn('MAINTENANCE_MODE', realtime_config._local_cache)
+
+            # Open breaker: no load attempt, stale index still resolves
+            overrides._mark_stale()
+            with patch.object(realtime_config.redis_breaker, 'allow_request', return_value=False), \
+                 patch.object(overrides, 'load') as mock_load:
+                self.assertEqual(realtime_config.get_config('ITEMS_PER_PAGE', scope=scope), 20)
+            mock_load.assert_not_called()
+
+            # Lookups waiting for a load in progress don't load again
+            with patch.object(redis_client, 'pipeline', wraps=redis_client.pipeline) as mock_pipeline:
+                with overrides._lock:
+                    threads = [threading.Thread(target=realtime_config.get_config,
+                                                args=('ITEMS_PER_PAGE',), kwargs={'scope': scope})
+                               for _ in range(4)]
+                    for thread in threads:
+                        thread.start()
+                    time.sleep(0.05)
+                    overrides._loaded = True
+                for thread in threads:
+                    thread.join()
+            mock_pipeline.assert_not_called()
+
+
+    @patch.object(RedisBackend, 'get')
+    def test_rollout_flags(self, mock_constance_backend_get):
+        """
+        Buckets are deterministic, deny beats allow beats percentage,
+        batch evaluation matches per-user one.
+        """
+        mock_constance_backend_get.return_value = feature_flags.flag_definition(
+            percentage=30, allow=[1], deny=[2], salt='checkout')
+        user_ids = list(range(5000))
+
+        results = feature_flags.evaluate_many('NEW_CHECKOUT_ROLLOUT', user_ids)
+        self.assertEqual(results, [feature_flags.is_enabled('NEW_CHECKOUT_ROLLOUT', user_id)
+                                   for user_id in user_ids])
+        self.assertTrue(results[1])
+        self.assertFalse(results[2])
+        self.assertAlmostEqual(sum(results) / len(user_ids), 0.3, delta=0.03)
+        mock_constance_backend_get.assert_called_once_with('NEW_CHECKOUT_ROLLOUT')
+
+        # Growing percentage keeps users already in
+        realtime_config._cache_set('NEW_CHECKOUT_ROLLOUT', feature_flags.flag_definition(
+            percentage=60, allow=[1], deny=[2], salt='checkout'))
+        enabled = set(feature_flags.enabled_users('NEW_CHECKOUT_ROLLOUT', user_ids))
+        self.assertLessEqual({user_id for user_id, on in zip(user_ids, results) if on}, enabled)
+
+        realtime_config._cache_set('NEW_CHECKOUT_ROLLOUT', '{"percentage": 101}')
+        self.assertEqual(feature_flags.enabled_users('NEW_CHECKOUT_ROLLOUT', user_ids), [])
+        with self.assertRaises(ValidationError):
+            feature_flags.RolloutFlagField().clean('{"allow": 1}')
+
+
+    @patch.object(RedisBackend, 'get')
+    def test_derived_configs(self, mock_constance_backend_get):
+        """
+        Derived value is computed once, recomputed lazily only after its
+        source changes, and matches the pinned snapshot.
+        """
+        mock_constance_backend_get.return_value = '#102030'
+        calls = []
+
+        def theme_rgb(theme_color):
+            calls.append(theme_color)
+            return views._theme_rgb(theme_color)
+
+        with patch.dict(realtime_config._derived_defs), \
+             patch.dict(realtime_config._derived_dependents, {'THEME_COLOR': []}):
+            realtime_config.register_derived('test_theme_rgb', ('THEME_COLOR',), theme_rgb)
+            self.assertEqual(realtime_config.get_derived('test_theme_rgb'), (16, 32, 48))
+            self.assertEqual(realtime_config.get_derived('test_theme_rgb'), (16, 32, 48))
+            self.assertEqual(len(calls), 1)
+
+            realtime_config._handle_message(encode_update('SITE_NAME', 'Other', version=1))
+            realtime_config._handle_message(encode_update('THEME_COLOR', '#102030', version=2))
+            self.assertIn('test_theme_rgb', realtime_config._derived_values)
+
+            with realtime_config.config_snapshot():
+                realtime_config._handle_message(encode_update('THEME_COLOR', '#ffffff', version=3))
+                self.assertNotIn('test_theme_rgb', realtime_config._derived_values)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(realtime_config.get_derived('test_theme_rgb'), (16, 32, 48))
+            self.assertEqual(realtime_config.get_derived('test_theme_rgb'), (255, 255, 255))
+            self.assertEqual(calls, ['#102030', '#102030', '#ffffff'])
+
+            realtime_config._handle_message(encode_update('THEME_COLOR', 'red;}', version=4))
+            self.assertIsNone(realtime_config.get_derived('test_theme_rgb'))
+            realtime_config._derived_values.pop('test_theme_rgb', None)
+
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), "fakeredis is not installed")
+    @patch.object(change_log_writer, 'start_writer')
+    def test_changeset_applied_atomically(self, mock_start_writer):
+        """
+        Changeset writes changed keys in one transaction, publishes one message
+        with one version and subscribers apply it with one cache swap.
+        """
+        import fakeredis
+        from django.contrib import admin
+        from constance.admin import Config
+        from .admin import ChangesetConstanceAdmin
+        self.assertIsInstance(admin.site._registry[Config], ChangesetConstanceAdmin)
+
+        redis_client = fakeredis.FakeRedis()
+        redis_client.set(f"{constance_settings.REDIS_PREFIX}ITEMS_PER_PAGE", dumps(5))
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(settings.REDIS_PUB_SUB_CHANNEL)
+        signalled = []
+
+        def receiver(sender, key, old_value, new_value, **kwargs):
+            signalled.append((key, old_value, new_value, kwargs.get('changeset')))
+
+        config_updated.connect(receiver)
+        # Handler skips changeset keys, they are published and logged once
+        config_updated.connect(config_updated_handler, dispatch_uid='test_changeset_handler')
+        try:
+            with patch.object(changesets, 'get_redis_connection', return_value=redis_client):
+                with self.assertRaises(ValueError):
+                    changesets.apply_changeset({'NOT_A_CONFIG': 1})
+                old_values = changesets.apply_changeset(
+                    {'SITE_NAME': 'Shop', 'THEME_COLOR': '#000000', 'ITEMS_PER_PAGE': 5})
+        finally:
+            config_updated.disconnect(receiver)
+            config_updated.disconnect(dispatch_uid='test_changeset_handler')
+        self.assertEqual(old_values, {'SITE_NAME': 'Config Manager', 'THEME_COLOR': '#4a6cf7'})
+        self.assertEqual(signalled, [('SITE_NAME', 'Config Manager', 'Shop', True),
+                                     ('THEME_COLOR', '#4a6cf7', '#000000', True)])
+        self.assertEqual(redis_client.get(f"{constance_settings.REDIS_PREFIX}SITE_NAME"),
+                         dumps('Shop').encode())
+        self.assertEqual([row['key'] for row in change_log_writer._buffer],
+                         ['SITE_NAME', 'THEME_COLOR'])
+        self.assertEqual(len({row['changed_at'] for row in change_log_writer._buffer}), 1)
+
+        messages = []
+        deadline = time.time() + 1.0
+        while time.time() < deadline:
+            message = pubsub.get_message(timeout=0.1)
+            if message is not None:
+                messages.append(message)
+            elif messages:
+                break
+        self.assertEqual(len(messages), 1)
+        realtime_config._handle_message(encode_update('THEME_COLOR', '#ffffff', version=2))
+        with patch.object(realtime_config, '_store_locked',
+                          wraps=realtime_config._store_locked) as mock_store_locked:
+            realtime_config._handle_message(messages[0]['data'])
+        mock_store_locked.assert_called_once_with({'SITE_NAME': 'Shop'})
+        self.assertEqual(realtime_config._local_cache['THEME_COLOR'], '#ffffff')
+        self.assertEqual(realtime_config._key_versions['SITE_NAME'], 1)
+        self.assertEqual([(event.key, event.version) for event in live_updates._events],
+                         [('THEME_COLOR', 2), ('SITE_NAME', 1)])
+
+
+    @skipUnless(importlib.util.find_spec('fakeredis'), "fakeredis is not installed")
+    @patch.object(change_log_writer, 'start_writer')
+    def test_changeset_concurrent_write_and_datetimes(self, mock_start_writer):
+        """
+        Key written by someone else between reading old values and the
+        transaction -> transaction retried with new old values. Naive
+        datetimes are made aware as in constance admin.
+        """
+        import fakeredis
+        redis_client = fakeredis.FakeRedis()
+        key = f"{constance_settings.REDIS_PREFIX}ITEMS_PER_PAGE"
+        redis_client.set(key, dumps(5))
+        pipeline_mget = redis.client.Pipeline.mget
+        mget_calls = []
+
+        def mget_then_write(pipe, *args, **kwargs):
+            values = pipeline_mget(pipe, *args, **kwargs)
+            if not mget_calls:
+                redis_client.set(key, dumps(6))
+            mget_calls.append(values)
+            return values
+
+        launch_at = datetime.datetime(2026, 1, 1, 12, 0)
+        constance_config = dict(settings.CONSTANCE_CONFIG,
+                                LAUNCH_AT=(launch_at, "Launch time", datetime.datetime))
+        with patch.object(changesets, 'get_redis_connection', return_value=redis_client), \
+             self.settings(CONSTANCE_CONFIG=constance_config):
+            with patch.object(redis.client.Pipeline, 'mget', mget_then_write):
+                old_values = changesets.apply_changeset({'ITEMS_PER_PAGE': 7})
+            self.assertEqual(len(mget_calls), 2)
+            self.assertEqual(old_values, {'ITEMS_PER_PAGE': 6})
+            self.assertEqual(redis_client.get(key), dumps(7).encode())
+
+            # Same as default once made aware
+            self.assertEqual(changesets.apply_changeset({'LAUNCH_AT': launch_at}), {})
+            changesets.apply_changeset({'LAUNCH_AT': launch_at + datetime.timedelta(days=1)})
+            self.assertEqual(redis_client.get(f"{constance_settings.REDIS_PREFIX}LAUNCH_AT"),
+                             dumps(timezone.make_aware(launch_at + datetime.timedelta(days=1)))
+                             .encode())
+
+
+    async def test_long_poll_snapshot_after_change(self):
+        """
+        Snapshot sent when a long poll wakes up has current values, not those
+        of the request's pinned config snapshot.
+        """
+        realtime_config._cache_update(dict(realtime_config._default_values, SITE_NAME='Old'))
+        cursor = live_updates.current_cursor()
+        poll = asyncio.ensure_future(self.async_client.get(
+            '/api/configs/updates/', {'cursor': cursor, 'timeout': 5}))
+        for _ in range(100):
+            if live_updates.clients_count():
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(live_updates.clients_count(), 1)
+
+        realtime_config._cache_set('SITE_NAME', 'New')
+        live_updates.reset()
+        data = (await asyncio.wait_for(poll, 2.0)).json()
+        self.assertEqual(data['configs']['SITE_NAME'], 'New')
+        self.assertEqual(data['cursor'], live_updates.current_cursor())
@@ -0,0 +1,150 @@
+"""
+Pub/Sub message format for config updates.
+
+Versioned message: JSON object with config key, new value serialized with
+constance codecs, monotonic version (Redis INCR counter), publish time
+(Unix timestamp, for propagation latency) and optionally old value
+(for change log entries pushed to streaming clients).
+Override message: like versioned message, with config key under 'override'
+instead of 'key' and the scope it applies to (see overrides module), so
+subscribers without override support drop it as invalid. Deleted override
+has no value.
+Changeset message: several keys changed at once, under 'changes' (key -> serialized
+value) with one version, applied by subscribers in one cache swap. Subscribers
+without changeset support drop it as invalid.
+Legacy message: bare config key, subscribers invalidate local cache.
+"""
+
+import json
+import logging
+from constance.codecs import dumps, loads
+
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Union
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConfigUpdate(NamedTuple):
+    key: str
+    # Meaningful only for versioned messages
+    value: Any
+    # None for legacy bare-key messages
+    version: Optional[int]
+    # Unix time of publish, None if publisher didn't send it
+    published_at: Optional[float] = None
+    # Value before the update, None if publisher didn't send it
+    old_value: Any = None
+    # Scope of override message, None for global config updates
+    scope: Optional[str] = None
+    # Override message removing the scope's value
+    deleted: bool = False
+
+
+class ConfigChangeset(NamedTuple):
+    # New value per config key, all published with one version
+    values: Dict[str, Any]
+    version: int
+    # Unix time of publish, None if publisher didn't send it
+    published_at: Optional[float] = None
+    # Value before the change per key, for keys publisher sent it for
+    old_values: Optional[Dict[str, Any]] = None
+
+
+def version_counter_key(channel_name: str) -> str:
+    """
+    Redis key of monotonic version counter for the channel.
+    """
+    return f"{channel_name}:version"
+
+
+def encode_update(key: str, value: Any, version: int,
+                  published_at: Optional[float] = None, old_value: Any = None) -> str:
+    """
+    Build versioned message. Raise TypeError if value can't be serialized.
+    """
+    payload: Dict[str, Any] = {'key': key, 'value': dumps(value), 'version': version}
+    if published_at is not None:
+        payload['published_at'] = published_at
+    if old_value is not None:
+        payload['old_value'] = dumps(old_value)
+    return json.dumps(payload)
+
+
+def encode_override(key: str, scope: str, value: Any, version: int,
+                    published_at: Optional[float] = None, deleted: bool = False) -> str:
+    """
+    Build override message. Raise TypeError if value can't be serialized.
+    """
+    payload: Dict[str, Any] = {'override': key, 'scope': scope, 'version': version}
+    if deleted:
+        payload['deleted'] = True
+    else:
+        payload['value'] = dumps(value)
+    if published_at is not None:
+        payload['published_at'] = published_at
+    return json.dumps(payload)
+
+
+def encode_changeset(values: Mapping[str, Any], version: int,
+                     published_at: Optional[float] = None,
+                     old_values: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    Build changeset message. Raise TypeError if a value can't be serialized.
+    """
+    payload: Dict[str, Any] = {'changes': {key: dumps(value) for key, value in values.items()},
+                               'version': version}
+    if published_at is not None:
+        payload['published_at'] = published_at
+    if old_values:
+        payload['old_values'] = {key: dumps(value) for key, value in old_values.items()
+                                 if value is not None}
+    return json.dumps(payload)
+
+
+def decode_update(data: Union[bytes, str, None]) -> Union[ConfigUpdate, ConfigChangeset, None]:
+    """
+    Parse versioned, override, changeset or legacy bare-key message.
+    Return None if invalid.
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    elif data is not None:
+        data = str(data)
+
+    if not data:
+        return None
+
+    if not data.startswith('{'):
+        return ConfigUpdate(key=data, value=None, version=None)
+
+    try:
+        payload: Any = json.loads(data)
+        published_at: Any = payload.get('published_at')
+        old_value: Any = payload.get('old_value')
+        if 'changes' in payload:
+            return ConfigChangeset(values={str(key): loads(value)
+                                           for key, value in payload['changes'].items()},
+                                   version=int(payload['version']),
+                                   published_at=float(published_at)
+                                                if published_at is not None else None,
+                                   old_values={str(key): loads(value) for key, value
+                                               in payload.get('old_values', {}).items()})
+        if 'override' in payload:
+            deleted: bool = bool(payload.get('deleted', False))
+            return ConfigUpdate(key=str(payload['override']),
+                                value=None if deleted else loads(payload['value']),
+                                version=int(payload['version']),
+                                published_at=float(published_at)
+                                             if published_at is not None else None,
+                                scope=str(payload['scope']),
+                                deleted=deleted)
+        return ConfigUpdate(key=str(payload['key']),
+                            value=loads(payload['value']),
+                            version=int(payload['version']),
+                            published_at=float(published_at)
+                                         if published_at is not None else None,
+                            old_value=loads(old_value) if old_value is not None else None)
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        logger.warning(f"Failed to decode config update message {data!r}. Error: {e}")
+        return None
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -9,6 +10,11 @@ app_name: str = 'config_app'
 
 urlpatterns: List[URLPattern] = [
     path('', views.home, name='home'),
-    path('api/configs/', views.get_all_configs_api, name='get_all_configs_api'),
+    path('api/configs/', views.aget_all_configs_api if settings.REALTIME_CONFIG_ASGI
+                         else views.get_all_configs_api, name='get_all_configs_api'),
+    path('api/configs/stream/', views.config_stream_api, name='config_stream_api'),
+    path('api/configs/updates/', views.config_updates_api, name='config_updates_api'),
     path('api/logs/', views.get_change_logs_api, name='get_change_logs_api'),
+    path('api/propagation/', views.propagation_status_api, name='propagation_status_api'),
+    path('metrics/', views.metrics_api, name='metrics_api'),
 ]
@@ -1,13 +1,64 @@
 from django.shortcuts import render
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import parse_etags
+import asyncio
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import string
 
-from . import realtime_config
-from django.http import HttpRequest, HttpResponse, JsonResponse
-from typing import Any, Dict, List, Union
+from . import live_updates, metrics, realtime_config
+from .live_updates import StreamEvent
+from .propagation import propagation_status
+from .redis_client import get_redis_connection
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified, JsonResponse, \
+    StreamingHttpResponse
+from django.http.response import HttpResponseBase
+from typing import Any, AsyncIterator, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+import redis
 
 from .models import ConfigChangeLog
 
 
+class ConfigsPayload(NamedTuple):
+    # Config snapshot the payload was built from
+    source: Mapping[str, Any]
+    body: bytes
+    etag: str
+
+
+# /api/configs/ response of current local cache, rebuilt after it changes
+_configs_payload: Optional[ConfigsPayload] = None
+
+
+def _theme_rgb(theme_color: str) -> Tuple[int, int, int]:
+    """
+    '#4a6cf7' -> (74, 108, 247). Raise ValueError if it's not a 6-digit hex color.
+    """
+    if not isinstance(theme_color, str) or len(theme_color) != 7 or theme_color[0] != '#' \
+            or not all(char in string.hexdigits for char in theme_color[1:]):
+        raise ValueError(f"Invalid hex color {theme_color!r}")
+    return (int(theme_color[1:3], 16), int(theme_color[3:5], 16), int(theme_color[5:7], 16))
+
+
+def _logs_page_size(logs_count: Any) -> int:
+    logs_count = int(logs_count)
+    return logs_count if logs_count > 0 else 10
+
+
+# Parsed once per config change instead of per request
+realtime_config.register_derived('theme_rgb', ('THEME_COLOR',), _theme_rgb)
+realtime_config.register_derived('logs_page_size', ('LOGS_COUNT',), _logs_page_size)
+
+
 def home(request: HttpRequest) -> HttpResponse:
     """
     Demo page to view current constance configs.
@@ -15,12 +66,13 @@ def home(request: HttpRequest) -> HttpResponse:
 
     config_keys: list[str] = list(settings.CONSTANCE_CONFIG.keys())
 
-    configs: Dict[str, Any] = {key: realtime_config.get_config(key) \
-                               for key in config_keys}
+    configs: Dict[str, Any] = realtime_config.get_configs(config_keys)
 
     context: Dict[str, Any] = {
         'site_name': configs.get('SITE_NAME') or "",
-        'theme_color': configs.get('THEME_COLOR') or "#ffffff",
+        # Goes into CSS, only if it's a valid color
+        'theme_color': configs.get('THEME_COLOR')
+                       if realtime_config.get_derived('theme_rgb') is not None else "#ffffff",
         'welcome_message': configs.get('WELCOME_MESSAGE') or "",
         'maintenance_mode': configs.get('MAINTENANCE_MODE') or False,
         'items_per_page': configs.get('ITEMS_PER_PAGE') or 10,
@@ -32,32 +84,346 @@ def home(request: HttpRequest) -> HttpResponse:
     return render(request, 'config_app/home.html', context)
 
 
-def get_all_configs_api(request: HttpRequest) -> JsonResponse:
+def _build_configs_payload(source: Mapping[str, Any], configs: Dict[str, Any]) -> ConfigsPayload:
+    body: bytes = json.dumps(configs, cls=DjangoJSONEncoder).encode('utf-8')
+    return ConfigsPayload(source=source, body=body,
+                          etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+
+def _cached_configs_payload(source: Mapping[str, Any]) -> Optional[ConfigsPayload]:
+    """
+    Payload of cache snapshot source, reused until it changes.
+    None if some configs aren't cached and have to be fetched.
+    """
+    global _configs_payload
+    payload: Optional[ConfigsPayload] = _configs_payload
+    if payload is not None and payload.source is source:
+        return payload
+    keys: List[str] = list(settings.CONSTANCE_CONFIG.keys())
+    if not all(key in source for key in keys):
+        return None
+    payload = _build_configs_payload(source, {key: source[key] for key in keys})
+    _configs_payload = payload
+    return payload
+
+
+def _configs_response(request: HttpRequest, payload: ConfigsPayload) -> HttpResponse:
+    etags: List[str] = parse_etags(request.headers.get('If-None-Match', ''))
+    if payload.etag in etags or '*' in etags:
+        response: HttpResponse = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload.body, content_type='application/json')
+    response['ETag'] = payload.etag
+    # Clients revalidate on every poll, unchanged configs cost a 304
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def get_all_configs_api(request: HttpRequest) -> HttpResponse:
     """
     API endpoint that returns current config values as JSON.
+    Sync, for WSGI (see aget_all_configs_api() for ASGI).
+
+    Serialized response and its strong ETag (content hash, same in every
+    process) are reused until local cache changes. If-None-Match with
+    current ETag gets 304.
     """
-    keys: list[str] = list(settings.CONSTANCE_CONFIG.keys())
-    configs: Dict[str, Any] = {key: realtime_config.get_config(key) for key in keys}
-    return JsonResponse(configs)
+    source: Mapping[str, Any] = realtime_config.current_snapshot()
+    payload: Optional[ConfigsPayload] = _cached_configs_payload(source)
+    if payload is None:
+        # Misses are fetched into local cache, payload is kept from next request
+        keys: List[str] = list(settings.CONSTANCE_CONFIG.keys())
+        payload = _build_configs_payload(source, realtime_config.get_configs(keys))
+    return _configs_response(request, payload)
+
+
+async def aget_all_configs_api(request: HttpRequest) -> HttpResponse:
+    """
+    get_all_configs_api() for ASGI, so cache misses don't block event loop.
+    """
+    source: Mapping[str, Any] = realtime_config.current_snapshot()
+    payload: Optional[ConfigsPayload] = _cached_configs_payload(source)
+    if payload is None:
+        keys: List[str] = list(settings.CONSTANCE_CONFIG.keys())
+        payload = _build_configs_payload(source, await realtime_config.aget_configs(keys))
+    return _configs_response(request, payload)
+
+
+def _encode_cursor(changed_at: datetime.datetime, log_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{changed_at.isoformat()}|{log_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    """
+    Raise ValueError if cursor is invalid.
+    """
+    try:
+        changed_at, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.datetime.fromisoformat(changed_at), int(log_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor}") from None
+
+
+def _parse_time(value: str) -> datetime.datetime:
+    """
+    Parse ISO 8601 time, naive time is in current time zone.
+    Raise ValueError if invalid.
+    """
+    parsed: Optional[datetime.datetime] = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
 
 
 def get_change_logs_api(request: HttpRequest) -> JsonResponse:
     """
-    API endpoint that returns recent LOGS_COUNT config change logs.
+    API endpoint that returns config change logs, newest first.
+
+    Query params (all optional):
+    - limit: page size, LOGS_COUNT config by default
+    - key: only changes of this config
+    - since, until: ISO 8601 time range of changed_at (since inclusive)
+    - cursor: next_cursor of the previous page
     """
-    max_logs_str = realtime_config.get_config('LOGS_COUNT', default='10')
-    max_logs = int(max_logs_str)
-    if max_logs <= 0:
-        max_logs = 10
+    try:
+        limit: Optional[str] = request.GET.get('limit')
+        max_logs: int = int(limit) if limit else \
+            realtime_config.get_derived('logs_page_size', default=10)
+        if max_logs <= 0:
+            max_logs = 10
+        max_logs = min(max_logs, getattr(settings, 'REALTIME_CONFIG_CHANGE_LOG_MAX_PAGE_SIZE', 500))
+
+        logs: Any = ConfigChangeLog.objects.order_by('-changed_at', '-id')
+        if request.GET.get('key'):
+            logs = logs.filter(key=request.GET['key'])
+        if request.GET.get('since'):
+            logs = logs.filter(changed_at__gte=_parse_time(request.GET['since']))
+        if request.GET.get('until'):
+            logs = logs.filter(changed_at__lt=_parse_time(request.GET['until']))
+        if request.GET.get('cursor'):
+            changed_at, log_id = _decode_cursor(request.GET['cursor'])
+            # Redundant changed_at__lte lets the index range scan start at cursor
+            logs = logs.filter(Q(changed_at__lte=changed_at) &
+                               (Q(changed_at__lt=changed_at) |
+                                Q(changed_at=changed_at, id__lt=log_id)))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
 
-    logs: Any = ConfigChangeLog.objects.all()[:max_logs]
+    # One extra row tells if there is a next page
+    rows: List[Dict[str, Any]] = list(
+        logs.values('id', 'key', 'old_value', 'new_value', 'changed_at')[:max_logs + 1])
+    next_cursor: Optional[str] = None
+    if len(rows) > max_logs:
+        rows = rows[:max_logs]
+        next_cursor = _encode_cursor(rows[-1]['changed_at'], rows[-1]['id'])
 
     data: List[Dict[str, Union[int, str, None]]] = [{
-        'id': log.id,
-        'key': log.key,
-        'old_value': log.old_value,
-        'new_value': log.new_value,
-        'changed_at': log.changed_at.strftime('%Y-%m-%d %H:%M:%S')
-    } for log in logs]
-
-    return JsonResponse({'logs': data})
+        'id': row['id'],
+        'key': row['key'],
+        'old_value': row['old_value'],
+        'new_value': row['new_value'],
+        'changed_at': row['changed_at'].strftime('%Y-%m-%d %H:%M:%S')
+    } for row in rows]
+
+    return JsonResponse({'logs': data, 'next_cursor': next_cursor})
+
+
+def _metrics_authorized(request: HttpRequest) -> bool:
+    """
+    Scraper sending REALTIME_CONFIG_METRICS_TOKEN as bearer token, or staff user.
+    """
+    token: Optional[str] = getattr(settings, 'REALTIME_CONFIG_METRICS_TOKEN', None)
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode('utf-8'),
+                                     f"Bearer {token}".encode('utf-8')):
+        return True
+    user: Any = getattr(request, 'user', None)
+    return bool(user is not None and user.is_active and user.is_staff)
+
+
+def metrics_api(request: HttpRequest) -> HttpResponse:
+    """
+    realtime_config metrics in Prometheus text format.
+    """
+    if not _metrics_authorized(request):
+        response: HttpResponse = HttpResponse("Unauthorized", status=401,
+                                              content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(metrics.render(metrics.collect_all()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+def propagation_status_api(request: HttpRequest) -> JsonResponse:
+    """
+    API endpoint that returns which processes applied the latest config
+    update version, and propagation latency percentiles. Staff only,
+    it lists hosts and PIDs.
+    """
+    channel_name: Optional[str] = getattr(settings, 'REDIS_PUB_SUB_CHANNEL', None)
+    redis_client: Optional[redis.Redis] = get_redis_connection()
+    if not channel_name or redis_client is None:
+        return JsonResponse({'error': "Redis is not configured"}, status=503)
+
+    try:
+        return JsonResponse(propagation_status(redis_client, channel_name))
+    except redis.exceptions.RedisError as e:
+        return JsonResponse({'error': f"Redis is unavailable: {e}"}, status=503)
+
+
+
+def _stream_cursor(request: HttpRequest) -> Optional[str]:
+    """
+    Cursor the client got last: Last-Event-ID header (sent by EventSource
+    on reconnect) or cursor query param.
+    """
+    return request.headers.get('Last-Event-ID') or request.GET.get('cursor') or None
+
+
+def _update_payload(event: StreamEvent) -> Dict[str, Any]:
+    return {'key': event.key, 'value': event.value, 'version': event.version}
+
+
+def _log_payload(event: StreamEvent) -> Dict[str, Optional[str]]:
+    """
+    Change log entry of the update, in /api/logs/ format.
+    """
+    changed_at: datetime.datetime = timezone.now() if event.published_at is None else \
+        datetime.datetime.fromtimestamp(event.published_at, tz=datetime.timezone.utc)
+    return {
+        'key': event.key,
+        'old_value': str(event.old_value) if event.old_value is not None else None,
+        'new_value': str(event.value) if event.value is not None else "",
+        'changed_at': changed_at.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+async def _snapshot_payload(cursor: str) -> Dict[str, Any]:
+    """
+    Current configs for cursor. Streams and long polls outlive the request's
+    pinned snapshot, it would pair old values with the new cursor.
+    """
+    keys: list[str] = list(settings.CONSTANCE_CONFIG.keys())
+    with realtime_config.config_unpinned():
+        configs: Dict[str, Any] = await realtime_config.aget_configs(keys)
+    return {'cursor': cursor, 'configs': configs}
+
+
+def _sse(event: str, data: Dict[str, Any], cursor: Optional[str]) -> str:
+    # Without id, client keeps the previous cursor
+    event_id: str = f"id: {cursor}\n" if cursor is not None else ""
+    return f"{event_id}event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def _sse_updates(events: List[StreamEvent]) -> str:
+    """
+    Updates with cursor set after the last update of each version, so a client
+    reconnecting in the middle of a changeset gets all of it again.
+    """
+    chunks: List[str] = []
+    for index, event in enumerate(events):
+        last: bool = index + 1 == len(events) or events[index + 1].version != event.version
+        cursor: Optional[str] = str(event.version) if last else None
+        chunks.append(_sse('config', _update_payload(event), cursor))
+        chunks.append(_sse('log', _log_payload(event), cursor))
+    return "".join(chunks)
+
+
+async def _config_stream(cursor: Optional[str]) -> AsyncIterator[str]:
+    """
+    Server-Sent Events: snapshot (all configs) or missed updates first,
+    then updates as they are applied, heartbeat comment when idle.
+    """
+    heartbeat: float = getattr(settings, 'REALTIME_CONFIG_STREAM_HEARTBEAT', 15.0)
+    retry: float = getattr(settings, 'REALTIME_CONFIG_STREAM_RETRY', 3.0)
+    subscription, missed, current = live_updates.subscribe(cursor)
+    try:
+        yield f"retry: {int(retry * 1000)}\n\n"
+        if missed is None:
+            yield _sse('snapshot', await _snapshot_payload(current), current)
+        elif missed:
+            yield _sse_updates(missed)
+
+        while True:
+            try:
+                updates: List[Optional[StreamEvent]] = [await asyncio.wait_for(
+                    subscription.queue.get(), heartbeat)]
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            # Rest of the changeset is queued along
+            while not subscription.queue.empty():
+                updates.append(subscription.queue.get_nowait())
+            events: List[StreamEvent] = [update for update in updates if update is not None]
+            if len(events) < len(updates):
+                # Snapshot includes updates queued with it
+                current = live_updates.current_cursor()
+                yield _sse('snapshot', await _snapshot_payload(current), current)
+            else:
+                yield _sse_updates(events)
+    finally:
+        live_updates.unsubscribe(subscription)
+
+
+async def config_stream_api(request: HttpRequest) -> HttpResponseBase:
+    """
+    Server-Sent Events stream of config updates and change log entries.
+    Resumes from Last-Event-ID header or cursor query param.
+    ASGI only: WSGI would hold a worker per client, use /api/configs/updates/.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': "Event stream requires ASGI server, "
+                                      "use /api/configs/updates/ long polling"}, status=501)
+
+    response: StreamingHttpResponse = StreamingHttpResponse(
+        _config_stream(_stream_cursor(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def config_updates_api(request: HttpRequest) -> JsonResponse:
+    """
+    Long polling for clients without Server-Sent Events.
+
+    Query params:
+    - cursor: cursor from the previous response, omit on first request
+    - timeout: max wait for updates, s (REALTIME_CONFIG_LONG_POLL_TIMEOUT max)
+
+    Returns cursor and updates with their change log entries, or all configs
+    when updates since cursor are unknown. Empty updates on timeout.
+    """
+    max_timeout: float = getattr(settings, 'REALTIME_CONFIG_LONG_POLL_TIMEOUT', 25.0)
+    try:
+        timeout: float = min(float(request.GET.get('timeout') or max_timeout), max_timeout)
+    except ValueError:
+        return JsonResponse({'error': f"Invalid timeout: {request.GET['timeout']}"}, status=400)
+
+    cursor: Optional[str] = _stream_cursor(request)
+    subscription, missed, current = live_updates.subscribe(cursor)
+    try:
+        if missed is None:
+            return JsonResponse(await _snapshot_payload(current))
+
+        updates: List[Optional[StreamEvent]] = list(missed)
+        if not updates and timeout > 0:
+            try:
+                updates.append(await asyncio.wait_for(subscription.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                pass
+        while not subscription.queue.empty():
+            updates.append(subscription.queue.get_nowait())
+    finally:
+        live_updates.unsubscribe(subscription)
+
+    events: List[StreamEvent] = [update for update in updates if update is not None]
+    if len(events) < len(updates):
+        return JsonResponse(await _snapshot_payload(live_updates.current_cursor()))
+    return JsonResponse({
+        'cursor': str(max(event.version for event in events)) if events else cursor,
+        'updates': [_update_payload(event) for event in events],
+        'logs': [_log_payload(event) for event in events],
+    })
@@ -12,5 +12,12 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config_manager.settings')
+# Config subscriber runs as event loop task instead of thread
+os.environ.setdefault('REALTIME_CONFIG_ASYNC_SUBSCRIBER', 'True')
+os.environ.setdefault('REALTIME_CONFIG_ASGI', 'True')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from config_app.asgi import AsyncSubscriberASGIMiddleware
+
+application = AsyncSubscriberASGIMiddleware(django_application)
@@ -7,7 +7,7 @@ from pathlib import Path
 import os
 import environ
 
-from typing import List, Dict, Tuple, Any, Union
+from typing import List, Dict, Tuple, Any, Union, Optional
 
 
 BASE_DIR: Path = Path(__file__).resolve().parent.parent
@@ -48,6 +48,7 @@ INSTALLED_APPS: List[str] = [
 
 MIDDLEWARE: List[str] = [
     'config_app.middleware.LogRequestPIDMiddleware',
+    'config_app.middleware.ConfigSnapshotMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -100,8 +101,16 @@ CONSTANCE_REDIS_CONNECTION: Dict[str, Union[str, int]] = {
     'port': env.int('REDIS_PORT'),
     'db': env.int('REDIS_DB'),
 }
+# Constance uses realtime_config's fork-safe, bounded connection pool
+CONSTANCE_REDIS_CONNECTION_CLASS: str = 'config_app.redis_client.get_constance_connection'
 
-CONSTANCE_CONFIG: Dict[str, Tuple[Any, str, type]] = {
+# Config types beyond constance built-ins, form field for admin
+CONSTANCE_ADDITIONAL_FIELDS: Dict[str, List[Any]] = {
+    # JSON percentage rollout definition, see config_app.feature_flags
+    'rollout_flag': ['config_app.feature_flags.RolloutFlagField'],
+}
+
+CONSTANCE_CONFIG: Dict[str, Tuple[Any, str, Union[type, str]]] = {
     # 'CONFIG_NAME': (default, 'description', config type)
     'SITE_NAME': ('Config Manager', 'Site name', str),
     'WELCOME_MESSAGE': ('You can see real-time configs and their values here', 'Welcome text', str),
@@ -113,6 +122,10 @@ CONSTANCE_CONFIG: Dict[str, Tuple[Any, str, type]] = {
     'LOGS_COUNT': (10, 'Number of recent change logs to show', int),
 
     'UI_POLLING_INTERVAL': (300.0, 'Polling interval for real-time UI, s', float),
+
+    'NEW_CHECKOUT_ROLLOUT': ('{"percentage": 0, "allow": [], "deny": [], "salt": "NEW_CHECKOUT"}',
+                             'New checkout rollout: percentage of users, allow/deny user IDs, '
+                             'salt', 'rollout_flag'),
 }
 
 # Any config you add must appear here in some fieldset! also definable
@@ -120,17 +133,133 @@ CONSTANCE_CONFIG_FIELDSETS: Dict[str, Tuple[str, ...]] = {
     'General': ('SITE_NAME', 'THEME_COLOR', 'MAINTENANCE_MODE'),
     'Content': ('WELCOME_MESSAGE', 'ITEMS_PER_PAGE'),
     'Logging': ('SHOW_LOGS', 'LOGS_COUNT'),
-    'Demo': ('UI_POLLING_INTERVAL',)
+    'Demo': ('UI_POLLING_INTERVAL',),
+    'Feature flags': ('NEW_CHECKOUT_ROLLOUT',),
 }
 
+# How processes learn about config changes:
+# 'pubsub' - update messages published by config_updated signal handler
+# 'tracking' - Redis key tracking on constance keys (Redis 6+), catches writes
+#   made bypassing Django admin too, but every process refetches changed keys
+REALTIME_CONFIG_INVALIDATION_BACKEND: str = env.str('REALTIME_CONFIG_INVALIDATION_BACKEND',
+                                                    default='pubsub')
 REDIS_PUB_SUB_CHANNEL: str = 'realtime_config_updates'
-
-# Time to wait for before trying to connect to Redis again
+# Also publish bare keys for processes not yet on versioned messages
+REDIS_PUB_SUB_LEGACY_PUBLISH: bool = False
+# Served by ASGI server (set in asgi.py): /api/configs/ uses async view,
+# WSGI gets sync one without async_to_sync() per request
+REALTIME_CONFIG_ASGI: bool = env.bool('REALTIME_CONFIG_ASGI', default=False)
+# Run subscriber as asyncio task in ASGI app instead of thread (set in asgi.py)
+REALTIME_CONFIG_ASYNC_SUBSCRIBER: bool = env.bool('REALTIME_CONFIG_ASYNC_SUBSCRIBER',
+                                                  default=False)
+
+# Per-host shared-memory config cache: one process per host subscribes to
+# Pub/Sub and writes snapshot to this file, others read it (None - disabled)
+REALTIME_CONFIG_SHARED_CACHE_PATH: Optional[str] = env.str('REALTIME_CONFIG_SHARED_CACHE_PATH',
+                                                           default=None)
+# Shared snapshot file size, bytes
+REALTIME_CONFIG_SHARED_CACHE_SIZE: int = 1024 * 1024
+
+# Last-known-good config values file, loaded on worker start so configs
+# survive Redis being down (None - disabled)
+REALTIME_CONFIG_SNAPSHOT_FILE: Optional[str] = env.str('REALTIME_CONFIG_SNAPSHOT_FILE',
+                                                       default=None)
+# Min time between snapshot file writes, s
+REALTIME_CONFIG_SNAPSHOT_INTERVAL: float = 1.0
+
+# Directory where each worker writes its metrics, so /metrics/ aggregates
+# all workers on the host (None - only the serving worker's metrics)
+REALTIME_CONFIG_METRICS_DIR: Optional[str] = env.str('REALTIME_CONFIG_METRICS_DIR',
+                                                     default=None)
+# Time between worker metrics file writes, s
+REALTIME_CONFIG_METRICS_INTERVAL: float = 5.0
+# Bearer token Prometheus sends to scrape /metrics/ (None - staff users only)
+REALTIME_CONFIG_METRICS_TOKEN: Optional[str] = env.str('REALTIME_CONFIG_METRICS_TOKEN',
+                                                       default=None)
+
+# Subscribers acknowledge applied config updates to Redis,
+# /api/propagation/ shows processes still behind and latency percentiles
+REALTIME_CONFIG_PROPAGATION_ACKS: bool = env.bool('REALTIME_CONFIG_PROPAGATION_ACKS',
+                                                  default=True)
+# Process state refresh interval, s. Processes silent for 3 intervals are dropped
+REALTIME_CONFIG_ACK_HEARTBEAT: float = 10.0
+# Recent publish-to-apply latency samples kept in Redis
+REALTIME_CONFIG_ACK_LATENCY_SAMPLES: int = 1000
+# Propagation SLO: publish-to-apply latency target, s
+REALTIME_CONFIG_PROPAGATION_SLO: float = 1.0
+
+# Config change log rows are written in background with bulk_create:
+# when this many rows are buffered...
+REALTIME_CONFIG_CHANGE_LOG_BATCH_SIZE: int = 100
+# ...or this many seconds passed
+REALTIME_CONFIG_CHANGE_LOG_FLUSH_INTERVAL: float = 0.5
+# Where rows go while database is unavailable (None - kept in memory)
+REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR: Optional[str] = env.str(
+    'REALTIME_CONFIG_CHANGE_LOG_SPILL_DIR', default=None)
+# Max page size of /api/logs/
+REALTIME_CONFIG_CHANGE_LOG_MAX_PAGE_SIZE: int = 500
+
+# Config update streams to browsers: /api/configs/stream/ (Server-Sent Events,
+# ASGI only) and /api/configs/updates/ (long polling).
+# Recent updates kept per process for clients resuming after reconnect
+REALTIME_CONFIG_STREAM_BACKLOG: int = 1000
+# Updates queued per slow client before it gets full snapshot instead
+REALTIME_CONFIG_STREAM_QUEUE_SIZE: int = 100
+# Heartbeat comment interval on idle stream, s
+REALTIME_CONFIG_STREAM_HEARTBEAT: float = 15.0
+# Browser reconnect delay sent to EventSource, s
+REALTIME_CONFIG_STREAM_RETRY: float = 3.0
+# Max long poll wait, s
+REALTIME_CONFIG_LONG_POLL_TIMEOUT: float = 25.0
+
+# Redis connection pools: one for commands (request path), one for Pub/Sub subscribers
+REALTIME_CONFIG_REDIS_POOL_SIZE: int = env.int('REALTIME_CONFIG_REDIS_POOL_SIZE', default=50)
+REALTIME_CONFIG_REDIS_PUBSUB_POOL_SIZE: int = 4
+# Max wait for a free pooled connection, s
+REALTIME_CONFIG_REDIS_POOL_TIMEOUT: float = 1.0
+REALTIME_CONFIG_REDIS_SOCKET_TIMEOUT: float = 5.0
+REALTIME_CONFIG_REDIS_CONNECT_TIMEOUT: float = 5.0
+# PING connections idle for this long before use, s (0 - disabled)
+REALTIME_CONFIG_REDIS_HEALTH_CHECK_INTERVAL: int = 30
+REALTIME_CONFIG_REDIS_KEEPALIVE: bool = True
+
+# Time to wait for before trying to connect to Redis again.
+# Also first backoff delay of Redis circuit breaker, doubled on each failed probe
 REDIS_RETRY_INTERVAL: float = 10.0
+REDIS_BREAKER_MAX_DELAY: float = 60.0
+# Consecutive Redis errors in get_config() that open circuit breaker
+REDIS_BREAKER_FAILURE_THRESHOLD: int = 1
+
+# Max time to wait for another thread's fetch of the same config, s
+REALTIME_CONFIG_SINGLE_FLIGHT_TIMEOUT: float = 1.0
+
+# Soft TTL of cached configs, s (None - cached until Pub/Sub update).
+# Expired values are still served while refreshed in background
+REALTIME_CONFIG_SOFT_TTL: Optional[float] = None
+REALTIME_CONFIG_SOFT_TTL_PER_KEY: Dict[str, float] = {
+    # 'MAINTENANCE_MODE': 30.0,
+}
+# How often background refresher checks for expired configs, s
+REALTIME_CONFIG_REFRESH_INTERVAL: float = 1.0
+
+# Bulk-load all configs into local cache when a worker process starts
+REALTIME_CONFIG_WARMUP: bool = env.bool('REALTIME_CONFIG_WARMUP', default=False)
+# Max time to wait for warm-up, s - defaults are used if Redis is slower
+REALTIME_CONFIG_WARMUP_TIMEOUT: float = 2.0
 
 
 # Logging
 
+# 'debug' - every config access and request logged synchronously (demo)
+# 'production' - config_app at INFO through non-blocking queue handler,
+#   high-frequency lines sampled, cache activity logged as periodic summaries
+REALTIME_CONFIG_LOG_MODE: str = env.str('REALTIME_CONFIG_LOG_MODE', default='debug')
+_production_logging: bool = REALTIME_CONFIG_LOG_MODE == 'production'
+# Log 1 of every N requests, config fallbacks and circuit breaker rejections
+REALTIME_CONFIG_LOG_SAMPLE_EVERY: int = 100 if _production_logging else 1
+# Interval of config activity summary lines, s (None - disabled)
+REALTIME_CONFIG_LOG_SUMMARY_INTERVAL: Optional[float] = 60.0 if _production_logging else None
+
 LOGGING: Dict[str, Any] = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -147,7 +276,8 @@ LOGGING: Dict[str, Any] = {
     'handlers': {
         'console': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
+            'class': 'config_app.log_utils.QueueLogHandler' if _production_logging
+                     else 'logging.StreamHandler',
             'formatter': 'simple',
         },
     },
@@ -164,7 +294,7 @@ LOGGING: Dict[str, Any] = {
         },
         'config_app': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': 'INFO' if _production_logging else 'DEBUG',
             'propagate': True,
         },
     },